@@ -0,0 +1,264 @@
+// assets/tree_view.js
+//
+// Interactive tree view. Draws the compact layout JSON written by
+// src/visualize_tree.py (write_layout) with Plotly, entirely in the browser:
+// the server only sends a static file once per tree.
+//
+// - Clicking an internal node collapses its clade into a wedge (or expands it).
+// - Level of detail: clades spanning less than one of MAX_ROWS screen rows
+//   are drawn as wedges too, and zooming in brings their branches back.
+// - Tip names and supports are only written once few enough are in view.
+
+(function () {
+    // Rows drawn in full at the current zoom
+    var MAX_ROWS = 1500;
+    // Labels are written when at most this many are in view
+    var MAX_LABELS = 150;
+
+    // Layout URL -> prepared tree (with its collapsed clades and current view)
+    var trees = {};
+
+    function prepare(data) {
+        var n = data.parent.length;
+        var parent = data.parent;
+        var children = [];
+        var i;
+        for (i = 0; i < n; i++) {
+            children.push([]);
+        }
+        for (i = 1; i < n; i++) {
+            children[parent[i]].push(i);
+        }
+
+        var scale = data.depth / data.resolution;
+        var x = new Float64Array(n);
+        var name = new Array(n);
+        var tip = 0;
+        for (i = 0; i < n; i++) {
+            x[i] = data.x[i] * scale;
+            name[i] = children[i].length ? null : data.names[tip++];
+        }
+
+        // Tips below each node and the farthest root distance below it;
+        // in reverse preorder every node comes after all of its descendants
+        var size = new Int32Array(n);
+        var far = Float64Array.from(x);
+        for (i = n - 1; i >= 0; i--) {
+            if (!children[i].length) {
+                size[i] = 1;
+            }
+            if (i > 0) {
+                size[parent[i]] += size[i];
+                far[parent[i]] = Math.max(far[parent[i]], far[i]);
+            }
+        }
+
+        var support = new Float64Array(n).fill(NaN);
+        data.support.forEach(function (pair) {
+            support[pair[0]] = pair[1];
+        });
+
+        return {
+            n: n, parent: parent, children: children, x: x, name: name,
+            size: size, far: far, support: support, depth: data.depth,
+            collapsed: new Set(), view: null
+        };
+    }
+
+    // Tips and collapsed clades get rows 0, 1, 2, ... in preorder; parents
+    // sit midway between their first and last child
+    function assignRows(tree) {
+        var n = tree.n, children = tree.children, collapsed = tree.collapsed;
+        var y = new Float64Array(n), lo = new Float64Array(n), hi = new Float64Array(n);
+        var hidden = new Uint8Array(n);
+        var row = 0;
+        var i, p, kids;
+        for (i = 0; i < n; i++) {
+            p = tree.parent[i];
+            if (p >= 0 && (hidden[p] || collapsed.has(p))) {
+                hidden[i] = 1;
+            } else if (!children[i].length || collapsed.has(i)) {
+                y[i] = lo[i] = hi[i] = row++;
+            }
+        }
+        for (i = n - 1; i >= 0; i--) {
+            kids = children[i];
+            if (hidden[i] || !kids.length || collapsed.has(i)) {
+                continue;
+            }
+            lo[i] = lo[kids[0]];
+            hi[i] = hi[kids[kids.length - 1]];
+            y[i] = (y[kids[0]] + y[kids[kids.length - 1]]) / 2;
+        }
+        tree.y = y;
+        tree.lo = lo;
+        tree.hi = hi;
+        tree.rows = row;
+    }
+
+    function figure(tree) {
+        var x = tree.x, y = tree.y, children = tree.children;
+        var yRange = tree.view && tree.view.y ? tree.view.y : [-0.5, tree.rows - 0.5];
+        var y0 = Math.min(yRange[0], yRange[1]), y1 = Math.max(yRange[0], yRange[1]);
+        var minSpan = (y1 - y0) / MAX_ROWS;
+
+        var edges = {x: [], y: []}, wedges = {x: [], y: []};
+        var nodes = {x: [], y: [], id: [], text: []};
+        var labels = {x: [], y: [], text: []}, supports = {x: [], y: [], text: []};
+        var stack = [0];
+        var i, p, kids, k, far, top, bottom;
+
+        while (stack.length) {
+            i = stack.pop();
+            p = tree.parent[i];
+            kids = children[i];
+            if (p >= 0) {
+                edges.x.push(x[p], x[i], null);
+                edges.y.push(y[i], y[i], null);
+            }
+            if (!kids.length) {
+                if (y[i] >= y0 && y[i] <= y1) {
+                    labels.x.push(x[i]);
+                    labels.y.push(y[i]);
+                    labels.text.push(" " + tree.name[i]);
+                }
+                continue;
+            }
+
+            nodes.x.push(x[i]);
+            nodes.y.push(y[i]);
+            nodes.id.push(i);
+            if (tree.collapsed.has(i) || tree.hi[i] - tree.lo[i] < minSpan) {
+                // Wedge from the node to the farthest tip below it
+                far = tree.far[i];
+                top = tree.collapsed.has(i) ? y[i] - 0.4 : tree.lo[i];
+                bottom = tree.collapsed.has(i) ? y[i] + 0.4 : tree.hi[i];
+                wedges.x.push(x[i], far, far, x[i], null);
+                wedges.y.push(y[i], top, bottom, y[i], null);
+                nodes.text.push(tree.size[i] + " tips (click to " +
+                                (tree.collapsed.has(i) ? "expand)" : "collapse)"));
+                if (tree.collapsed.has(i) && y[i] >= y0 && y[i] <= y1) {
+                    labels.x.push(far);
+                    labels.y.push(y[i]);
+                    labels.text.push(" " + tree.size[i] + " tips");
+                }
+                continue;
+            }
+
+            nodes.text.push(tree.size[i] + " tips (click to collapse)");
+            edges.x.push(x[i], x[i], null);
+            edges.y.push(y[kids[0]], y[kids[kids.length - 1]], null);
+            if (p >= 0 && !isNaN(tree.support[i]) && y[i] >= y0 && y[i] <= y1) {
+                supports.x.push((x[p] + x[i]) / 2);
+                supports.y.push(y[i]);
+                supports.text.push(String(tree.support[i]));
+            }
+            // Clades entirely outside the view are skipped
+            for (k = kids.length - 1; k >= 0; k--) {
+                if (tree.hi[kids[k]] >= y0 - 1 && tree.lo[kids[k]] <= y1 + 1) {
+                    stack.push(kids[k]);
+                }
+            }
+        }
+
+        var data = [
+            {type: "scattergl", mode: "lines", x: edges.x, y: edges.y,
+             line: {color: "black", width: 1}, hoverinfo: "skip"},
+            {type: "scatter", mode: "lines", x: wedges.x, y: wedges.y, fill: "toself",
+             fillcolor: "rgba(75, 0, 130, 0.15)", line: {color: "#4B0082", width: 1}, hoverinfo: "skip"},
+            {type: "scattergl", mode: "markers", x: nodes.x, y: nodes.y, customdata: nodes.id,
+             text: nodes.text, hoverinfo: "text", marker: {size: 6, color: "#4B0082"}}
+        ];
+        if (labels.text.length <= MAX_LABELS) {
+            data.push({type: "scatter", mode: "text", x: labels.x, y: labels.y, text: labels.text,
+                       textposition: "middle right", hoverinfo: "skip"});
+        }
+        if (supports.text.length <= MAX_LABELS) {
+            data.push({type: "scatter", mode: "text", x: supports.x, y: supports.y, text: supports.text,
+                       textposition: "top center", textfont: {size: 10, color: "gray"}, hoverinfo: "skip"});
+        }
+
+        var xRange = tree.view && tree.view.x ? tree.view.x : [-0.02 * tree.depth, 1.3 * tree.depth];
+        return {
+            data: data,
+            layout: {
+                xaxis: {title: {text: "branch length"}, range: xRange, zeroline: false},
+                yaxis: {range: [y1, y0], showticklabels: false, showgrid: false, zeroline: false},
+                height: Math.min(Math.max(400, 22 * tree.rows), 900),
+                margin: {l: 20, r: 20, t: 20, b: 50},
+                showlegend: false,
+                hovermode: "closest"
+            }
+        };
+    }
+
+    function viewFrom(relayout, view) {
+        if (!relayout) {
+            return undefined;
+        }
+        if ("xaxis.autorange" in relayout || "yaxis.autorange" in relayout) {
+            return null;
+        }
+        var next = {x: view ? view.x : null, y: view ? view.y : null};
+        var changed = false;
+        if ("xaxis.range[0]" in relayout) {
+            next.x = [relayout["xaxis.range[0]"], relayout["xaxis.range[1]"]];
+            changed = true;
+        }
+        if ("yaxis.range[0]" in relayout) {
+            next.y = [relayout["yaxis.range[0]"], relayout["yaxis.range[1]"]];
+            changed = true;
+        }
+        return changed ? next : undefined;
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        tree_view: {
+            render: function (url, clickData, relayoutData) {
+                var noUpdate = window.dash_clientside.no_update;
+                if (!url) {
+                    return noUpdate;
+                }
+                var tree = trees[url];
+                if (!tree) {
+                    return fetch(url).then(function (response) {
+                        if (!response.ok) {
+                            throw new Error("Could not load tree layout (" + response.status + ")");
+                        }
+                        return response.json();
+                    }).then(function (data) {
+                        tree = trees[url] = prepare(data);
+                        assignRows(tree);
+                        return figure(tree);
+                    });
+                }
+
+                var triggered = window.dash_clientside.callback_context.triggered.map(function (t) {
+                    return t.prop_id;
+                });
+                if (triggered.some(function (id) { return id.endsWith(".clickData"); })) {
+                    var point = clickData && clickData.points[0];
+                    if (!point || point.customdata === undefined) {
+                        return noUpdate;
+                    }
+                    if (tree.collapsed.has(point.customdata)) {
+                        tree.collapsed.delete(point.customdata);
+                    } else {
+                        tree.collapsed.add(point.customdata);
+                    }
+                    assignRows(tree);
+                    tree.view = null;
+                    return figure(tree);
+                }
+                if (triggered.some(function (id) { return id.endsWith(".relayoutData"); })) {
+                    var view = viewFrom(relayoutData, tree.view);
+                    if (view === undefined) {
+                        return noUpdate;
+                    }
+                    tree.view = view;
+                }
+                return figure(tree);
+            }
+        }
+    });
+})();
@@ -0,0 +1,86 @@
+// assets/upload.js
+//
+// Streaming FASTA upload. The file chosen in (or dropped on) the #upload-fasta
+// box is POSTed as the raw request body to the server's /upload route, which
+// validates it while writing it into a fresh workspace. Only the returned
+// upload ID ends up in the "upload-id" store, so the file never travels
+// through Dash callbacks as base64.
+//
+// The store holds {status: "uploading", filename} while the request runs,
+// then the route's reply ({upload_id, filename, sequences, bytes}) or
+// {error, filename}.
+
+(function () {
+    var STORE = "upload-id";
+
+    function report(data) {
+        window.dash_clientside.set_props(STORE, {data: data});
+    }
+
+    function megabytes(bytes) {
+        return Math.floor(bytes / (1024 * 1024));
+    }
+
+    function upload(box, file) {
+        var maxBytes = Number(box.dataset.maxBytes);
+        if (maxBytes && file.size > maxBytes) {
+            // Refused here already, before a single byte is sent
+            report({error: "File is larger than the " + megabytes(maxBytes) + " MB upload limit.",
+                    filename: file.name});
+            return;
+        }
+        report({status: "uploading", filename: file.name});
+        fetch(box.dataset.url, {
+            method: "POST",
+            body: file,
+            headers: {
+                "Content-Type": "application/octet-stream",
+                "X-Filename": encodeURIComponent(file.name)
+            }
+        }).then(function (response) {
+            return response.json().catch(function () {
+                return {error: "Upload failed (HTTP " + response.status + ")."};
+            });
+        }).then(function (reply) {
+            report(reply.error ? {error: reply.error, filename: file.name} : reply);
+        }).catch(function (err) {
+            report({error: "Upload failed: " + err.message, filename: file.name});
+        });
+    }
+
+    function uploadBox(target) {
+        return target instanceof Element ? target.closest("#upload-fasta") : null;
+    }
+
+    // The box is rendered by Dash after this script runs, so listen on the document
+    document.addEventListener("click", function (event) {
+        var box = uploadBox(event.target);
+        if (!box) {
+            return;
+        }
+        event.preventDefault();
+        var input = document.createElement("input");
+        input.type = "file";
+        input.accept = ".fa,.fasta,.fas,.fna,.faa,.txt";
+        input.addEventListener("change", function () {
+            if (input.files.length) {
+                upload(box, input.files[0]);
+            }
+        });
+        input.click();
+    });
+
+    document.addEventListener("dragover", function (event) {
+        if (uploadBox(event.target)) {
+            event.preventDefault();
+        }
+    });
+
+    document.addEventListener("drop", function (event) {
+        var box = uploadBox(event.target);
+        if (box && event.dataTransfer.files.length) {
+            event.preventDefault();
+            upload(box, event.dataTransfer.files[0]);
+        }
+    });
+})();
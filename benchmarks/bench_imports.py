@@ -0,0 +1,115 @@
+"""
+Import-time report: how long a cold `import` of the app and its entry points takes.
+
+Usage (from the project root):
+    python benchmarks/bench_imports.py                          # main, src.pipeline, src.cli
+    python benchmarks/bench_imports.py --save imports.json      # record a baseline
+    python benchmarks/bench_imports.py --baseline imports.json  # fail on regressions
+
+Every module is imported in a fresh interpreter with `python -X importtime`,
+--repeat times, keeping the fastest run. The report lists the total and the
+slowest imports below it, and flags scientific packages (HEAVY) that got
+imported at start-up although they are only needed once a job runs. With
+--baseline the script exits with status 1 if any module got more than
+--tolerance slower, or started importing a heavy package it did not before.
+"""
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent.resolve()
+
+# Packages that should only be imported on first use (see src/pipeline.py)
+HEAVY = ("matplotlib", "scipy", "Bio", "pandas")
+
+
+def import_times(module):
+    """
+    Imports module in a fresh interpreter and parses its -X importtime log.
+
+    Returns:
+    - dict: module imported by this import (module itself included) ->
+      cumulative import time in seconds. Interpreter start-up imports
+      such as site are left out.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    entries = []
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package", nested
+        # imports indented by two spaces per level and listed before their parent
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((name.strip(), int(cumulative) / 1e6, depth))
+    # The requested import is the last top-level entry; the nested entries
+    # right before it are its own imports
+    start = len(entries) - 1
+    while start > 0 and entries[start - 1][2] > 0:
+        start -= 1
+    return {name: seconds for name, seconds, _ in entries[start:]}
+
+
+def measure(module, repeat=3):
+    """
+    Fastest of repeat cold imports of module.
+
+    Returns:
+    - dict with "seconds", the "slowest" imports below it (name, seconds)
+      and the "heavy" packages it pulled in.
+    """
+    best = None
+    for _ in range(repeat):
+        times = import_times(module)
+        if best is None or times[module] < best[module]:
+            best = times
+    below = sorted(((name, t) for name, t in best.items() if name != module),
+                   key=lambda item: item[1], reverse=True)
+    heavy = sorted({name.split(".")[0] for name in best} & set(HEAVY))
+    return {"seconds": best[module], "slowest": below[:5], "heavy": heavy}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--modules", nargs="+", default=["main", "src.pipeline", "src.cli"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", help="Write the results to this JSON file.")
+    parser.add_argument("--baseline", help="Compare against results saved with --save.")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed slowdown against the baseline (0.25 = 25%%).")
+    args = parser.parse_args(argv)
+
+    results = {module: measure(module, args.repeat) for module in args.modules}
+    baseline = json.loads(Path(args.baseline).read_text()) if args.baseline else {}
+
+    failed = False
+    print(f"{'module':<16} {'import (s)':>10} {'baseline (s)':>13}  heavy packages")
+    for module, result in results.items():
+        before = baseline.get(module)
+        flag = ""
+        if before is not None:
+            slower = result["seconds"] > before["seconds"] * (1 + args.tolerance)
+            new_heavy = set(result["heavy"]) - set(before["heavy"])
+            if slower or new_heavy:
+                failed = True
+                flag = "  REGRESSION" + (f" (now imports {', '.join(sorted(new_heavy))})" if new_heavy else "")
+        reference = f"{before['seconds']:.3f}" if before else "-"
+        print(f"{module:<16} {result['seconds']:>10.3f} {reference:>13}  "
+              f"{', '.join(result['heavy']) or 'none'}{flag}")
+        for name, seconds in result["slowest"]:
+            print(f"    {seconds:>8.3f}  {name}")
+
+    if args.save:
+        Path(args.save).write_text(json.dumps(results, indent=2))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
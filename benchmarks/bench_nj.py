@@ -0,0 +1,97 @@
+"""
+Neighbor-joining benchmark: src.nj.neighbor_joining vs Biopython's nj().
+
+Usage (from the project root):
+    python benchmarks/bench_nj.py                 # n = 100, 1000, 5000
+    python benchmarks/bench_nj.py --sizes 200 500 --biopython-max 500
+
+Biopython's nj() is cubic in pure Python (roughly 10 minutes at n = 1000),
+so it is only run up to --biopython-max taxa. Wherever both run, the two
+trees are checked for identical topology.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from Bio.Phylo.TreeConstruction import DistanceTreeConstructor
+
+PROJECT_ROOT = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.distance import to_distance_matrix
+from src.nj import neighbor_joining
+
+
+def tree_like_distances(n, seed=0, noise=0.01):
+    """
+    Additive distances on a random coalescent-style tree plus a little noise.
+    """
+    rng = np.random.default_rng(seed)
+    dist = np.zeros((n, n))
+    groups = [np.array([i]) for i in range(n)]
+    depths = [np.zeros(1) for _ in range(n)]
+    while len(groups) > 1:
+        a, b = sorted(rng.choice(len(groups), 2, replace=False), reverse=True)
+        ga, gb = groups.pop(a), groups.pop(b)
+        da, db = depths.pop(a) + rng.exponential(0.05), depths.pop(b) + rng.exponential(0.05)
+        dist[np.ix_(ga, gb)] = da[:, None] + db[None, :]
+        dist[np.ix_(gb, ga)] = dist[np.ix_(ga, gb)].T
+        groups.append(np.concatenate([ga, gb]))
+        depths.append(np.concatenate([da, db]))
+    jitter = rng.normal(0, noise, (n, n))
+    dist = np.abs(dist + (jitter + jitter.T) / 2)
+    np.fill_diagonal(dist, 0.0)
+    return dist
+
+
+def splits(tree):
+    """
+    Set of leaf bipartitions (each as the side without the first taxon).
+    """
+    taxa = sorted(leaf.name for leaf in tree.get_terminals())
+    anchor = taxa[0]
+    result = set()
+    for clade in tree.find_clades():
+        side = frozenset(leaf.name for leaf in clade.get_terminals())
+        if anchor in side:
+            side = frozenset(taxa) - side
+        if 1 < len(side) < len(taxa) - 1:
+            result.add(side)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--biopython-max", type=int, default=1000,
+                        help="Largest n for which Biopython's nj() is also timed.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    print(f"{'n':>6} {'numpy (s)':>10} {'no prune (s)':>13} {'biopython (s)':>14} {'same topology':>14}")
+    for n in args.sizes:
+        dist = tree_like_distances(n, seed=args.seed)
+        names = [f"t{i}" for i in range(n)]
+
+        start = time.perf_counter()
+        fast = neighbor_joining(names, dist)
+        fast_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        neighbor_joining(names, dist, prune=False)
+        scan_time = time.perf_counter() - start
+
+        bio_time, same = "skipped", "-"
+        if n <= args.biopython_max:
+            start = time.perf_counter()
+            slow = DistanceTreeConstructor().nj(to_distance_matrix(names, dist))
+            bio_time = f"{time.perf_counter() - start:.2f}"
+            same = str(splits(fast) == splits(slow))
+
+        print(f"{n:>6} {fast_time:>10.2f} {scan_time:>13.2f} {bio_time:>14} {same:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Pipeline benchmark: time and peak memory of every stage on synthetic inputs.
+
+Usage (from the project root):
+    python benchmarks/bench_pipeline.py                               # 20, 200, 1000 taxa
+    python benchmarks/bench_pipeline.py --taxa 50 --length 5000 --stages nj upgma
+    python benchmarks/bench_pipeline.py --output results.json         # save the results
+    python benchmarks/bench_pipeline.py --baseline results.json       # fail on regressions
+
+Inputs come from benchmarks/synthetic.py: sequences evolved along a random
+tree, with indels, so there is both a true alignment (for the distance and
+tree stages) and an unaligned FASTA (for parsing, MUSCLE and the end-to-end
+run). Stages:
+
+    parse_fasta     src.fasta_parser.parse_fasta over the unaligned FASTA
+    align           src.align_sequences.align_sequences (MUSCLE)
+    distances       CompactAlignment.from_fasta + identity_distances
+    distance_store  src.distance_store.identity_distance_store into a
+                    memory-mapped file (tiles filled by worker processes)
+    nj, upgma       src.nj.neighbor_joining, src.upgma.upgma_tree
+    visualize_tree  src.visualize_tree.visualize_tree of the NJ tree to PNG
+    end_to_end      src.pipeline.run_pipeline, the job behind the web app's
+                    Analyze button (alignment, both trees, images, layouts)
+
+Times are the best of --repeat runs (MUSCLE and end-to-end run once); peak
+memory comes from one extra run under tracemalloc, so it counts Python and
+NumPy allocations of this process but not the MUSCLE subprocess. MUSCLE is
+slow, so align and end_to_end only run up to --align-max taxa.
+
+With --baseline, a stage that got more than --tolerance slower or hungrier
+than in the saved results (and by more than a small absolute margin, so
+timer noise on tiny stages doesn't count) is reported and the script exits
+with status 1.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+from Bio import Phylo
+
+PROJECT_ROOT = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from benchmarks.synthetic import simulate_alignment, write_fasta
+from src.align_sequences import align_sequences
+from src.alignment import CompactAlignment
+from src.distance import identity_distances
+from src.distance_store import identity_distance_store
+from src.fasta_parser import parse_fasta
+from src.nj import neighbor_joining
+from src.pipeline import run_pipeline
+from src.upgma import condensed_distances, upgma_tree
+from src.visualize_tree import visualize_tree
+
+STAGES = ("parse_fasta", "align", "distances", "distance_store", "nj", "upgma", "visualize_tree", "end_to_end")
+
+# Run once instead of --repeat times
+SLOW_STAGES = ("align", "end_to_end")
+
+# Differences below these are noise, whatever the relative change
+MIN_SECONDS = 0.01
+MIN_MB = 1.0
+
+
+def prepare(directory, taxa, length, divergence, indel_rate, seed):
+    """
+    Writes a case's inputs to directory and returns what the stages need.
+    """
+    ids, rows = simulate_alignment(taxa, length, divergence, indel_rate, seed)
+    case = {
+        "directory": directory,
+        "aligned": os.path.join(directory, "aligned.fa"),
+        "unaligned": os.path.join(directory, "unaligned.fa"),
+        "newick": os.path.join(directory, "nj.newick"),
+    }
+    write_fasta(case["aligned"], ids, rows)
+    write_fasta(case["unaligned"], ids, rows, ungapped=True)
+    alignment = CompactAlignment.from_fasta(case["aligned"])
+    case["ids"] = list(alignment.ids)
+    case["distances"] = identity_distances(alignment.codes)
+    tree = neighbor_joining(case["ids"], case["distances"])
+    Phylo.write(tree, case["newick"], "newick")
+    return case
+
+
+def stage_function(stage, case):
+    """
+    The zero-argument callable that runs one stage on a prepared case.
+    """
+    d = case["directory"]
+    if stage == "parse_fasta":
+        return lambda: sum(1 for _ in parse_fasta(case["unaligned"]))
+    if stage == "align":
+        return lambda: align_sequences(case["unaligned"], os.path.join(d, "muscle.fa"))
+    if stage == "distances":
+        return lambda: identity_distances(CompactAlignment.from_fasta(case["aligned"]).codes)
+    if stage == "distance_store":
+        return lambda: identity_distance_store(CompactAlignment.from_fasta(case["aligned"]).codes,
+                                               os.path.join(d, "distances.npy"))
+    if stage == "nj":
+        return lambda: neighbor_joining(case["ids"], case["distances"])
+    if stage == "upgma":
+        return lambda: upgma_tree(case["ids"], condensed_distances(case["distances"]))
+    if stage == "visualize_tree":
+        return lambda: visualize_tree(case["newick"], os.path.join(d, "nj.png"))
+    if stage == "end_to_end":
+        return lambda: run_pipeline(
+            case["unaligned"], os.path.join(d, "e2e_aligned.fa"),
+            os.path.join(d, "e2e_parsimony.newick"), os.path.join(d, "e2e_ml.newick"),
+            os.path.join(d, "e2e_parsimony.png"), os.path.join(d, "e2e_ml.png"),
+        )
+    raise ValueError(f"stage must be one of {STAGES}.")
+
+
+def measure(fn, repeat):
+    """
+    Returns (best wall time in seconds, tracemalloc peak in MB). The stages'
+    progress prints are swallowed so they don't break up the table.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        return _measure(fn, repeat)
+
+
+def _measure(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(times), peak / 2**20
+
+
+def case_key(result):
+    case = result["case"]
+    return f"{case['taxa']}x{case['length']}@{case['divergence']}/{result['stage']}"
+
+
+def regressions(result, before, tolerance):
+    """
+    What got worse in result compared to the same stage in a baseline.
+    """
+    found = []
+    if before is None or "seconds" not in before or "seconds" not in result:
+        return found
+    if (result["seconds"] > before["seconds"] * (1 + tolerance)
+            and result["seconds"] - before["seconds"] > MIN_SECONDS):
+        found.append(f"time {before['seconds']:.3f} -> {result['seconds']:.3f} s")
+    if (result["peak_mb"] > before["peak_mb"] * (1 + tolerance)
+            and result["peak_mb"] - before["peak_mb"] > MIN_MB):
+        found.append(f"memory {before['peak_mb']:.1f} -> {result['peak_mb']:.1f} MB")
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--taxa", type=int, nargs="+", default=[20, 200, 1000])
+    parser.add_argument("--length", type=int, default=1000)
+    parser.add_argument("--divergence", type=float, default=0.1)
+    parser.add_argument("--indel-rate", type=float, default=0.002)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--align-max", type=int, default=50,
+                        help="Largest taxa count for which align and end_to_end run.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--baseline", help="Compare against results saved with --output.")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed slowdown or memory growth (0.25 = 25%%).")
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if args.baseline:
+        saved = json.loads(Path(args.baseline).read_text())
+        baseline = {case_key(result): result for result in saved["results"]}
+
+    results = []
+    failed = False
+    print(f"{'taxa':>6} {'stage':<15} {'time (s)':>9} {'peak (MB)':>10}  vs baseline")
+    for taxa in args.taxa:
+        with tempfile.TemporaryDirectory() as directory:
+            case = prepare(directory, taxa, args.length, args.divergence, args.indel_rate, args.seed)
+            for stage in args.stages:
+                result = {"case": {"taxa": taxa, "length": args.length, "divergence": args.divergence,
+                                   "indel_rate": args.indel_rate, "seed": args.seed},
+                          "stage": stage}
+                if stage in SLOW_STAGES and taxa > args.align_max:
+                    result["skipped"] = f"more than --align-max={args.align_max} taxa"
+                    print(f"{taxa:>6} {stage:<15} {'skipped':>9}")
+                    results.append(result)
+                    continue
+                repeat = 1 if stage in SLOW_STAGES else args.repeat
+                result["seconds"], result["peak_mb"] = measure(stage_function(stage, case), repeat)
+                worse = regressions(result, baseline.get(case_key(result)), args.tolerance)
+                failed = failed or bool(worse)
+                note = ("REGRESSION: " + ", ".join(worse)) if worse else ("ok" if baseline else "")
+                print(f"{taxa:>6} {stage:<15} {result['seconds']:>9.3f} {result['peak_mb']:>10.1f}  {note}")
+                results.append(result)
+
+    if args.output:
+        meta = {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        Path(args.output).write_text(json.dumps({"meta": meta, "results": results}, indent=2))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""
+Synthetic inputs for the benchmarks: sequences evolved along a random tree.
+
+A coalescent tree with n_taxa tips is scaled to a root-to-tip depth of
+`divergence` substitutions per site. A random root sequence is evolved down
+it under Jukes-Cantor, and optional indels (runs of gaps in the true
+alignment) make the unaligned FASTA something MUSCLE has to work on.
+
+    from benchmarks.synthetic import simulate_alignment, write_fasta
+    ids, rows = simulate_alignment(100, 1000, divergence=0.1, indel_rate=0.002)
+    write_fasta("aligned.fa", ids, rows)
+    write_fasta("unaligned.fa", ids, rows, ungapped=True)
+"""
+import numpy as np
+
+BASES = np.frombuffer(b"ACGT", dtype=np.uint8)
+GAP = ord("-")
+
+# Mean length of an indel run (geometric)
+MEAN_INDEL = 3
+
+
+def coalescent_tree(n_taxa, depth, rng):
+    """
+    Random ultrametric tree: lineages merge pairwise at exponential waiting
+    times (rate k(k-1)/2 with k lineages), then all times are scaled so the
+    root sits `depth` above the tips.
+
+    Returns:
+    - (parent, length): arrays over 2 * n_taxa - 1 nodes. Tips are nodes
+      0..n_taxa-1 and every parent comes after its children, so the root
+      is the last node (parent -1).
+    """
+    n_nodes = 2 * n_taxa - 1
+    parent = np.full(n_nodes, -1, dtype=np.intp)
+    height = np.zeros(n_nodes)
+    lineages = list(range(n_taxa))
+    now = 0.0
+    for node in range(n_taxa, n_nodes):
+        k = len(lineages)
+        now += rng.exponential(2.0 / (k * (k - 1)))
+        a, b = sorted(rng.choice(k, 2, replace=False), reverse=True)
+        parent[lineages.pop(a)] = node
+        parent[lineages.pop(b)] = node
+        lineages.append(node)
+        height[node] = now
+    height *= depth / max(height[-1], 1e-12)
+    length = np.zeros(n_nodes)
+    length[:-1] = height[parent[:-1]] - height[:-1]
+    return parent, length
+
+
+def simulate_alignment(n_taxa, length, divergence=0.1, indel_rate=0.0, seed=0):
+    """
+    True alignment of n_taxa sequences evolved along a coalescent tree.
+
+    Parameters:
+    - n_taxa (int): Number of sequences (at least 2).
+    - length (int): Alignment columns.
+    - divergence (float): Root-to-tip substitutions per site; pairwise
+      p-distances approach 0.75 as it grows.
+    - indel_rate (float): Per-site chance that a gap run starts in a
+      sequence (0 for an ungapped alignment).
+    - seed (int): Random seed.
+
+    Returns:
+    - (ids, rows): IDs "t0", "t1", ... and an (n_taxa, length) uint8 array
+      of ASCII letters with "-" for gaps.
+    """
+    if n_taxa < 2:
+        raise ValueError("n_taxa must be at least 2.")
+    rng = np.random.default_rng(seed)
+    parent, branch = coalescent_tree(n_taxa, divergence, rng)
+
+    # Root to tips: a node's sequence is only kept until its children have theirs
+    codes = {len(parent) - 1: rng.integers(0, 4, length, dtype=np.uint8)}
+    waiting = np.bincount(parent[:-1], minlength=len(parent))
+    for node in range(len(parent) - 2, -1, -1):
+        up = parent[node]
+        changed = rng.random(length) < 0.75 * (1 - np.exp(-4 * branch[node] / 3))
+        seq = codes[up].copy()
+        seq[changed] = (seq[changed] + rng.integers(1, 4, changed.sum(), dtype=np.uint8)) % 4
+        codes[node] = seq
+        waiting[up] -= 1
+        if waiting[up] == 0:
+            del codes[up]
+
+    rows = BASES[np.stack([codes[tip] for tip in range(n_taxa)])]
+    if indel_rate > 0:
+        starts = np.argwhere(rng.random(rows.shape) < indel_rate)
+        runs = rng.geometric(1 / MEAN_INDEL, len(starts))
+        for (row, col), run in zip(starts, runs):
+            rows[row, col:col + run] = GAP
+    return [f"t{i}" for i in range(n_taxa)], rows
+
+
+def write_fasta(path, ids, rows, ungapped=False, width=80):
+    """
+    Writes rows as FASTA, wrapped at width; ungapped=True drops the gaps
+    (an unaligned input for the aligner).
+    """
+    with open(path, "w") as f:
+        for name, row in zip(ids, rows):
+            seq = row.tobytes().decode("ascii")
+            if ungapped:
+                seq = seq.replace("-", "")
+            f.write(f">{name}\n")
+            for start in range(0, len(seq), width):
+                f.write(seq[start:start + width] + "\n")
@@ -0,0 +1,27 @@
+# gunicorn.conf.py
+#
+# Gunicorn settings for the web app; `gunicorn main:server` reads this file
+# from the project root. The app is imported once in the master process and
+# the workers are forked from it (preload_app), so Dash, Flask and the app
+# module are shared copy-on-write and recycled workers start without
+# importing anything. Analysis jobs run in their own processes (see
+# src/jobs.py), which preload the scientific stack separately.
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+threads = int(os.environ.get("SIMPLEPHYLO_THREADS", "4"))
+timeout = 300
+preload_app = True
+
+# Workers are recycled now and then; with preload_app that is just a fork
+max_requests = int(os.environ.get("SIMPLEPHYLO_MAX_REQUESTS", "1000"))
+max_requests_jitter = 100
+
+
+def when_ready(server):
+    # Objects imported so far never change; moving them out of the garbage
+    # collector's reach keeps collections in the workers from touching (and
+    # so copying) the shared pages
+    gc.freeze()
@@ -1,26 +1,77 @@
 import base64
-from io import StringIO
-from Bio import SeqIO
 import os
 import subprocess
 
+from src.fasta_parser import FastaValidator, iter_fasta_bytes
+from src.workspace import Workspace
+
+# Largest FASTA the /upload route accepts (override from the environment)
+MAX_UPLOAD_BYTES = int(os.environ.get("SIMPLEPHYLO_MAX_UPLOAD_MB", 50)) * 1024 * 1024
+
+# Bytes read from the request and written to disk at a time
+UPLOAD_CHUNK = 64 * 1024
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload goes over MAX_UPLOAD_BYTES."""
+
+
 def parse_uploaded_fasta(contents):
+    # Yields lightweight records straight from the decoded bytes
     content_type, content_string = contents.split(',')
-    decoded = base64.b64decode(content_string).decode('utf-8')
-    fasta_io = StringIO(decoded)
-    records = list(SeqIO.parse(fasta_io, "fasta"))
-    return records
+    decoded = base64.b64decode(content_string)
+    return iter_fasta_bytes(decoded)
 
-def save_fasta_and_align(contents):
-    # Decode and save uploaded FASTA
+def save_uploaded_fasta(contents, input_path="data/uploaded_input.fa"):
+    # Decode and save uploaded FASTA, returning its absolute path
     content_string = contents.split(",")[1]
     decoded = base64.b64decode(content_string)
-    
-    input_path = os.path.abspath("data/uploaded_input.fa")
-    output_path = os.path.abspath("output/aligned_sequences.fasta")
-    
+
+    input_path = os.path.abspath(input_path)
     with open(input_path, "wb") as f:
         f.write(decoded)
+    return input_path
+
+def save_upload_stream(stream, input_path, max_bytes=MAX_UPLOAD_BYTES, chunk_size=UPLOAD_CHUNK):
+    """
+    Copies an uploaded FASTA from a file-like stream (e.g. Flask's
+    request.stream) to input_path chunk by chunk, validating it on the way,
+    so neither the raw nor a base64 copy of the file is ever held in memory.
+
+    Raises UploadTooLargeError once more than max_bytes arrive and
+    ValueError at the first invalid line; either way the partial file is
+    removed.
+
+    Returns:
+    - dict with the "sequences" and "bytes" received.
+    """
+    validator = FastaValidator()
+    received = 0
+    try:
+        with open(input_path, "wb") as f:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                received += len(chunk)
+                if received > max_bytes:
+                    raise UploadTooLargeError(
+                        f"File is larger than the {max_bytes // (1024 * 1024)} MB upload limit."
+                    )
+                validator.feed(chunk)
+                f.write(chunk)
+        validator.close()
+    except ValueError:
+        os.remove(input_path)
+        raise
+    return {"sequences": validator.records, "bytes": received}
+
+def save_fasta_and_align(contents, workspace=None):
+    # Each call works in its own job workspace unless one is passed in
+    if workspace is None:
+        workspace = Workspace.create()
+    input_path = save_uploaded_fasta(contents, workspace.input_fasta)
+    output_path = workspace.aligned_fasta
 
     # Run MUSCLE 
     muscle_path = os.path.join(".", "bin", "muscle")
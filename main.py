@@ -1,12 +1,17 @@
 import dash
-from dash import dcc, html, Input, Output, State
+from dash import dcc, html, ClientsideFunction, Input, MATCH, Output, State
 import dash_bootstrap_components as dbc
-import os, shutil
-from flask import send_from_directory
-
-from handle_upload import parse_uploaded_fasta, save_fasta_and_align
-from src.build_tree import build_parsimony_tree, build_likelihood_tree
-from src.visualize_tree import visualize_tree
+import os, shutil, time
+from urllib.parse import unquote
+from flask import Response, abort, jsonify, request, send_from_directory
+
+from handle_upload import MAX_UPLOAD_BYTES, UploadTooLargeError, save_upload_stream
+from src.jobs import JobQueue, QueueFullError
+from src.cache import ResultCache, cache_key
+from src.instrument import MetricsStore
+from src.pipeline import COLUMN_FILTER, WORKER_MODULES, pipeline_params, run_in_workspace
+from src.workspace import (PUBLIC_FILES, Workspace, WorkspaceQuotaError,
+                           sweep_workspaces)
 
 # ─── Set up Dash & Flask server ─────────────────────────────────────────────
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.FLATLY])
@@ -17,12 +22,96 @@ server = app.server
 def serve_tree_image(filename):
     return send_from_directory("output/tree_images", filename)
 
-# ─── File paths ──────────────────────────────────────────────────────────────
-ALIGNED_FASTA = "output/aligned_sequences.fasta"
-TREE_FILE_PARS  = "output/parsimony_tree.newick"
-TREE_IMG_PARS   = "output/tree_images/parsimony_tree.png"
-TREE_FILE_ML    = "output/ml_tree.newick"
-TREE_IMG_ML     = "output/tree_images/ml_tree.png"
+# Serve a job's tree images and layouts straight from its workspace
+@server.route("/output/jobs/<job_id>/<filename>")
+def serve_job_image(job_id, filename):
+    workspace = Workspace.open(job_id)
+    if workspace is None or filename not in PUBLIC_FILES:
+        abort(404)
+    return send_from_directory(workspace.path, filename)
+
+# Result cache hit/miss counters (for this worker process) and size
+@server.route("/cache/stats")
+def serve_cache_stats():
+    return jsonify(cache.stats())
+
+# Per-stage timings and resources of all finished jobs, for Prometheus
+@server.route("/metrics")
+def serve_metrics():
+    return Response(MetricsStore().render(), mimetype="text/plain; version=0.0.4")
+
+# Uploads stream straight into a fresh workspace (validated on the way in);
+# the page only keeps the returned upload ID, never the file itself
+@server.route("/upload", methods=["POST"])
+def upload_fasta():
+    if request.content_length is not None and request.content_length > MAX_UPLOAD_BYTES:
+        return jsonify(error=f"File is larger than the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB upload limit."), 413
+    filename = os.path.basename(unquote(request.headers.get("X-Filename", "upload.fa")))
+    try:
+        sweep_old_workspaces()
+        workspace = Workspace.create()
+    except WorkspaceQuotaError as e:
+        return jsonify(error=str(e)), 503
+    # "uploaded" workspaces are not protected from the sweep, so abandoned uploads expire
+    workspace.write_status({"status": "uploaded", "filename": filename})
+    try:
+        received = save_upload_stream(request.stream, workspace.input_fasta)
+    except ValueError as e:
+        shutil.rmtree(workspace.path, ignore_errors=True)
+        return jsonify(error=str(e)), 413 if isinstance(e, UploadTooLargeError) else 400
+    workspace.write_status({"status": "uploaded", "filename": filename, **received})
+    return jsonify(upload_id=workspace.job_id, filename=filename, **received)
+
+# ─── Background analysis jobs ────────────────────────────────────────────────
+# Every job runs in its own workspace (src/workspace.py), so several can run
+# at once and any gunicorn worker can report on any job via its status.json.
+jobs = JobQueue(
+    max_workers=int(os.environ.get("SIMPLEPHYLO_WORKERS", "2")),
+    max_queued=int(os.environ.get("SIMPLEPHYLO_MAX_QUEUED", "8")),
+    preload=WORKER_MODULES,
+)
+
+# Finished results by input content, so repeat uploads skip the whole pipeline
+cache = ResultCache()
+
+# Replicates run when the bootstrap switch is on (at most)
+BOOTSTRAP_REPLICATES = int(os.environ.get("SIMPLEPHYLO_BOOTSTRAP", "100"))
+
+# Every replicate repeats both tree searches, so larger inputs get fewer
+# replicates: replicates x input size stays within this many bytes, and
+# inputs that would get fewer than BOOTSTRAP_MIN_REPLICATES skip it
+BOOTSTRAP_BUDGET = int(os.environ.get("SIMPLEPHYLO_BOOTSTRAP_BUDGET_MB", "5")) * 1024 * 1024
+BOOTSTRAP_MIN_REPLICATES = 10
+
+def bootstrap_replicates(input_fasta):
+    """Replicates to run for an input when the bootstrap switch is on."""
+    replicates = min(BOOTSTRAP_REPLICATES, BOOTSTRAP_BUDGET // max(os.path.getsize(input_fasta), 1))
+    return replicates if replicates >= BOOTSTRAP_MIN_REPLICATES else 0
+
+# How the results page names and explains each tree builder (see the
+# pipeline result's "methods"); MinHash runs have no alignment, so they get
+# the NJ and UPGMA trees
+METHOD_TITLES = {"mp": "Parsimony Tree", "nj": "NJ Tree", "ml": "ML Tree", "upgma": "UPGMA Tree"}
+METHOD_NOTES = {
+    "mp": "Parsimony is the tree needing the fewest mutations (Fitch score, NNI/SPR search from neighbor joining).",
+    "nj": "Parsimony needs aligned nucleotide sites, so the first tree is a neighbor-joining tree built from the distances.",
+    "ml": "ML is a maximum‐likelihood tree ({model} model, NNI search from neighbor joining).",
+    "upgma": "Maximum likelihood needs aligned nucleotide sites that fit in memory, so the second tree is a UPGMA tree built from the distances.",
+}
+DEFAULT_METHODS = {
+    "identity": {"parsimony": "mp", "likelihood": "ml", "model": "HKY"},
+    "minhash": {"parsimony": "nj", "likelihood": "upgma"},
+}
+
+# Expired workspaces are swept at most once a minute, when a job is submitted
+SWEEP_INTERVAL = 60
+_last_sweep = 0.0
+
+def sweep_old_workspaces():
+    global _last_sweep
+    if time.time() - _last_sweep >= SWEEP_INTERVAL:
+        _last_sweep = time.time()
+        sweep_workspaces()
 
 # ─── Theme colors (we’ll now only use “light”) ───────────────────────────────
 LIGHT_BG = "white"
@@ -59,7 +148,7 @@ app.layout = html.Div(
                                 html.H4("Welcome to SimplePhylo", style={"marginBottom": "0.25rem"}),
                                 html.P(
                                     "This tool aligns your FASTA sequences (best with 10 or fewer at a time) "
-                                    "and builds parsimony/ML‐style trees. Please be patient—alignments can take a minute or two ✌️💜",
+                                    "and builds parsimony/ML trees. Please be patient—alignments can take a minute or two ✌️💜",
                                     style={"marginTop": "0", "fontSize": "0.95rem"}
                                 )
                             ],
@@ -105,8 +194,10 @@ app.layout = html.Div(
                         dbc.Row(
                             dbc.Col(
                                 [
-                                    # Upload box (background tinted light purple)
-                                    dcc.Upload(
+                                    # Upload box (background tinted light purple). assets/upload.js
+                                    # streams the chosen or dropped file to /upload and stores the
+                                    # returned upload ID in "upload-id"
+                                    html.Div(
                                         id="upload-fasta",
                                         children=html.Div(
                                             [
@@ -114,6 +205,8 @@ app.layout = html.Div(
                                                 html.A("Select a FASTA File")
                                             ]
                                         ),
+                                        **{"data-url": app.get_relative_path("/upload"),
+                                           "data-max-bytes": MAX_UPLOAD_BYTES},
                                         style={
                                             "width": "100%",
                                             "height": "80px",
@@ -124,29 +217,82 @@ app.layout = html.Div(
                                             "textAlign": "center",
                                             "margin": "10px 0",
                                             "backgroundColor": "#F3E5F5",  # light lavender
-                                        },
-                                        multiple=False
+                                            "cursor": "pointer"
+                                        }
                                     ),
+                                    dcc.Store(id="upload-id"),
 
                                     # Show file‐status message
                                     html.Div(id="file-status"),
 
-                                    # Analyze button
+                                    # Distance mode: aligned (MUSCLE) or alignment-free (MinHash)
+                                    dbc.RadioItems(
+                                        id="distance-mode",
+                                        options=[
+                                            {"label": "Align with MUSCLE (identity distances)", "value": "identity"},
+                                            {"label": "Quick look: alignment-free k-mer distances (MinHash)", "value": "minhash"}
+                                        ],
+                                        value="identity",
+                                        className="mt-2"
+                                    ),
+
+                                    # Optional bootstrap supports on both trees (aligned mode only)
+                                    dbc.Checklist(
+                                        id="bootstrap",
+                                        options=[
+                                            {"label": f"Bootstrap supports (up to {BOOTSTRAP_REPLICATES} replicates; fewer or none for large inputs)",
+                                             "value": "on"}
+                                        ],
+                                        value=[],
+                                        switch=True,
+                                        className="mt-2"
+                                    ),
+
+                                    # Optional column filter before distances and trees (aligned mode only)
+                                    dbc.Checklist(
+                                        id="trim-columns",
+                                        options=[
+                                            {"label": "Trim gappy columns and ragged ends", "value": "on"}
+                                        ],
+                                        value=[],
+                                        switch=True,
+                                        className="mt-2"
+                                    ),
+
+                                    # Add the upload's new sequences to the last analysis instead of starting over
+                                    dbc.Checklist(
+                                        id="add-mode",
+                                        options=[
+                                            {"label": "Add new sequences to the previous analysis", "value": "on"}
+                                        ],
+                                        value=[],
+                                        switch=True,
+                                        className="mt-2"
+                                    ),
+
+                                    # Analyze + Cancel buttons
                                     dbc.Button(
                                         "Analyze",
                                         id="analyze-button",
                                         color="success",
                                         className="mt-3"
                                     ),
+                                    dbc.Button(
+                                        "Cancel",
+                                        id="cancel-button",
+                                        color="secondary",
+                                        outline=True,
+                                        className="mt-3 ms-2"
+                                    ),
 
-                                    # ─── Wrap the output in a dcc.Loading spinner ───
-                                    dcc.Loading(
-                                        id="loading-analysis",
-                                        type="circle",      # “circle” spinner
-                                        children=html.Div(
-                                            id="analysis-output",
-                                            className="mt-4"
-                                        )
+                                    # ─── Job bookkeeping: ID of the running job + status poller ───
+                                    dcc.Store(id="job-id"),
+                                    dcc.Interval(id="job-poll", interval=1000, disabled=True),
+
+                                    # Output: queue/progress messages, then the trees
+                                    html.Div(
+                                        id="analysis-output",
+                                        className="mt-4"
                                     )
                                 ],
                                 width=8, className="mx-auto"
@@ -161,6 +307,17 @@ app.layout = html.Div(
                         dbc.Tooltip(
                             "Run alignment and generate both trees.",
                             target="analyze-button", placement="right"
+                        ),
+                        dbc.Tooltip(
+                            f"Drops columns where more than {COLUMN_FILTER['max_gap_fraction']:.0%} of the sequences "
+                            f"have a gap and trims ends covered by fewer than {COLUMN_FILTER['min_end_occupancy']:.0%}, "
+                            "so big alignments finish faster. Invariant sites are merged without changing the trees.",
+                            target="trim-columns", placement="bottom"
+                        ),
+                        dbc.Tooltip(
+                            "Only the sequences the previous analysis doesn't have are aligned and placed "
+                            "into its trees. Upload just the new sequences or the whole grown file.",
+                            target="add-mode", placement="bottom"
                         )
                     ]
                 )
@@ -241,119 +398,243 @@ app.layout = html.Div(
 # ─── End UPDATED layout block ────────────────────────────────────────────────
 
 
-# ─── Callbacks for upload & analysis (UNCHANGED aside from loading spinner) ───
+# ─── Callbacks for upload & analysis ────────────────────────────────────────
 
 # Upload feedback
 @app.callback(
     Output("file-status", "children"),
-    Input("upload-fasta", "contents"),
-    State("upload-fasta", "filename")
+    Input("upload-id", "data")
 )
-def handle_upload(contents, filename):
-    if contents:
-        return f"✅ Uploaded file: {filename}"
-    return ""
-
-
-# Tree analysis callback
+def handle_upload(upload):
+    if not upload:
+        return ""
+    if upload.get("error"):
+        return f"❌ {upload['error']}"
+    if upload.get("status") == "uploading":
+        return f"⏳ Uploading {upload['filename']}…"
+    return f"✅ Uploaded file: {upload['filename']} ({upload['sequences']} sequences)"
+
+
+def upload_workspace(upload):
+    """
+    The workspace holding an upload's input.fa, ready for a new job, or
+    None if there is no finished upload or it has expired. The first
+    analysis runs in the upload's own workspace; later ones (e.g. other
+    settings) get a copy of the input.
+    """
+    if not upload or "upload_id" not in upload:
+        return None
+    workspace = Workspace.open(upload["upload_id"])
+    if workspace is None or not os.path.exists(workspace.input_fasta):
+        return None
+    if workspace.read_status().get("status") == "uploaded":
+        workspace.write_status({"status": "queued", "stage": None, "step": 0, "total": 0})
+        return workspace
+    copy = Workspace.create()
+    shutil.copyfile(workspace.input_fasta, copy.input_fasta)
+    return copy
+
+
+# Tree analysis: submit a background job, then poll it until it finishes
 @app.callback(
+    Output("job-id", "data"),
+    Output("job-poll", "disabled"),
     Output("analysis-output", "children"),
     Input("analyze-button", "n_clicks"),
-    State("upload-fasta", "contents"),
-    State("upload-fasta", "filename")
+    State("upload-id", "data"),
+    State("distance-mode", "value"),
+    State("bootstrap", "value"),
+    State("trim-columns", "value"),
+    State("add-mode", "value"),
+    State("job-id", "data")
 )
-def run_analysis(n_clicks, contents, filename):
-    if n_clicks and contents:
+def run_analysis(n_clicks, upload, distance_mode="identity", bootstrap=None, trim=None, add_mode=None,
+                 previous_job=None):
+    if n_clicks and upload and "upload_id" in upload:
+        workspace = None
+        # Filtering works on the MUSCLE alignment; added sequences reuse the earlier columns
+        column_filter = COLUMN_FILTER if trim and distance_mode == "identity" and not add_mode else None
+        base = None
+        if add_mode:
+            base = Workspace.open(previous_job)
+            if (base is None or distance_mode != "identity" or base.read_status().get("status") != "done"
+                    or not os.path.exists(base.aligned_fasta)):
+                return dash.no_update, True, ("⚠️ New sequences can only be added to a finished MUSCLE analysis "
+                                              "from this session. Run a full analysis first.")
+            if (base.read_status().get("result") or {}).get("column_filter"):
+                return dash.no_update, True, ("⚠️ The previous analysis trimmed its alignment, so new sequences "
+                                              "can't be added to it. Run a full analysis instead.")
         try:
-            records = parse_uploaded_fasta(contents)
-            num_seqs = len(records)
-
-            align_message = save_fasta_and_align(contents)
-
-            # Build both trees:
-            build_parsimony_tree(
-                os.path.abspath(ALIGNED_FASTA),
-                os.path.abspath(TREE_FILE_PARS)
-            )
-            build_likelihood_tree(
-                os.path.abspath(ALIGNED_FASTA),
-                os.path.abspath(TREE_FILE_ML)
-            )
+            sweep_old_workspaces()
+            workspace = upload_workspace(upload)
+            if workspace is None:
+                return None, True, "⚠️ This upload has expired. Please upload the file again."
+            # Bootstrapping resamples alignment columns, so MinHash mode has none
+            replicates = 0
+            if bootstrap and distance_mode == "identity":
+                replicates = bootstrap_replicates(workspace.input_fasta)
+            # Added-to results depend on the earlier analysis, so they skip the cache
+            key = None
+            if base is None:
+                key = cache_key(workspace.input_fasta, pipeline_params(distance_mode, replicates, column_filter))
+                cached = cache.restore(key, workspace.path)
+                if cached is not None:
+                    message = "⚡ Same input and settings as an earlier analysis: reused its results."
+                    # Entries cached before methods were recorded follow the distance mode
+                    methods = cached.get("methods") or DEFAULT_METHODS[distance_mode]
+                    workspace.write_status({"status": "done", "result": {"num_seqs": cached["num_seqs"], "message": message,
+                                                                         "column_filter": column_filter,
+                                                                         "methods": methods}})
+                    return workspace.job_id, True, analysis_results(cached["num_seqs"], message, workspace.job_id,
+                                                                    methods)
+            job_id = jobs.submit(run_in_workspace, workspace.path, job_id=workspace.job_id,
+                                 cache_key=key, distance_mode=distance_mode,
+                                 bootstrap=replicates, base=None if base is None else base.path,
+                                 column_filter=column_filter)
+        except (QueueFullError, WorkspaceQuotaError) as e:
+            if workspace is not None:
+                shutil.rmtree(workspace.path, ignore_errors=True)
+            return None, True, f"⏳ {e}"
+        except Exception as e:
+            return None, True, f"❌ Error: {str(e)}"
+        return job_id, False, progress_view({"status": "queued"})
 
-            visualize_tree(
-                os.path.abspath(TREE_FILE_PARS),
-                os.path.abspath(TREE_IMG_PARS),
-                show_plot=False
-            )
-            visualize_tree(
-                os.path.abspath(TREE_FILE_ML),
-                os.path.abspath(TREE_IMG_ML),
-                show_plot=False
-            )
+    # If the user hasn’t uploaded a file yet:
+    return None, True, "⚠️ No file uploaded."
 
-            # Now return a container that places each H5 immediately above its own image:
-            return html.Div(
-                [
-                    # 1) Status paragraph
-                    html.P(f"✅ Parsed {num_seqs} sequence(s). {align_message}"),
 
-                    # 2) “What’s the difference?” explanation block (unchanged)
-                    html.Div(
-                        [
-                            html.Div(
-                                [
-                                    html.P(
-                                        "🔍 What's the difference?",
-                                        style={"fontWeight": "bold"}
-                                    ),
-                                    html.Ul(
-                                        [
-                                            html.Li("Parsimony minimizes evolutionary changes; simple & fast."),
-                                            html.Li("ML‐style reflects rates via UPGMA on identity‐based distances.")
-                                        ]
-                                    )
-                                ],
-                                style={
-                                    "backgroundColor": "#f8f9fa",
-                                    "border": "1px solid #ccc",
-                                    "borderRadius": "5px",
-                                    "padding": "10px",
-                                    "marginTop": "20px",
-                                    "fontSize": "0.9rem"
-                                }
-                            )
-                        ]
-                    ),
+@app.callback(
+    Output("analysis-output", "children", allow_duplicate=True),
+    Output("job-poll", "disabled", allow_duplicate=True),
+    Input("job-poll", "n_intervals"),
+    State("job-id", "data"),
+    prevent_initial_call=True
+)
+def poll_analysis(n_intervals, job_id):
+    info = jobs.status(job_id)
+    if info["status"] == "unknown":
+        # Submitted through another worker process: ask its workspace instead
+        workspace = Workspace.open(job_id)
+        if workspace is not None:
+            info = workspace.read_status()
+    if info["status"] in ("queued", "running"):
+        return progress_view(info), False
+    if info["status"] == "done":
+        result = info["result"]
+        return analysis_results(result["num_seqs"], result["message"], job_id, result.get("methods")), True
+    if info["status"] == "cancelled":
+        return "🛑 Analysis cancelled.", True
+    if info["status"] == "failed":
+        return f"❌ Error: {info['error']}", True
+    return "⚠️ This analysis is no longer available. Please run it again.", True
 
-                    # 3) Parsimony Tree section (label + image)
-                    html.Div(
-                        [
-                            html.H5("Parsimony Tree", style={"marginTop": "20px"}),
-                            html.Img(
-                                src="/output/tree_images/parsimony_tree.png",
-                                style={"maxWidth": "100%", "marginTop": "10px"}
-                            )
-                        ]
-                    ),
 
-                    # 4) ML‐style Tree section (label + image)
+@app.callback(
+    Output("analysis-output", "children", allow_duplicate=True),
+    Input("cancel-button", "n_clicks"),
+    State("job-id", "data"),
+    prevent_initial_call=True
+)
+def cancel_analysis(n_clicks, job_id):
+    workspace = Workspace.open(job_id)
+    if workspace is None or workspace.read_status().get("status") not in ("queued", "running"):
+        return dash.no_update
+    workspace.request_cancel()
+    if jobs.cancel(job_id) and jobs.status(job_id)["status"] == "cancelled":
+        # Dropped before it started, so the job never gets to record it
+        workspace.write_status({"status": "cancelled"})
+    return "🛑 Cancelling…"
+
+
+def progress_view(info):
+    """Queue position / stage progress shown while a job runs."""
+    if info["status"] == "queued" or not info.get("total"):
+        return html.P("⏳ Waiting for a free worker…")
+    step, total = info["step"], info["total"]
+    return html.Div(
+        [
+            html.P(f"⚙️ {info['stage']} (step {step + 1} of {total})…"),
+            dbc.Progress(value=100 * step / total, striped=True, animated=True)
+        ]
+    )
+
+
+def analysis_results(num_seqs, align_message, job_id, methods=None):
+    """
+    Status line, explanation and both tree views for a finished job.
+    methods is the pipeline result's "methods" (which tree builders ran);
+    None means the aligned defaults.
+    """
+    methods = methods or DEFAULT_METHODS["identity"]
+    return html.Div(
+        [
+            # 1) Status paragraph
+            html.P(f"✅ Parsed {num_seqs} sequence(s). {align_message}"),
+
+            # 2) “What’s the difference?” explanation block (unchanged)
+            html.Div(
+                [
                     html.Div(
                         [
-                            html.H5("ML‐style Tree", style={"marginTop": "20px"}),
-                            html.Img(
-                                src="/output/tree_images/ml_tree.png",
-                                style={"maxWidth": "100%", "marginTop": "10px"}
-                            )
-                        ]
+                            html.P(
+                                "🔍 What's the difference?",
+                                style={"fontWeight": "bold"}
+                            ),
+                            html.Ul([html.Li(METHOD_NOTES[methods["parsimony"]].format(**methods)),
+                                     html.Li(METHOD_NOTES[methods["likelihood"]].format(**methods))])
+                        ],
+                        style={
+                            "backgroundColor": "#f8f9fa",
+                            "border": "1px solid #ccc",
+                            "borderRadius": "5px",
+                            "padding": "10px",
+                            "marginTop": "20px",
+                            "fontSize": "0.9rem"
+                        }
                     )
                 ]
+            ),
+
+            # 3) Both trees, drawn in the browser from their layout JSON
+            tree_view(job_id, "parsimony", METHOD_TITLES[methods["parsimony"]]),
+            tree_view(job_id, "ml", METHOD_TITLES[methods["likelihood"]])
+        ]
+    )
+
+
+def tree_view(job_id, name, title):
+    """
+    Interactive view of one tree. The server only hands out the URL of the
+    tree's layout JSON; assets/tree_view.js fetches and draws it, and
+    handles collapsing, zoom and level of detail without calling back.
+    """
+    return html.Div(
+        [
+            html.H5(title, style={"marginTop": "20px"}),
+            dcc.Store(id={"type": "tree-source", "tree": name},
+                      data=app.get_relative_path(f"/output/jobs/{job_id}/{name}_tree.layout.json")),
+            dcc.Graph(id={"type": "tree-graph", "tree": name},
+                      config={"displaylogo": False, "scrollZoom": True}),
+            html.Small(
+                [
+                    "Click a node to collapse or expand its clade; drag to zoom, double-click to reset. ",
+                    html.A("Download PNG", href=app.get_relative_path(f"/output/jobs/{job_id}/{name}_tree.png"),
+                           download=f"{name}_tree.png")
+                ],
+                className="text-muted"
             )
+        ]
+    )
 
-        except Exception as e:
-            return f"❌ Error: {str(e)}"
 
-    # If the user hasn’t uploaded a file yet:
-    return "⚠️ No file uploaded."
+# Tree views are redrawn client-side (see assets/tree_view.js)
+app.clientside_callback(
+    ClientsideFunction(namespace="tree_view", function_name="render"),
+    Output({"type": "tree-graph", "tree": MATCH}, "figure"),
+    Input({"type": "tree-source", "tree": MATCH}, "data"),
+    Input({"type": "tree-graph", "tree": MATCH}, "clickData"),
+    Input({"type": "tree-graph", "tree": MATCH}, "relayoutData")
+)
 
 
 # ─── Run server ───────────────────────────────────────────────────────────────
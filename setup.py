@@ -22,6 +22,7 @@ setup(
         "dash",
         "dash-bootstrap-components",
         "biopython",
+        "numpy>=2.0",  # np.bitwise_count (parsimony popcounts)
         "matplotlib",
         "scipy",
         "click",
@@ -31,10 +32,10 @@ setup(
         "License :: OSI Approved :: MIT License",
         "Operating System :: OS Independent"
     ],
-    python_requires=">=3.8",
+    python_requires=">=3.9",
     entry_points={
         "console_scripts": [
-            "tree-analyzer=app:main"
+            "tree-analyzer=src.cli:main"
         ]
     }
 )
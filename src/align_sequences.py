@@ -1,30 +1,292 @@
-import os, subprocess
+import os, shutil, subprocess, sys, tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
-def align_sequences(input_fasta: str, output_fasta: str):
+import numpy as np
+
+from .fasta_parser import FastaIndex, iter_fasta
+
+try:
+    import resource
+except ImportError:  # Windows: no per-process memory limits
+    resource = None
+
+# Run as `python -c _LIMIT_AND_EXEC <bytes> <command...>` where
+# resource.prlimit is missing (macOS)
+_LIMIT_AND_EXEC = (
+    "import os, resource, sys; limit = int(sys.argv[1]); "
+    "resource.setrlimit(resource.RLIMIT_AS, (limit, limit)); os.execv(sys.argv[2], sys.argv[2:])"
+)
+
+# Inputs larger than this are aligned group by group (see align_divide_and_conquer)
+LARGE_INPUT_BYTES = 10 * 1024 * 1024
+
+# Per-subprocess limits; 0 means unlimited. Override from the environment.
+MUSCLE_MEMORY_MB = int(os.environ.get("SIMPLEPHYLO_MUSCLE_MEMORY_MB", 0))
+MUSCLE_TIME_LIMIT = int(os.environ.get("SIMPLEPHYLO_MUSCLE_TIMEOUT", 0))
+
+# Divide-and-conquer settings: sequences per group, k-mer length and the
+# number of hashed k-mer buckets used to compare sequences
+GROUP_SIZE = 200
+KMER = 5
+KMER_BUCKETS = 512
+
+
+def _muscle_path():
     muscle_path = os.path.join("bin", "muscle")
     if not os.path.isfile(muscle_path):
         raise FileNotFoundError(f"MUSCLE binary not found at {muscle_path}")
+    return muscle_path
+
+
+def _run_muscle(args, memory_limit_mb=None, time_limit=None, running=None):
+    """
+    Runs MUSCLE with optional address-space (MB) and wall-clock (s) limits.
+    Raises CalledProcessError / TimeoutExpired like subprocess.run. If the
+    wait is interrupted (e.g. a cancelled job), MUSCLE is killed. While it
+    runs, the process is kept in the set running, if given, so the caller
+    can kill it from another thread.
 
-    # skip if huge
-    if os.path.getsize(input_fasta) > 10 * 1024 * 1024:
-        print(f"⚠️ Warning: {input_fasta} is large. Consider aligning manually.")
-        return
+    This is called from worker threads, so the memory limit is not set with
+    preexec_fn (unsafe once a process has threads): it is applied to the
+    started process with prlimit, or, where there is no prlimit, by a small
+    interpreter that sets it and then execs MUSCLE.
+    """
+    memory_limit_mb = MUSCLE_MEMORY_MB if memory_limit_mb is None else memory_limit_mb
+    time_limit = MUSCLE_TIME_LIMIT if time_limit is None else time_limit
+    limit = memory_limit_mb * 1024 * 1024 if memory_limit_mb and resource is not None else 0
+    use_prlimit = limit and hasattr(resource, "prlimit")
+
+    command = [_muscle_path(), *args]
+    if limit and not use_prlimit:
+        command = [sys.executable, "-S", "-c", _LIMIT_AND_EXEC, str(limit), *command]
+    with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True) as proc:
+        if running is not None:
+            running.add(proc)
+        try:
+            if use_prlimit:
+                try:
+                    resource.prlimit(proc.pid, resource.RLIMIT_AS, (limit, limit))
+                except ProcessLookupError:
+                    pass  # already finished
+            stdout, stderr = proc.communicate(timeout=time_limit or None)
+        except BaseException:
+            proc.kill()
+            proc.wait()
+            raise
+        finally:
+            if running is not None:
+                running.discard(proc)
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, command, stdout, stderr)
+    return subprocess.CompletedProcess(command, proc.returncode, stdout, stderr)
+
+
+def align_sequences(input_fasta: str, output_fasta: str, mode="auto", max_workers=None,
+                    memory_limit_mb=None, time_limit=None):
+    """
+    Aligns a FASTA file with MUSCLE.
+
+    Parameters:
+    - input_fasta (str): Unaligned sequences.
+    - output_fasta (str): Where the alignment is written.
+    - mode (str): "single" (one MUSCLE run), "divide" (align_divide_and_conquer)
+      or "auto", which divides inputs larger than LARGE_INPUT_BYTES.
+    - max_workers (int or None): Parallel MUSCLE processes in divide mode.
+    - memory_limit_mb / time_limit (int or None): Per-MUSCLE-process limits;
+      None uses SIMPLEPHYLO_MUSCLE_MEMORY_MB / SIMPLEPHYLO_MUSCLE_TIMEOUT.
+
+    A failed single run is reported and leaves no output file; in divide
+    mode a failure raises RuntimeError (see align_divide_and_conquer).
+    """
+    _muscle_path()
+
+    if mode == "auto":
+        mode = "divide" if os.path.getsize(input_fasta) > LARGE_INPUT_BYTES else "single"
+    if mode == "divide":
+        print(f"ℹ️ {input_fasta} is large: aligning it in groups.")
+        return align_divide_and_conquer(input_fasta, output_fasta, max_workers=max_workers,
+                                        memory_limit_mb=memory_limit_mb, time_limit=time_limit)
 
     # CORRECT flags: -in / -out
-    command = [muscle_path,
-               "-in",  input_fasta,
+    command = ["-in",  input_fasta,
                "-out", output_fasta]
 
     try:
-        result = subprocess.run(
-            command,
-            check=True,
-            capture_output=True,
-            text=True,
-        )
+        result = _run_muscle(command, memory_limit_mb, time_limit)
         print("✅ Alignment complete.")
     except subprocess.CalledProcessError as e:
         print("❌ Alignment failed.")
         print("STDOUT:\n", e.stdout)
         print("STDERR:\n", e.stderr)
-        
+    except subprocess.TimeoutExpired as e:
+        print(f"❌ Alignment failed: MUSCLE took longer than {e.timeout:.0f} s.")
+
+
+def add_to_alignment(aligned_fasta, new_fasta, output_fasta, memory_limit_mb=None, time_limit=None):
+    """
+    Adds new sequences to an existing alignment without realigning it: the
+    new sequences are aligned among themselves, then merged into the old
+    alignment with MUSCLE's profile-profile mode, which only inserts gap
+    columns into the old rows.
+
+    Parameters:
+    - aligned_fasta (str): The existing alignment.
+    - new_fasta (str): Unaligned new sequences (IDs not in aligned_fasta).
+    - output_fasta (str): Where the combined alignment is written: the old
+      rows in their old order, then the new ones in input order.
+    - memory_limit_mb / time_limit (int or None): Per-process limits (see align_sequences).
+
+    Raises RuntimeError if MUSCLE fails.
+    """
+    _muscle_path()
+    workdir = tempfile.mkdtemp(prefix="add-", dir=os.path.dirname(os.path.abspath(output_fasta)))
+    try:
+        profile = new_fasta
+        if sum(1 for _ in iter_fasta(new_fasta)) > 1:
+            profile = os.path.join(workdir, "new.aln")
+            _run_muscle(["-in", new_fasta, "-out", profile], memory_limit_mb, time_limit)
+        merged = os.path.join(workdir, "merged.aln")
+        _run_muscle(["-profile", "-in1", aligned_fasta, "-in2", profile, "-out", merged],
+                    memory_limit_mb, time_limit)
+
+        # MUSCLE reorders rows; keep the old order so old row indices stay valid
+        rows = {record.id: record.seq for record in iter_fasta(merged)}
+        added = [record.id for record in iter_fasta(new_fasta)]
+        order = [record.id for record in iter_fasta(aligned_fasta)] + added
+        tmp = f"{output_fasta}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            for name in order:
+                f.write(f">{name}\n{rows[name]}\n")
+        os.replace(tmp, output_fasta)
+        print(f"✅ Added {len(added)} sequence(s) to the alignment.")
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Alignment failed: {e.stderr.strip() or e}") from e
+    except subprocess.TimeoutExpired as e:
+        raise RuntimeError(f"Alignment failed: MUSCLE took longer than {e.timeout:.0f} s.") from e
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def align_divide_and_conquer(input_fasta, output_fasta, group_size=GROUP_SIZE, max_workers=None,
+                             memory_limit_mb=None, time_limit=None):
+    """
+    Aligns a large FASTA file by clustering it into groups of similar
+    sequences, aligning every group with its own MUSCLE process (in
+    parallel), then merging the group alignments pairwise with MUSCLE's
+    profile-profile mode until one alignment is left.
+
+    Parameters:
+    - input_fasta (str): Unaligned sequences (IDs must be unique).
+    - output_fasta (str): Where the merged alignment is written.
+    - group_size (int): Largest group aligned in one MUSCLE run.
+    - max_workers (int or None): Parallel MUSCLE processes (default: CPU count).
+    - memory_limit_mb / time_limit (int or None): Per-process limits (see align_sequences).
+
+    Raises RuntimeError if a MUSCLE run fails.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    ids, vectors = kmer_profiles(input_fasta)
+    groups = cluster_sequences(vectors, group_size)
+    index = FastaIndex.build(input_fasta, write=False)
+
+    workdir = tempfile.mkdtemp(prefix="align-", dir=os.path.dirname(os.path.abspath(output_fasta)))
+    try:
+        # Step 1: write and align every group
+        jobs = []
+        for k, members in enumerate(groups):
+            group_in = os.path.join(workdir, f"group{k}.fa")
+            with open(group_in, "w") as f:
+                for i in members:
+                    f.write(f">{ids[i]}\n{index[ids[i]]}\n")
+            jobs.append(["-in", group_in, "-out", os.path.join(workdir, f"group{k}.aln")])
+        index.close()
+
+        running = set()
+        run = partial(_run_muscle, memory_limit_mb=memory_limit_mb, time_limit=time_limit, running=running)
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            try:
+                list(pool.map(run, jobs))
+                profiles = [args[-1] for args in jobs]
+
+                # Step 2: merge neighbouring profiles (similar groups sit next
+                # to each other) until a single alignment remains
+                level = 0
+                while len(profiles) > 1:
+                    merges, merged = [], []
+                    for k in range(0, len(profiles) - 1, 2):
+                        out = os.path.join(workdir, f"merge{level}_{k}.aln")
+                        merges.append(["-profile", "-in1", profiles[k], "-in2", profiles[k + 1], "-out", out])
+                        merged.append(out)
+                    list(pool.map(run, merges))
+                    profiles = merged + profiles[len(merges) * 2:]
+                    level += 1
+            except BaseException:
+                # A failed group or a cancelled job: don't wait for the other
+                # groups' MUSCLE runs
+                pool.shutdown(wait=False, cancel_futures=True)
+                for proc in list(running):
+                    proc.kill()
+                raise
+
+        os.replace(profiles[0], output_fasta)
+        print(f"✅ Alignment complete ({len(groups)} groups merged).")
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Alignment failed: {e.stderr.strip() or e}") from e
+    except subprocess.TimeoutExpired as e:
+        raise RuntimeError(f"Alignment failed: MUSCLE took longer than {e.timeout:.0f} s.") from e
+    finally:
+        for name in os.listdir(workdir):
+            os.remove(os.path.join(workdir, name))
+        os.rmdir(workdir)
+
+
+def kmer_profiles(input_fasta, k=KMER, buckets=KMER_BUCKETS):
+    """
+    Streams a FASTA file into hashed k-mer frequency vectors.
+
+    Returns:
+    - (ids, vectors): list of IDs and an (n, buckets) float32 array of
+      L2-normalized k-mer counts.
+    """
+    ids, vectors = [], []
+    for record in iter_fasta(input_fasta):
+        codes = np.frombuffer(record.seq.upper().encode("ascii"), dtype=np.uint8).astype(np.uint32)
+        counts = np.zeros(buckets, dtype=np.float32)
+        if len(codes) >= k:
+            h = np.zeros(len(codes) - k + 1, dtype=np.uint32)
+            for j in range(k):
+                h = h * 31 + codes[j:len(codes) - k + 1 + j]
+            counts += np.bincount(h % buckets, minlength=buckets)
+        norm = np.linalg.norm(counts)
+        ids.append(record.id)
+        vectors.append(counts / norm if norm else counts)
+    return ids, np.array(vectors, dtype=np.float32).reshape(len(ids), buckets)
+
+
+def cluster_sequences(vectors, group_size=GROUP_SIZE):
+    """
+    Splits sequences into groups of at most group_size similar sequences by
+    recursive bisection: each set is projected onto the axis between two
+    far-apart members and cut at the median.
+
+    Returns:
+    - list of np.ndarray of row indices, ordered so that neighbouring
+      groups are similar.
+    """
+    groups = []
+    todo = [np.arange(len(vectors))]
+    while todo:
+        members = todo.pop()
+        if len(members) <= group_size:
+            groups.append(members)
+            continue
+        points = vectors[members]
+        a = points[np.argmax(((points - points.mean(axis=0)) ** 2).sum(axis=1))]
+        b = points[np.argmax(((points - a) ** 2).sum(axis=1))]
+        order = np.argsort(points @ (a - b), kind="stable")
+        half = len(members) // 2
+        # The "a" side goes on top of the stack, so it is emitted first
+        todo.append(members[order[:half]])
+        todo.append(members[order[half:]])
+    return groups
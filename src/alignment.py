@@ -0,0 +1,186 @@
+import numpy as np
+from Bio.Align import MultipleSeqAlignment
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
+
+from .distance import GAP_CHARS, encode_alignment
+from .fasta_parser import iter_fasta
+
+# Byte lookup table: True for gap characters
+_IS_GAP = np.zeros(256, dtype=bool)
+_IS_GAP[np.frombuffer(GAP_CHARS, dtype=np.uint8)] = True
+
+
+class CompactAlignment:
+    """
+    Array-backed alignment: an (n, L) uint8 matrix with one byte per site,
+    an ID array and optional per-column weights.
+
+    Rows and columns slice like NumPy arrays: basic slices (a[1:5],
+    a[:, 10:20]) are views that share memory with the original, fancy
+    indexing copies. Weights, when set, say how many original alignment
+    columns each column stands for (see compress_patterns).
+
+    Parameters:
+    - ids (sequence of str): Sequence IDs, one per row.
+    - codes (np.ndarray): (n, L) uint8 matrix.
+    - weights (np.ndarray or None): Length-L column weights; None means 1 each.
+    """
+
+    __slots__ = ("ids", "codes", "weights")
+
+    def __init__(self, ids, codes, weights=None):
+        codes = np.asarray(codes, dtype=np.uint8)
+        if codes.ndim != 2 or codes.shape[0] != len(ids):
+            raise ValueError("Alignment matrix must have one row per ID.")
+        if weights is not None:
+            weights = np.asarray(weights)
+            if weights.shape != (codes.shape[1],):
+                raise ValueError("Alignment weights must have one entry per column.")
+        self.ids = np.asarray(ids, dtype=object)
+        self.codes = codes
+        self.weights = weights
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Encodes a MultipleSeqAlignment (or any iterable of records with .id
+        and .seq) into a CompactAlignment.
+        """
+        ids, codes = encode_alignment(records)
+        return cls(ids, codes)
+
+    @classmethod
+    def from_fasta(cls, aligned_fasta):
+        """
+        Reads an aligned FASTA file straight into the byte matrix, without
+        building SeqRecords. Raises ValueError if it holds no sequences.
+        """
+        alignment = cls.from_records(iter_fasta(aligned_fasta))
+        if len(alignment) == 0:
+            raise ValueError("No sequences found in the FASTA file.")
+        return alignment
+
+    def to_msa(self):
+        """
+        Converts back to a Biopython MultipleSeqAlignment. Weighted columns
+        are repeated weight times (integer weights only).
+        """
+        codes = self.codes
+        if self.weights is not None:
+            codes = np.repeat(codes, self.weights.astype(np.intp), axis=1)
+        return MultipleSeqAlignment(
+            SeqRecord(Seq(row.tobytes().decode("ascii")), id=name, description="")
+            for name, row in zip(self.ids, codes)
+        )
+
+    def __len__(self):
+        return self.codes.shape[0]
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def site_count(self):
+        """
+        Number of original alignment columns (the sum of weights, if any).
+        """
+        if self.weights is None:
+            return self.codes.shape[1]
+        return self.weights.sum()
+
+    def sequence(self, row):
+        return self.codes[row].tobytes().decode("ascii")
+
+    def __getitem__(self, key):
+        rows, cols = key if isinstance(key, tuple) else (key, slice(None))
+        if isinstance(rows, (int, np.integer)):
+            rows = slice(rows, rows + 1 or None)
+        if isinstance(cols, (int, np.integer)):
+            cols = slice(cols, cols + 1 or None)
+        weights = None if self.weights is None else self.weights[cols]
+        return CompactAlignment(self.ids[rows], self.codes[rows, cols], weights)
+
+    def compress_patterns(self, return_inverse=False):
+        """
+        Collapses identical columns (site patterns) into one weighted column.
+
+        Distances and likelihoods only depend on how often each pattern
+        occurs, so downstream stages can work on the (usually far fewer)
+        unique patterns.
+
+        Parameters:
+        - return_inverse (bool): Also return, for every original column, the
+          index of its pattern.
+
+        Returns:
+        - CompactAlignment with unique columns and their weights (and the
+          inverse index if requested).
+        """
+        if self.codes.shape[1] == 0:
+            compressed = CompactAlignment(self.ids, self.codes, np.zeros(0, dtype=np.int64))
+            return (compressed, np.zeros(0, dtype=np.intp)) if return_inverse else compressed
+        patterns, inverse, counts = np.unique(
+            self.codes, axis=1, return_inverse=True, return_counts=True
+        )
+        inverse = inverse.reshape(-1)
+        if self.weights is None:
+            weights = counts
+        else:
+            weights = np.bincount(inverse, weights=self.weights, minlength=len(counts))
+            weights = weights.astype(self.weights.dtype, copy=False)
+        compressed = CompactAlignment(self.ids, patterns, weights)
+        return (compressed, inverse) if return_inverse else compressed
+
+    def filter_columns(self, max_gap_fraction=None, min_end_occupancy=None, collapse_invariant=False):
+        """
+        Drops or collapses the columns that cost time in every later stage
+        but say little about the tree: gap-heavy columns, the ragged ends
+        MUSCLE pads with gaps, and invariant sites. Everything is computed
+        in bulk from per-column counts over the whole matrix.
+
+        Parameters:
+        - max_gap_fraction (float or None): Drop columns where more than this
+          fraction of the sequences have a gap ('-' or '.').
+        - min_end_occupancy (float or None): Trim the leading and trailing
+          columns where fewer than this fraction of the sequences have a
+          residue; interior columns are left alone.
+        - collapse_invariant (bool): Replace the columns where every sequence
+          has the same character by one weighted column per character,
+          placed after the others. This is lossless: distances, parsimony
+          scores and likelihoods don't change.
+
+        Returns:
+        - CompactAlignment (weighted if any columns were collapsed).
+        """
+        n, length = self.codes.shape
+        keep = np.ones(length, dtype=bool)
+        if max_gap_fraction is not None or min_end_occupancy is not None:
+            gaps = _IS_GAP[self.codes].sum(axis=0)
+            if max_gap_fraction is not None:
+                keep &= gaps <= max_gap_fraction * n
+            if min_end_occupancy is not None:
+                occupied = np.flatnonzero(n - gaps >= min_end_occupancy * n)
+                keep[:occupied[0] if len(occupied) else length] = False
+                if len(occupied):
+                    keep[occupied[-1] + 1:] = False
+
+        codes = self.codes[:, keep]
+        weights = None if self.weights is None else self.weights[keep]
+        if collapse_invariant and codes.shape[1]:
+            invariant = (codes == codes[0]).all(axis=0)
+            symbols, which = np.unique(codes[0, invariant], return_inverse=True)
+            if weights is None:
+                weights = np.ones(codes.shape[1], dtype=np.int64)
+            collapsed = np.bincount(which, weights=weights[invariant], minlength=len(symbols))
+            codes = np.hstack([codes[:, ~invariant], np.repeat(symbols[None, :], n, axis=0)])
+            weights = np.concatenate([weights[~invariant], collapsed.astype(weights.dtype)])
+        if codes.shape[1] == 0:
+            raise ValueError("Column filtering removed every alignment column; relax the thresholds.")
+        return CompactAlignment(self.ids, codes, weights)
+
+    def __repr__(self):
+        n, length = self.codes.shape
+        weighted = "" if self.weights is None else f", {length} weighted patterns"
+        return f"CompactAlignment({n} sequences x {self.site_count} sites{weighted})"
@@ -0,0 +1,258 @@
+import os
+import re
+
+import numpy as np
+
+# Biopython is only imported for the Bio.Phylo conversions: reading, writing
+# and drawing a tree doesn't need it
+
+# Characters read from a Newick file at a time
+READ_CHUNK = 1 << 20
+
+# One Newick token, after optional whitespace: a parenthesis, comma or
+# semicolon, a ":length", a quoted label ('' escapes a quote), a [comment] or
+# an unquoted label. Same token rules as Bio.Phylo.NewickIO.
+_TOKEN = re.compile(r"""\s*(?:
+    ([(),;])
+  | :\ ?([+-]?[0-9]*\.?[0-9]+(?:[eE][+-]?[0-9]+)?)
+  | '((?:[^']|'')*)'
+  | (\[[^\]]*\])
+  | ([^\s()\[\]':;,]+)
+)""", re.VERBOSE)
+
+# Labels that can be written without quotes
+_UNQUOTED = re.compile(r"[^\s()\[\]':;,]+")
+
+
+class ArrayTree:
+    """
+    A tree as flat arrays, one entry per node in preorder (the root is node
+    0, every node comes before its descendants and children keep their
+    order). Unlike a Bio.Phylo tree it is not a nested object graph, so
+    reading, writing, drawing and pickling it to worker processes needs no
+    recursion and little memory.
+
+    Attributes:
+    - parent (np.ndarray): Parent index, -1 for the root.
+    - length (np.ndarray): Branch lengths, NaN where there is none.
+    - names (list of str or None): Node names.
+    - confidence (np.ndarray): Support values, NaN where there is none.
+    - rooted (bool): Whether the tree is rooted.
+    """
+
+    __slots__ = ("parent", "length", "names", "confidence", "rooted")
+
+    def __init__(self, parent, length, names, confidence, rooted=False):
+        self.parent = np.asarray(parent, dtype=np.intp)
+        self.length = np.asarray(length, dtype=np.float64)
+        self.names = list(names)
+        self.confidence = np.asarray(confidence, dtype=np.float64)
+        self.rooted = rooted
+
+    def __len__(self):
+        return len(self.parent)
+
+    @property
+    def tips(self):
+        """
+        Boolean mask of the nodes without children.
+        """
+        return np.bincount(self.parent[1:], minlength=len(self)) == 0
+
+    def count_terminals(self):
+        return int(self.tips.sum())
+
+    @classmethod
+    def from_phylo(cls, tree):
+        """
+        Flattens a Bio.Phylo tree (or clade) in one preorder walk.
+        """
+        root = getattr(tree, "root", tree)
+        parent, length, names, confidence = [], [], [], []
+        stack = [(root, -1)]
+        while stack:
+            clade, up = stack.pop()
+            index = len(parent)
+            parent.append(up)
+            length.append(np.nan if clade.branch_length is None else clade.branch_length)
+            names.append(clade.name)
+            confidence.append(np.nan if clade.confidence is None else clade.confidence)
+            # Reversed so the first child is popped (and numbered) first
+            stack.extend((child, index) for child in reversed(clade.clades))
+        return cls(parent, length, names, confidence, rooted=getattr(tree, "rooted", False))
+
+    def to_phylo(self):
+        """
+        The tree as a Bio.Phylo Newick tree, as Phylo.read would return it.
+        """
+        from Bio.Phylo import Newick
+
+        clades = []
+        for i in range(len(self)):
+            clade = Newick.Clade(
+                branch_length=None if np.isnan(self.length[i]) else float(self.length[i]),
+                name=self.names[i],
+                confidence=None if np.isnan(self.confidence[i]) else _number(self.confidence[i]),
+            )
+            clades.append(clade)
+            if self.parent[i] >= 0:
+                clades[self.parent[i]].clades.append(clade)
+        return Newick.Tree(root=clades[0], rooted=self.rooted)
+
+    def to_newick(self, format_confidence="%1.2f", format_branch_length="%1.8g"):
+        """
+        Newick text of the tree, the same as Phylo.write would produce with
+        these formats: labels quoted where needed, a support written as the
+        internal node's label and missing branch lengths written as 0.
+        """
+        n = len(self)
+        tips = self.tips
+        # The last child of each node closes the node's parentheses
+        last = np.full(n, -1, dtype=np.intp)
+        np.maximum.at(last, self.parent[1:], np.arange(1, n))
+        lengths = np.nan_to_num(self.length, nan=0.0)
+
+        def node(i):
+            label = self.names[i] or ""
+            if label and not _UNQUOTED.fullmatch(label):
+                label = "'%s'" % label.replace("'", "''")
+            if tips[i] or np.isnan(self.confidence[i]):
+                return label + (":" + format_branch_length) % lengths[i]
+            return label + (format_confidence + ":" + format_branch_length) % (
+                _number(self.confidence[i]), lengths[i])
+
+        out = []
+        for i in range(n):
+            if not tips[i]:
+                out.append("(")
+                continue
+            out.append(node(i))
+            while i > 0 and last[self.parent[i]] == i:
+                i = self.parent[i]
+                out.append(")" + node(i))
+            if i > 0:
+                out.append(",")
+        return "".join(out) + ";"
+
+    def write_newick(self, path, **formats):
+        """
+        Writes the tree to a Newick file (see to_newick for the formats).
+        """
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(self.to_newick(**formats) + "\n")
+        os.replace(tmp, path)
+
+    @classmethod
+    def from_newick(cls, text):
+        """
+        Parses the first tree of a Newick string (see read_newick).
+        """
+        return _parse([text])
+
+
+def read_newick(path):
+    """
+    Reads a one-tree Newick file into an ArrayTree.
+
+    The file is tokenized chunk by chunk in a single pass, with an explicit
+    current-node pointer instead of recursion, so there is no depth limit.
+    Internal labels that are numbers become supports, as with Phylo.read;
+    comments are skipped.
+
+    Parameters:
+    - path (str): The Newick file.
+
+    Returns:
+    - ArrayTree (unrooted).
+    """
+    with open(path) as f:
+        return _parse(iter(lambda: f.read(READ_CHUNK), ""))
+
+
+def _number(value):
+    # Whole-number supports print like the ints Phylo.read makes of them
+    return int(value) if float(value).is_integer() else float(value)
+
+
+def _parse(chunks):
+    """
+    Builds an ArrayTree from Newick text arriving in pieces (PRIVATE).
+    """
+    parent, length, names, confidence = [-1], [np.nan], [None], [np.nan]
+    current = 0
+    depth = 0
+    done = False
+    buffer = ""
+    position = 0  # of buffer in the whole text, for error messages
+    chunks = iter(chunks)
+    more = True
+    while more:
+        chunk = next(chunks, None)
+        more = chunk is not None
+        buffer += chunk or ""
+        # Labels and lengths can't span a parenthesis, comma or semicolon, so
+        # tokens ending before the last of those are complete (a quoted
+        # label is also unfinished if a quote follows: '' escapes one)
+        limit = max(map(buffer.rfind, "(),;")) if more else len(buffer)
+        offset = 0
+        while True:
+            match = _TOKEN.match(buffer, offset)
+            if match is None or match.end() > limit or (
+                    more and match.group(3) is not None and buffer[match.end()] == "'"):
+                break
+            offset = match.end()
+            symbol, value, quoted, _, label = match.groups()
+            if done:
+                raise ValueError(f"Text after the semicolon in the Newick tree (character {position + match.start()}).")
+            if symbol == "(":
+                parent.append(current)
+                length.append(np.nan)
+                names.append(None)
+                confidence.append(np.nan)
+                current = len(parent) - 1
+                depth += 1
+            elif symbol == ",":
+                if depth == 0:
+                    raise ValueError("Newick tree has several roots; enclose it in parentheses.")
+                _finish(current, names, confidence, parent)
+                parent.append(parent[current])
+                length.append(np.nan)
+                names.append(None)
+                confidence.append(np.nan)
+                current = len(parent) - 1
+            elif symbol == ")":
+                if depth == 0:
+                    raise ValueError("Newick tree has an unmatched ')'.")
+                _finish(current, names, confidence, parent)
+                current = parent[current]
+                depth -= 1
+            elif symbol == ";":
+                done = True
+            elif value is not None:
+                length[current] = float(value)
+            elif quoted is not None:
+                names[current] = quoted.replace("''", "'")
+            elif label is not None:
+                names[current] = label
+        position += offset
+        buffer = buffer[offset:]
+        if not more and buffer.strip():
+            raise ValueError(f"Invalid Newick text at character {position}: {buffer.strip()[:20]!r}")
+
+    if depth:
+        raise ValueError("Newick tree has an unmatched '('.")
+    _finish(0, names, confidence, parent)
+    return ArrayTree(parent, length, names, confidence)
+
+
+def _finish(node, names, confidence, parent):
+    """
+    A numeric label of a finished internal node is its support (PRIVATE).
+    """
+    if names[node] and np.isnan(confidence[node]) and node + 1 < len(parent) and parent[node + 1] == node:
+        try:
+            confidence[node] = float(names[node])
+        except ValueError:
+            return
+        names[node] = None
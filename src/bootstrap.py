@@ -0,0 +1,183 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .alignment import CompactAlignment
+from .distance import identity_distances
+from .likelihood import SubstitutionModel, maximum_likelihood_tree
+from .nj import neighbor_joining
+from .parsimony import parsimony_tree
+from .upgma import condensed_distances, upgma_tree
+
+# Default number of bootstrap replicates
+REPLICATES = 100
+
+# Replicates per task sent to a worker process
+CHUNK_SIZE = 10
+
+BUILDERS = ("nj", "upgma", "ml", "mp")
+
+
+def resample_weights(weights, replicates, seed=None):
+    """
+    Draws bootstrap replicates as column counts instead of copied alignments.
+
+    Resampling L columns with replacement is the same as drawing, for every
+    column, how many times it was picked: a multinomial over the columns.
+    On a pattern-compressed alignment each pattern is picked in proportion
+    to its weight, so a replicate costs one vector of counts per pattern.
+
+    Parameters:
+    - weights (np.ndarray): Column weights (all ones for an uncompressed alignment).
+    - replicates (int): Number of replicates.
+    - seed (int or None): Seed for reproducible replicates.
+
+    Returns:
+    - np.ndarray: (replicates, len(weights)) int64 column counts, each row
+      summing to weights.sum().
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    total = int(round(weights.sum()))
+    rng = np.random.default_rng(seed)
+    return rng.multinomial(total, weights / weights.sum(), size=replicates)
+
+
+def build_tree(ids, distances, builder, alignment=None, model=None):
+    """
+    Builds an NJ ("nj") or UPGMA ("upgma") tree from a square distance
+    matrix, or searches an ML ("ml", with a fixed SubstitutionModel) or
+    maximum-parsimony ("mp") tree on the given alignment from the NJ tree.
+    """
+    if builder == "nj":
+        return neighbor_joining(ids, distances)
+    if builder == "upgma":
+        return upgma_tree(ids, condensed_distances(distances))
+    if builder == "ml":
+        return maximum_likelihood_tree(alignment, neighbor_joining(ids, distances), model)
+    if builder == "mp":
+        return parsimony_tree(alignment, neighbor_joining(ids, distances))
+    raise ValueError(f"builder must be one of {BUILDERS}.")
+
+
+def clade_splits(tree, ids, rooted):
+    """
+    Maps each internal clade of tree to the set of tips below it, encoded as
+    an int bit mask over ids (bit i = ids[i]).
+
+    For unrooted trees a split and its complement are the same bipartition,
+    so masks are flipped to the side that does not contain ids[0]. The root
+    and trivial splits (a single tip or all of them) are left out.
+
+    Returns:
+    - dict: clade -> mask.
+    """
+    bit = {name: 1 << i for i, name in enumerate(ids)}
+    everything = (1 << len(ids)) - 1
+    masks = {}
+    splits = {}
+    # Iterative post-order so deep trees don't hit the recursion limit
+    stack = [(tree.root, False)]
+    while stack:
+        clade, expanded = stack.pop()
+        if clade.is_terminal():
+            masks[clade] = bit[clade.name]
+        elif not expanded:
+            stack.append((clade, True))
+            stack.extend((child, False) for child in clade.clades)
+        else:
+            mask = 0
+            for child in clade.clades:
+                mask |= masks[child]
+            masks[clade] = mask
+            if not rooted and mask & 1:
+                mask ^= everything
+            if clade is not tree.root and 1 < bin(mask).count("1") < len(ids) - (not rooted):
+                splits[clade] = mask
+    return splits
+
+
+def _count_splits(codes, counts, ids, builder, targets, model=None):
+    """
+    Builds one tree per row of counts and tallies how often each target
+    split appears (worker process, PRIVATE).
+    """
+    targets = {mask: k for k, mask in enumerate(targets)}
+    found = np.zeros(len(targets), dtype=np.int64)
+    for weights in counts:
+        used = weights > 0
+        dist = identity_distances(codes[:, used], weights=weights[used])
+        replicate = CompactAlignment(ids, codes[:, used], weights[used]) if builder in ("ml", "mp") else None
+        tree = build_tree(ids, dist, builder, replicate, model)
+        for mask in clade_splits(tree, ids, rooted=builder == "upgma").values():
+            k = targets.get(mask)
+            if k is not None:
+                found[k] += 1
+    return found
+
+
+def bootstrap_support(alignment, tree, builder, replicates=REPLICATES, workers=None, seed=None,
+                      model=None):
+    """
+    Bootstrap support for every internal clade of a tree built from alignment.
+
+    The alignment is compressed to its unique site patterns once; every
+    replicate is then just a vector of pattern counts (see resample_weights)
+    from which identity distances are recomputed in bulk. Replicate trees are
+    built on a process pool in chunks of CHUNK_SIZE, and each worker only
+    sends back how often it saw each of the reference tree's splits.
+
+    Parameters:
+    - alignment (CompactAlignment): The alignment the tree was built from.
+    - tree (Bio.Phylo.BaseTree.Tree): Reference tree; its tips are alignment.ids.
+    - builder (str): "nj", "upgma", "ml" or "mp", the method that built tree.
+    - replicates (int): Number of bootstrap replicates.
+    - workers (int or None): Worker processes (default: CPU count); 1 runs in-process.
+    - seed (int or None): Seed for reproducible supports.
+    - model (SubstitutionModel or None): Fixed model for "ml" replicates
+      (default: HKY with the alignment's base frequencies).
+
+    Returns:
+    - dict: internal clade -> support in percent (0-100).
+    """
+    if builder not in BUILDERS:
+        raise ValueError(f"builder must be one of {BUILDERS}.")
+    if alignment.shape[1] == 0:
+        raise ValueError("Bootstrapping needs an alignment with at least one column.")
+    ids = list(alignment.ids)
+    splits = clade_splits(tree, ids, rooted=builder == "upgma")
+    targets = sorted(set(splits.values()))
+    if not targets or replicates < 1:
+        return {}
+
+    if builder == "ml" and model is None:
+        model = SubstitutionModel.from_alignment(alignment)
+    patterns = alignment.compress_patterns()
+    counts = resample_weights(patterns.weights, replicates, seed)
+    chunks = [counts[start:start + CHUNK_SIZE] for start in range(0, replicates, CHUNK_SIZE)]
+
+    workers = min(workers or os.cpu_count() or 1, len(chunks))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(_count_splits, [patterns.codes] * len(chunks), chunks,
+                               [ids] * len(chunks), [builder] * len(chunks),
+                               [targets] * len(chunks), [model] * len(chunks))
+            found = sum(results)
+    else:
+        found = sum(_count_splits(patterns.codes, chunk, ids, builder, targets, model)
+                    for chunk in chunks)
+
+    percent = dict(zip(targets, 100.0 * found / replicates))
+    return {clade: percent[mask] for clade, mask in splits.items()}
+
+
+def annotate_support(tree, support):
+    """
+    Stores supports as clade.confidence so Phylo.write puts them on the
+    Newick output. Internal "Inner<k>" names are dropped, since Newick has
+    a single label slot per internal node.
+    """
+    for clade in tree.get_nonterminals():
+        clade.name = None
+        clade.confidence = support.get(clade)
+    return tree
@@ -1,37 +1,264 @@
-from Bio import AlignIO
-from Bio.Phylo.TreeConstruction import DistanceCalculator, DistanceTreeConstructor
-from Bio import Phylo
+import numpy as np
 
-def build_parsimony_tree(aligned_fasta, output_newick="output/parsimony_tree.newick"):
+from .alignment import CompactAlignment
+from .array_tree import ArrayTree
+from .bootstrap import annotate_support, bootstrap_support
+from .distance import identity_distances
+from .distance_store import DistanceStore, identity_distance_store
+from .likelihood import SubstitutionModel, fits_in_memory, maximum_likelihood_tree
+from .minhash import guess_alphabet
+from .nj import add_to_nj_tree, neighbor_joining
+from .parsimony import add_to_parsimony_tree, parsimony_tree
+from .upgma import add_to_upgma_tree, condensed_distances, upgma_tree
+
+
+class AnalysisSession:
+    """
+    Holds one parsed alignment and its distance matrix so several trees can
+    be built from it without re-reading the FASTA or recomputing distances.
+
+    Usage:
+        session = AnalysisSession.from_fasta("output/aligned_sequences.fasta")
+        session.write_parsimony_tree("output/parsimony_tree.newick")
+        session.write_likelihood_tree("output/ml_tree.newick")
+
+    Every tree method also takes a base_tree: a tree over some of the taxa,
+    e.g. from an earlier analysis of fewer sequences. The missing taxa are
+    then added to it instead of building the tree from scratch.
     """
-    Build a simple tree using distance-based approximation to parsimony.
-    Saves the tree in Newick format.
+
+    def __init__(self, alignment, distances=None):
+        # Accepts a CompactAlignment or a Biopython MultipleSeqAlignment, and
+        # identity distances computed elsewhere (e.g. extend_identity_distances)
+        if not isinstance(alignment, CompactAlignment):
+            alignment = CompactAlignment.from_records(alignment)
+        self.alignment = alignment
+        self.ids = list(alignment.ids)
+        self.codes = alignment.codes
+        self._distances = distances
+        self.ml_fit = None
+        self.parsimony_score = None
+
+    @classmethod
+    def from_fasta(cls, aligned_fasta):
+        """
+        Parses an aligned FASTA file once.
+        """
+        return cls(CompactAlignment.from_fasta(aligned_fasta))
+
+    @classmethod
+    def from_distances(cls, ids, distances):
+        """
+        Session over a precomputed (n, n) distance matrix with no alignment,
+        e.g. alignment-free MinHash distances (see minhash.py).
+        """
+        session = cls(CompactAlignment(ids, np.zeros((len(ids), 0), dtype=np.uint8)))
+        session._distances = np.asarray(distances, dtype=np.float64)
+        return session
+
+    @property
+    def distances(self):
+        """
+        (n, n) identity distance matrix, computed on first use (or the
+        matrix given to from_distances, or the DistanceStore of
+        store_distances).
+        """
+        if self._distances is None:
+            self._distances = identity_distances(self.codes, weights=self.alignment.weights)
+        return self._distances
+
+    def store_distances(self, path, workers=None):
+        """
+        Saves the distance matrix to path as a memory-mapped DistanceStore and
+        uses the store from then on. Identity distances not computed yet are
+        written straight into it by worker processes (see
+        identity_distance_store), so the full matrix is never held in memory.
+
+        Returns:
+        - DistanceStore
+        """
+        if self._distances is None:
+            self._distances = identity_distance_store(self.codes, path, weights=self.alignment.weights,
+                                                      workers=workers)
+        elif not isinstance(self._distances, DistanceStore) or self._distances.path != path:
+            self._distances = DistanceStore.from_square(path, self._distances)
+        return self._distances
+
+    @staticmethod
+    def _base(base_tree):
+        # Too small a tree to add to is simply rebuilt
+        if base_tree is None or base_tree.count_terminals() < 3:
+            return None
+        return base_tree
+
+    def nj_tree(self, base_tree=None):
+        """
+        Neighbor-joining tree on identity distances (or base_tree with the
+        missing taxa placed on it, see nj.add_to_nj_tree).
+        """
+        if self._base(base_tree) is not None:
+            return add_to_nj_tree(base_tree, self.ids, self.distances)
+        return neighbor_joining(self.ids, self.distances)
+
+    def parsimony_tree(self, base_tree=None):
+        """
+        Maximum-parsimony tree (see parsimony.py), searched by NNI and SPR
+        from the NJ tree, or from base_tree with the missing taxa added by
+        stepwise addition and a local SPR search. Its Fitch score is kept in
+        parsimony_score.
+        """
+        score = {}
+        if self._base(base_tree) is not None:
+            tree = add_to_parsimony_tree(self.alignment, base_tree, score=score)
+        else:
+            tree = parsimony_tree(self.alignment, self.nj_tree(), score=score)
+        self.parsimony_score = score["score"]
+        return tree
+
+    def _is_nucleotide(self):
+        if not self.alignment.shape[1]:
+            return False
+        rows = (self.alignment.sequence(i) for i in range(len(self.alignment)))
+        return guess_alphabet(rows) == "dna"
+
+    def parsimony_method(self):
+        """
+        "mp" for nucleotide alignments, otherwise "nj" (MinHash sessions, proteins).
+        """
+        return "mp" if self._is_nucleotide() else "nj"
+
+    def upgma_tree(self, base_tree=None):
+        """
+        UPGMA tree on identity distances (or base_tree with the missing taxa
+        placed on it, see upgma.add_to_upgma_tree).
+        """
+        if self._base(base_tree) is not None:
+            return add_to_upgma_tree(base_tree, self.ids, self.distances)
+        return upgma_tree(self.ids, condensed_distances(self.distances))
+
+    def ml_tree(self, model="HKY", base_tree=None):
+        """
+        Maximum-likelihood tree (see likelihood.py), searched by NNI from
+        the NJ tree, or from base_tree with the missing taxa placed where
+        they add the fewest parsimony changes. The fitted model and
+        log-likelihood are kept in ml_fit.
+        """
+        self.ml_fit = {}
+        if self._base(base_tree) is not None:
+            start = add_to_parsimony_tree(self.alignment, base_tree, radius=0)
+        else:
+            start = self.nj_tree()
+        return maximum_likelihood_tree(self.alignment, start, model, model_params=self.ml_fit)
+
+    def likelihood_method(self):
+        """
+        "ml" for nucleotide alignments whose partial likelihoods fit in
+        memory, otherwise "upgma" (MinHash sessions, proteins, huge inputs).
+        """
+        return "ml" if self._is_nucleotide() and fits_in_memory(self.alignment) else "upgma"
+
+    def support(self, tree, builder, replicates, workers=None, seed=None, model=None):
+        """
+        Bootstrap supports (in percent) for the internal clades of a tree
+        built from this session (see bootstrap.bootstrap_support).
+        """
+        return bootstrap_support(self.alignment, tree, builder, replicates, workers, seed, model)
+
+    def _write_tree(self, tree, builder, output_newick, bootstrap, workers, seed, model=None):
+        if bootstrap:
+            annotate_support(tree, self.support(tree, builder, bootstrap, workers, seed, model))
+        tree = ArrayTree.from_phylo(tree)
+        # Supports are percentages; whole numbers are the usual Newick labels
+        tree.write_newick(output_newick, format_confidence="%.0f")
+        return tree
+
+    def write_parsimony_tree(self, output_newick="output/parsimony_tree.newick", bootstrap=0,
+                             workers=None, seed=None, method=None, base_tree=None):
+        """
+        Writes the maximum-parsimony tree (method="mp") or the NJ tree
+        (method="nj"); by default whichever parsimony_method picks. With
+        bootstrap=N, N replicates are run and the supports are written as
+        internal node labels. base_tree is passed on to the tree method.
+
+        Returns the written tree as an ArrayTree, so it can be drawn (see
+        visualize_tree) without reading the file back.
+        """
+        method = method or self.parsimony_method()
+        if method == "mp":
+            tree = self._write_tree(self.parsimony_tree(base_tree), "mp", output_newick, bootstrap, workers, seed)
+            print(f"Parsimony tree (score {self.parsimony_score}) saved to: {output_newick}")
+        elif method == "nj":
+            tree = self._write_tree(self.nj_tree(base_tree), "nj", output_newick, bootstrap, workers, seed)
+            print(f"Parsimony-like tree saved to: {output_newick}")
+        else:
+            raise ValueError("method must be 'mp' or 'nj'.")
+        return tree
+
+    def write_likelihood_tree(self, output_newick="output/ml_tree.newick", bootstrap=0,
+                              workers=None, seed=None, method=None, model="HKY", base_tree=None):
+        """
+        Writes the maximum-likelihood tree (method="ml") or the UPGMA tree
+        (method="upgma"); by default ML whenever likelihood_method allows
+        it. Bootstrap supports are added if bootstrap=N > 0; ML replicates
+        keep the model fitted on the full alignment. base_tree is passed on
+        to the tree method. Returns the written tree as an ArrayTree.
+        """
+        method = method or self.likelihood_method()
+        if method == "ml":
+            tree = self.ml_tree(model, base_tree)
+            fitted = SubstitutionModel.from_alignment(self.alignment, self.ml_fit["model"],
+                                                      self.ml_fit["kappa"])
+            tree = self._write_tree(tree, "ml", output_newick, bootstrap, workers, seed, fitted)
+            print(f"ML tree ({self.ml_fit['model']}, log-likelihood "
+                  f"{self.ml_fit['log_likelihood']:.2f}) saved to: {output_newick}")
+        elif method == "upgma":
+            tree = self._write_tree(self.upgma_tree(base_tree), "upgma", output_newick, bootstrap, workers, seed)
+            print(f"Likelihood-like tree saved to: {output_newick}")
+        else:
+            raise ValueError("method must be 'ml' or 'upgma'.")
+        return tree
+
+
+def _session(aligned_fasta):
+    if isinstance(aligned_fasta, AnalysisSession):
+        return aligned_fasta
+    if isinstance(aligned_fasta, str):
+        return AnalysisSession.from_fasta(aligned_fasta)
+    return AnalysisSession(aligned_fasta)
+
+
+def build_parsimony_tree(aligned_fasta, output_newick="output/parsimony_tree.newick",
+                         bootstrap=0, workers=None, method=None):
     """
-    # Step 1: Read the aligned sequences
-    alignment = AlignIO.read(aligned_fasta, "fasta")
-    
-    # Step 2: Create a distance matrix (e.g., using identity)
-    calculator = DistanceCalculator("identity")  # or use "blosum62" for proteins
-    distance_matrix = calculator.get_distance(alignment)
-
-    # Step 3: Construct a tree using  NJ (approximation of parsimony)
-    constructor = DistanceTreeConstructor()
-    tree = constructor.nj(distance_matrix)  
-
-    # Step 4: Save the tree to file in Newick format
-    Phylo.write(tree, output_newick, "newick")
-    print(f"Parsimony-like tree saved to: {output_newick}")
-
-def build_likelihood_tree(aligned_fasta, output_newick="output/ml_tree.newick"):
+    Builds a maximum-parsimony tree and saves it in Newick format.
+
+    Fitch parsimony is scored on bit-packed state sets and the topology is
+    improved by NNI and SPR moves starting from the NJ tree. Pass
+    method="nj" for the plain NJ tree, which is also used when there is no
+    nucleotide alignment (MinHash sessions, proteins).
+
+    aligned_fasta may be a file path, a CompactAlignment, a
+    MultipleSeqAlignment or an AnalysisSession; pass a session when building
+    several trees from the same alignment. With bootstrap=N, N bootstrap
+    replicates are run on `workers` processes and the supports are saved
+    on the tree's internal nodes.
     """
-    Builds a simple ML-like tree (UPGMA using identity) and saves it in Newick format.
+    _session(aligned_fasta).write_parsimony_tree(output_newick, bootstrap=bootstrap, workers=workers,
+                                                 method=method)
+
+def build_likelihood_tree(aligned_fasta, output_newick="output/ml_tree.newick",
+                          bootstrap=0, workers=None, method=None, model="HKY"):
     """
-    alignment = AlignIO.read(aligned_fasta, "fasta")
-    calculator = DistanceCalculator("identity")
-    distance_matrix = calculator.get_distance(alignment)
+    Builds a maximum-likelihood tree and saves it in Newick format.
 
-    constructor = DistanceTreeConstructor()
-    tree = constructor.upgma(distance_matrix)
+    The search starts from the NJ tree, optimizes branch lengths and the
+    model (JC69, K80 or HKY) and improves the topology by NNI. Pass
+    method="upgma" for the older UPGMA-on-identity tree, which is also used
+    when there is no alignment (MinHash sessions).
 
-    Phylo.write(tree, output_newick, "newick")
-    print(f"Likelihood-like tree saved to: {output_newick}")
+    aligned_fasta may be a file path, a CompactAlignment, a
+    MultipleSeqAlignment or an AnalysisSession. bootstrap and workers work
+    as in build_parsimony_tree.
+    """
+    _session(aligned_fasta).write_likelihood_tree(output_newick, bootstrap=bootstrap, workers=workers,
+                                                  method=method, model=model)
@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+
+from .fasta_parser import iter_fasta
+
+# Where cached results live and how much disk they may use. Both can be
+# overridden from the environment.
+CACHE_ROOT = os.environ.get("SIMPLEPHYLO_CACHE", "output/cache")
+CACHE_MAX_BYTES = int(os.environ.get("SIMPLEPHYLO_CACHE_MB", 512)) * 1024 * 1024
+
+# Pipeline artifacts stored per entry, by their workspace file name
+ARTIFACTS = (
+    "aligned_sequences.fasta",
+    "distances.npy",
+    "parsimony_tree.newick",
+    "ml_tree.newick",
+    "parsimony_tree.png",
+    "ml_tree.png",
+    "parsimony_tree.layout.json",
+    "ml_tree.layout.json",
+)
+
+
+def cache_key(fasta_path, params):
+    """
+    Content hash of a FASTA upload plus the pipeline parameters.
+
+    Sequences are normalized before hashing (upper case, no whitespace or
+    line wrapping), so the same data saved by different editors gets the same
+    key. IDs and record order are kept, since both end up in the trees.
+
+    Parameters:
+    - fasta_path (str): Unaligned input FASTA.
+    - params (dict): JSON-serializable settings that change the results.
+
+    Returns:
+    - str: Hex SHA-256 digest.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps(params, sort_keys=True).encode())
+    for record in iter_fasta(fasta_path):
+        digest.update(f"\n>{record.id}\n{record.seq.upper()}".encode())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Size-bounded, content-addressed store of finished pipeline results.
+
+    Each entry is a directory named by its cache_key holding the ARTIFACTS and
+    a result.json. Entries are written to a temporary directory and renamed
+    into place, so readers never see a partial entry. A hit refreshes the
+    entry's timestamp; eviction removes the least recently used entries.
+
+    Parameters:
+    - root (str): Cache directory.
+    - max_bytes (int): Disk budget for all entries together.
+    """
+
+    def __init__(self, root=CACHE_ROOT, max_bytes=CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _entry(self, key):
+        return os.path.join(self.root, key)
+
+    def lookup(self, key):
+        """
+        Returns the cached result dict (with "path" set to the entry
+        directory) or None, and counts the hit or miss.
+        """
+        entry = self._entry(key)
+        try:
+            with open(os.path.join(entry, "result.json")) as f:
+                result = json.load(f)
+            os.utime(entry)  # mark as recently used
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        result["path"] = entry
+        return result
+
+    def store(self, key, source_dir, result):
+        """
+        Copies the ARTIFACTS found in source_dir into a new entry, then evicts
+        old entries to stay within max_bytes. An existing entry is kept.
+
+        Parameters:
+        - key (str): Cache key (see cache_key).
+        - source_dir (str): Directory holding the finished artifacts.
+        - result (dict): JSON-serializable summary returned on hits.
+        """
+        entry = self._entry(key)
+        if os.path.isdir(entry):
+            return
+        os.makedirs(self.root, exist_ok=True)
+        tmp = os.path.join(self.root, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(tmp)
+        try:
+            for name in ARTIFACTS:
+                # Alignment-free runs have no aligned FASTA
+                if os.path.exists(os.path.join(source_dir, name)):
+                    shutil.copyfile(os.path.join(source_dir, name), os.path.join(tmp, name))
+            with open(os.path.join(tmp, "result.json"), "w") as f:
+                json.dump(result, f)
+            os.rename(tmp, entry)
+        except OSError:
+            # Out of disk, or another process stored the same key first
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        self.evict()
+
+    def restore(self, key, target_dir):
+        """
+        Hard-links (or copies) a cached entry's artifacts into target_dir.
+        Returns the cached result dict, or None on a miss.
+        """
+        result = self.lookup(key)
+        if result is None:
+            return None
+        for name in ARTIFACTS:
+            source = os.path.join(result["path"], name)
+            target = os.path.join(target_dir, name)
+            if not os.path.exists(source):
+                continue
+            try:
+                os.link(source, target)
+            except OSError:
+                shutil.copyfile(source, target)
+        return result
+
+    def entries(self):
+        """
+        Returns [(last_used, size_bytes, path)] for every entry, oldest first.
+        """
+        if not os.path.isdir(self.root):
+            return []
+        found = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.startswith(".") or not os.path.isdir(path):
+                continue
+            try:
+                size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+                found.append((os.path.getmtime(path), size, path))
+            except OSError:
+                pass  # evicted by another process meanwhile
+        return sorted(found)
+
+    def evict(self):
+        """
+        Removes least recently used entries until the cache fits max_bytes.
+        Returns the number of entries removed.
+        """
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def stats(self):
+        """
+        Hit/miss counters for this process plus the cache's current size.
+        """
+        entries = self.entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
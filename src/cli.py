@@ -0,0 +1,212 @@
+import glob
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import click
+
+from .cache import cache_key
+from .instrument import Trace
+from .pipeline import DISTANCE_MODES, pipeline_params, run_pipeline
+
+FASTA_EXTENSIONS = (".fa", ".fasta", ".fas", ".fna", ".faa")
+
+
+def collect_inputs(patterns):
+    """
+    Expands directories (their FASTA files), glob patterns and plain paths
+    into a sorted list of unique absolute FASTA paths.
+    """
+    found = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            found.update(
+                os.path.join(pattern, name) for name in os.listdir(pattern)
+                if name.lower().endswith(FASTA_EXTENSIONS)
+            )
+        elif glob.has_magic(pattern):
+            found.update(glob.glob(pattern, recursive=True))
+        elif os.path.isfile(pattern):
+            found.add(pattern)
+        else:
+            raise click.BadParameter(f"No such file or directory: {pattern}", param_hint="INPUTS")
+    return sorted(os.path.abspath(path) for path in found if os.path.isfile(path))
+
+
+def output_names(inputs):
+    """
+    Maps each input to an output folder name: its file stem, plus a short
+    path hash when two inputs share a stem.
+    """
+    stems = [os.path.splitext(os.path.basename(path))[0] for path in inputs]
+    names = {}
+    for path, stem in zip(inputs, stems):
+        if stems.count(stem) > 1:
+            stem += "-" + hashlib.sha1(path.encode()).hexdigest()[:8]
+        names[path] = stem
+    return names
+
+
+def load_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(path, manifest):
+    # Write-then-rename so an interrupted run never leaves a broken manifest
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def is_complete(entry, key):
+    """
+    True if a manifest entry finished successfully for the same input
+    content and parameters, and its outputs are still on disk.
+    """
+    return (
+        entry is not None
+        and entry.get("status") == "done"
+        and entry.get("key") == key
+        and all(os.path.exists(p) for p in entry.get("outputs", {}).values())
+    )
+
+
+def analyze_file(input_fasta, out_dir, distance_mode="identity", bootstrap=0, workers=1,
+                 column_filter=None):
+    """
+    Runs the full pipeline on one FASTA file into out_dir (worker process),
+    with its per-stage timings in trace.json. workers is this file's share of
+    the CPUs, used for the distance tiles and the bootstrap replicates.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    outputs = {
+        "aligned_fasta": os.path.join(out_dir, "aligned_sequences.fasta"),
+        "distances": os.path.join(out_dir, "distances.npy"),
+        "parsimony_tree": os.path.join(out_dir, "parsimony_tree.newick"),
+        "ml_tree": os.path.join(out_dir, "ml_tree.newick"),
+        "parsimony_image": os.path.join(out_dir, "parsimony_tree.png"),
+        "ml_image": os.path.join(out_dir, "ml_tree.png"),
+        "trace": os.path.join(out_dir, "trace.json"),
+    }
+    trace = Trace(os.path.basename(out_dir))
+    start = time.time()
+    result = run_pipeline(
+        input_fasta,
+        outputs["aligned_fasta"],
+        outputs["parsimony_tree"],
+        outputs["ml_tree"],
+        outputs["parsimony_image"],
+        outputs["ml_image"],
+        distances_file=outputs["distances"],
+        distance_mode=distance_mode,
+        bootstrap=bootstrap,
+        bootstrap_workers=workers,
+        distance_workers=workers,
+        trace=trace,
+        column_filter=column_filter,
+    )
+    trace.status = "done"
+    trace.write(outputs["trace"])
+    if distance_mode == "minhash":
+        del outputs["aligned_fasta"]
+    return {"num_seqs": result["num_seqs"], "seconds": round(time.time() - start, 2), "outputs": outputs}
+
+
+@click.command()
+@click.argument("inputs", nargs=-1, required=True)
+@click.option("-o", "--output-dir", default="output/batch", show_default=True,
+              help="One sub-folder per input is created here.")
+@click.option("-j", "--workers", type=click.IntRange(min=1), default=os.cpu_count() or 1,
+              show_default=True, help="Inputs analysed in parallel.")
+@click.option("--manifest", default=None,
+              help="Progress file used to resume (default: OUTPUT_DIR/manifest.json).")
+@click.option("--distance", "distance_mode", type=click.Choice(DISTANCE_MODES), default="identity",
+              show_default=True, help="'minhash' skips alignment and uses k-mer sketch distances.")
+@click.option("--bootstrap", type=click.IntRange(min=0), default=0, show_default=True,
+              help="Bootstrap replicates for support values on both trees (0 = off).")
+@click.option("--max-gap-fraction", type=click.FloatRange(0, 1), default=None,
+              help="Drop alignment columns with more gaps than this fraction of the sequences.")
+@click.option("--min-end-occupancy", type=click.FloatRange(0, 1), default=None,
+              help="Trim alignment ends where fewer than this fraction of the sequences have a residue.")
+@click.option("--collapse-invariant", is_flag=True,
+              help="Merge invariant alignment columns into weighted ones (same trees, less work).")
+@click.option("--force", is_flag=True, help="Re-run inputs the manifest marks as done.")
+def main(inputs, output_dir, workers, manifest, distance_mode, bootstrap, max_gap_fraction,
+         min_end_occupancy, collapse_invariant, force):
+    """
+    Aligns and builds trees for every FASTA file in INPUTS (files,
+    directories or glob patterns such as 'loci/**/*.fa').
+
+    Finished inputs are recorded in a manifest; rerunning the same command
+    skips them unless the file changed, so interrupted batches resume.
+    """
+    if bootstrap and distance_mode != "identity":
+        raise click.UsageError("--bootstrap needs an alignment; it can't be combined with --distance minhash.")
+    # Only the filters asked for, so unfiltered runs keep their cache keys
+    column_filter = {}
+    if max_gap_fraction is not None:
+        column_filter["max_gap_fraction"] = max_gap_fraction
+    if min_end_occupancy is not None:
+        column_filter["min_end_occupancy"] = min_end_occupancy
+    if collapse_invariant:
+        column_filter["collapse_invariant"] = True
+    if column_filter and distance_mode != "identity":
+        raise click.UsageError("Column filtering needs an alignment; it can't be combined with --distance minhash.")
+    files = collect_inputs(inputs)
+    if not files:
+        raise click.UsageError("No FASTA files found.")
+    output_dir = os.path.abspath(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = manifest or os.path.join(output_dir, "manifest.json")
+    state = load_manifest(manifest_path)
+    names = output_names(files)
+
+    # Step 1: decide what still needs running
+    todo = {}
+    for path in files:
+        key = cache_key(path, pipeline_params(distance_mode, bootstrap, column_filter))
+        if not force and is_complete(state.get(path), key):
+            continue
+        todo[path] = key
+    click.echo(f"📂 {len(files)} input(s): {len(files) - len(todo)} already done, {len(todo)} to run "
+               f"on {min(workers, max(len(todo), 1))} worker(s).")
+
+    # Step 2: run the rest, recording each result as soon as it arrives
+    failed = 0
+    # Each file gets its share of the CPUs for distance tiles and bootstrapping,
+    # so -j N never starts N x CPU-count processes
+    file_workers = max(1, (os.cpu_count() or 1) // min(workers, max(len(todo), 1)))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(analyze_file, path, os.path.join(output_dir, names[path]),
+                        distance_mode, bootstrap, file_workers, column_filter): path
+            for path in todo
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            path = futures[future]
+            entry = {"key": todo[path], "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+            try:
+                entry.update(status="done", **future.result())
+                click.echo(f"[{done}/{len(todo)}] ✅ {names[path]} "
+                           f"({entry['num_seqs']} sequences, {entry['seconds']} s)")
+            except Exception as e:
+                failed += 1
+                entry.update(status="failed", error=str(e))
+                click.echo(f"[{done}/{len(todo)}] ❌ {names[path]}: {e}", err=True)
+            state[path] = entry
+            save_manifest(manifest_path, state)
+
+    click.echo(f"📝 Manifest: {manifest_path}")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
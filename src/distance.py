@@ -0,0 +1,159 @@
+import numpy as np
+from Bio.Phylo.TreeConstruction import DistanceMatrix
+
+# Characters treated as gaps / ambiguity codes when the matching options are on
+GAP_CHARS = b"-."
+AMBIGUOUS_CHARS = b"NXRYKMSWBDHV?" + b"nxrykmswbdhv"
+
+
+def encode_alignment(alignment):
+    """
+    Encodes an alignment once into an n x L uint8 array (one byte per site).
+
+    Parameters:
+    - alignment: A Biopython MultipleSeqAlignment (or any iterable of records
+      with .id and .seq, e.g. fasta_parser.FastaRecord).
+
+    Returns:
+    - (ids, codes): list of sequence IDs and the (n, L) uint8 array.
+    """
+    records = list(alignment)
+    ids = [rec.id for rec in records]
+    seqs = [rec.seq.encode("ascii") if isinstance(rec.seq, str) else bytes(rec.seq)
+            for rec in records]
+    if not seqs:
+        return ids, np.zeros((0, 0), dtype=np.uint8)
+
+    length = len(seqs[0])
+    if any(len(s) != length for s in seqs):
+        raise ValueError("Sequences in an alignment must all have the same length.")
+
+    codes = np.frombuffer(b"".join(seqs), dtype=np.uint8).reshape(len(seqs), length)
+    return ids, codes
+
+
+def identity_distances(codes, ignore_gaps=False, ignore_ambiguous=False, block_size=4096,
+                       weights=None, rows=None):
+    """
+    Computes the full pairwise identity distance matrix in bulk.
+
+    With both options off this reproduces DistanceCalculator("identity")
+    exactly: d = 1 - matches / L, where gap-gap columns count as matches.
+    With ignore_gaps / ignore_ambiguous on, any column where either sequence
+    has a gap / ambiguity code is dropped from both the match count and the
+    length (pairwise deletion).
+
+    Parameters:
+    - codes (np.ndarray): (n, L) uint8 array from encode_alignment.
+    - ignore_gaps (bool): Skip columns with '-' or '.' in either sequence.
+    - ignore_ambiguous (bool): Skip columns with N/X/IUPAC codes in either sequence.
+    - block_size (int): Number of columns processed at once (bounds memory use).
+    - weights (np.ndarray or None): Per-column weights, e.g. site-pattern
+      counts from CompactAlignment.compress_patterns; None counts each once.
+    - rows (array-like or None): Only compute the distances from these
+      sequences to all others.
+
+    Returns:
+    - np.ndarray: (n, n) float64 symmetric distance matrix with a zero
+      diagonal, or (len(rows), n) if rows is given.
+    """
+    n, length = codes.shape
+    rows = np.arange(n) if rows is None else np.asarray(rows, dtype=np.intp)
+    skip = b""
+    if ignore_gaps:
+        skip += GAP_CHARS
+    if ignore_ambiguous:
+        skip += AMBIGUOUS_CHARS
+    skip = np.frombuffer(skip, dtype=np.uint8)
+
+    matches = np.zeros((len(rows), n), dtype=np.float64)
+    compared = np.zeros((len(rows), n), dtype=np.float64) if len(skip) else None
+
+    for start in range(0, length, block_size):
+        block = codes[:, start:start + block_size]
+        symbols = np.setdiff1d(np.unique(block), skip)
+        w = None if weights is None else np.asarray(weights[start:start + block_size], dtype=np.float32)
+
+        # One indicator matrix per symbol: matches[i, j] += x_i . (w * x_j)
+        for symbol in symbols:
+            x = (block == symbol).astype(np.float32)
+            matches += x[rows] @ (x if w is None else x * w).T
+
+        if compared is not None:
+            valid = (~np.isin(block, skip)).astype(np.float32)
+            compared += valid[rows] @ (valid if w is None else valid * w).T
+
+    if compared is None:
+        total = length if weights is None else float(np.sum(weights))
+        compared = np.full((len(rows), n), float(total))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dist = np.where(compared > 0, 1 - matches / compared, 1.0)
+    dist[np.arange(len(rows)), rows] = 0.0
+    return dist
+
+
+def extend_identity_distances(distances, old_codes, codes):
+    """
+    Identity distances of an alignment that adds sequences to an earlier
+    one, computing only the new rows of the matrix.
+
+    Adding sequences by profile alignment (align_sequences.add_to_alignment)
+    only inserts gap columns into the old rows. Those columns are gap-gap
+    matches for every old pair, so an old distance 1 - m / L simply becomes
+    1 - (m + g) / (L + g) = d * L / (L + g) after g insertions.
+
+    Parameters:
+    - distances (np.ndarray): (m, m) identity distances of the old alignment
+      (computed with the default options and no weights).
+    - old_codes (np.ndarray): (m, L) old alignment from encode_alignment.
+    - codes (np.ndarray): (n, L + g) new alignment; its first m rows are the
+      old sequences.
+
+    Returns:
+    - np.ndarray: (n, n) distance matrix as identity_distances(codes) would
+      return it, or None if the old rows changed in other ways than
+      inserted gap columns (then compute the whole matrix).
+    """
+    m, old_length = old_codes.shape
+    n, length = codes.shape
+    gaps = np.frombuffer(GAP_CHARS, dtype=np.uint8)
+    old_rows = codes[:m]
+    # Compare the alignments without the columns that are all gaps in the old rows
+    kept = ~np.isin(old_rows, gaps).all(axis=0)
+    old_kept = ~np.isin(old_codes, gaps).all(axis=0)
+    if (distances.shape != (m, m) or length < old_length
+            or not np.array_equal(old_rows[:, kept], old_codes[:, old_kept])):
+        return None
+
+    dist = np.empty((n, n), dtype=np.float64)
+    dist[:m, :m] = distances * (old_length / length) if length else distances
+    new_rows = identity_distances(codes, rows=np.arange(m, n))
+    dist[m:, :] = new_rows
+    dist[:, m:] = new_rows.T
+    return dist
+
+
+def to_distance_matrix(ids, dist):
+    """
+    Wraps a square NumPy distance array in a Biopython DistanceMatrix.
+    """
+    matrix = [dist[i, :i + 1].tolist() for i in range(len(ids))]
+    return DistanceMatrix(list(ids), matrix)
+
+
+def identity_distance_matrix(alignment, ignore_gaps=False, ignore_ambiguous=False):
+    """
+    Drop-in replacement for DistanceCalculator("identity").get_distance(alignment).
+
+    Parameters:
+    - alignment: A Biopython MultipleSeqAlignment.
+    - ignore_gaps (bool): See identity_distances.
+    - ignore_ambiguous (bool): See identity_distances.
+
+    Returns:
+    - Bio.Phylo.TreeConstruction.DistanceMatrix
+    """
+    ids, codes = encode_alignment(alignment)
+    dist = identity_distances(codes, ignore_gaps=ignore_gaps, ignore_ambiguous=ignore_ambiguous)
+    return to_distance_matrix(ids, dist)
@@ -0,0 +1,183 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .distance import identity_distances
+
+# Largest tile a worker computes at once, in matrix cells (rows x columns);
+# its float64 intermediates take about 8 bytes per cell
+TILE_CELLS = 4 * 1024 * 1024
+
+# Below this many taxa the matrix is filled in-process (a pool costs more)
+PARALLEL_MIN_TAXA = 500
+
+# Set in each worker process by _attach (PRIVATE)
+_worker = {}
+
+
+def _row_start(n, i):
+    """
+    Position of pair (i, i + 1) in a condensed vector over n taxa (PRIVATE).
+    """
+    return i * n - i * (i + 1) // 2
+
+
+class DistanceStore:
+    """
+    Distance matrix kept on disk as a condensed float32 vector in a .npy
+    file and memory-mapped, so the operating system pages it in and out
+    instead of it sitting in RAM. The layout is scipy's condensed form (the
+    upper triangle, row by row): n * (n - 1) / 2 values, a quarter of a
+    square float64 matrix.
+
+    It can stand in for a square NumPy matrix where the tree builders read
+    one: store[i, j] and store[i, cols] gather entries, and np.asarray(store)
+    (or np.array(store, dtype=np.float64)) makes the square matrix in one
+    allocation, block by block.
+
+    Parameters:
+    - path (str): The .npy file (see create, from_square, identity_distance_store).
+    - mode (str): "r" for read-only, "r+" to write into it.
+    """
+
+    def __init__(self, path, mode="r"):
+        self.path = path
+        self.condensed = np.load(path, mmap_mode=mode)
+        pairs = len(self.condensed)
+        n = int(round((1 + math.sqrt(1 + 8 * pairs)) / 2))
+        if self.condensed.ndim != 1 or n * (n - 1) // 2 != pairs:
+            raise ValueError(f"{path} does not hold a condensed distance matrix.")
+        self.n = n
+
+    @classmethod
+    def create(cls, path, n):
+        """
+        Makes a new, zero-filled store for n taxa, open for writing.
+        """
+        np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(n * (n - 1) // 2,)).flush()
+        return cls(path, "r+")
+
+    @classmethod
+    def from_square(cls, path, dist, block_rows=1024):
+        """
+        Saves a square (n, n) distance matrix as a store.
+        """
+        n = len(dist)
+        store = cls.create(path, n)
+        for lo in range(0, n, block_rows):
+            for i in range(lo, min(lo + block_rows, n - 1)):
+                start = _row_start(n, i)
+                store.condensed[start:start + n - 1 - i] = dist[i, i + 1:]
+        store.condensed.flush()
+        return store
+
+    @property
+    def shape(self):
+        return (self.n, self.n)
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, key):
+        rows, cols = key if isinstance(key, tuple) else (key, np.arange(self.n))
+        rows, cols = np.broadcast_arrays(np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp))
+        a, b = np.minimum(rows, cols), np.maximum(rows, cols)
+        same = a == b
+        index = _row_start(self.n, a) + b - a - 1
+        values = np.where(same, 0.0, self.condensed[np.where(same, 0, index)].astype(np.float64))
+        return values[()] if values.ndim == 0 else values
+
+    def __array__(self, dtype=None, copy=None):
+        n = self.n
+        square = np.zeros((n, n), dtype=dtype or self.condensed.dtype)
+        for i in range(n - 1):
+            start = _row_start(n, i)
+            row = self.condensed[start:start + n - 1 - i]
+            square[i, i + 1:] = row
+            square[i + 1:, i] = row
+        return square
+
+
+def identity_distance_store(codes, path, weights=None, workers=None, tile_cells=TILE_CELLS):
+    """
+    Identity distances (see distance.identity_distances) written straight
+    into a DistanceStore, never holding the whole matrix in memory.
+
+    The condensed vector is cut into tiles of consecutive rows, each row
+    against all later rows, so every tile is one contiguous stretch of the
+    file. Tiles are computed by a pool of worker processes that read the
+    alignment from one shared-memory copy and write into the memory-mapped
+    file themselves.
+
+    Parameters:
+    - codes (np.ndarray): (n, L) uint8 alignment matrix.
+    - path (str): The .npy file to write.
+    - weights (np.ndarray or None): Per-column weights (see identity_distances).
+    - workers (int or None): Worker processes (default: CPU count); 1 runs
+      in-process, as do alignments under PARALLEL_MIN_TAXA taxa.
+    - tile_cells (int): Largest tile, in matrix cells.
+
+    Returns:
+    - DistanceStore (read-only).
+    """
+    n = len(codes)
+    DistanceStore.create(path, n)
+    workers = workers or os.cpu_count() or 1
+    if n < PARALLEL_MIN_TAXA:
+        workers = 1
+    # Enough tiles to keep every worker busy, none bigger than tile_cells
+    cells = max(1, min(tile_cells, n * (n - 1) // (2 * 4 * workers)))
+    tiles = []
+    lo = 0
+    while lo < n - 1:
+        hi = min(n - 1, lo + max(1, cells // (n - lo)))
+        tiles.append((lo, hi))
+        lo = hi
+
+    workers = min(workers, len(tiles))
+    if workers > 1:
+        shared = shared_memory.SharedMemory(create=True, size=max(codes.nbytes, 1))
+        try:
+            np.ndarray(codes.shape, dtype=np.uint8, buffer=shared.buf)[:] = codes
+            with ProcessPoolExecutor(max_workers=workers, initializer=_attach,
+                                     initargs=(shared.name, codes.shape, path, weights)) as pool:
+                list(pool.map(_fill_tile, *zip(*tiles)))
+        finally:
+            shared.close()
+            shared.unlink()
+    else:
+        _worker.update(codes=codes, weights=weights, out=np.load(path, mmap_mode="r+"))
+        try:
+            for lo, hi in tiles:
+                _fill_tile(lo, hi)
+            _worker["out"].flush()
+        finally:
+            _worker.clear()
+    return DistanceStore(path)
+
+
+def _attach(name, shape, path, weights):
+    """
+    Worker initializer: maps the shared alignment and the output file (PRIVATE).
+    """
+    shared = shared_memory.SharedMemory(name=name)
+    _worker.update(shared=shared, codes=np.ndarray(shape, dtype=np.uint8, buffer=shared.buf),
+                   weights=weights, out=np.load(path, mmap_mode="r+"))
+
+
+def _fill_tile(lo, hi):
+    """
+    Computes rows lo..hi-1 against all later rows and writes them (PRIVATE).
+    """
+    codes, out = _worker["codes"], _worker["out"]
+    n = len(codes)
+    block = identity_distances(codes[lo:], weights=_worker["weights"], rows=np.arange(hi - lo))
+    start = _row_start(n, lo)
+    for r in range(hi - lo):
+        width = n - 1 - (lo + r)
+        out[start:start + width] = block[r, r + 1:]
+        start += width
+    out.flush()
@@ -1,10 +1,375 @@
-from Bio import SeqIO
+import mmap
+import os
+
+# Bytes read at a time when counting records
+COUNT_CHUNK = 1 << 24
+
+# Bytes that are never part of a sequence
+_WHITESPACE = (b" ", b"\t", b"\r", b"\n", b"\v", b"\f")
+
+
+class FastaRecord:
+    """
+    Lightweight FASTA record: just the ID, the full header and the sequence.
+
+    Has the same .id / .description / .seq attributes as a SeqRecord for
+    read-only use, but .seq is a plain str and nothing else is attached.
+    """
+
+    __slots__ = ("id", "description", "seq")
+
+    def __init__(self, id, description, seq):
+        self.id = id
+        self.description = description
+        self.seq = seq
+
+    def __len__(self):
+        return len(self.seq)
+
+    def __repr__(self):
+        return f"FastaRecord(id={self.id!r}, length={len(self.seq)})"
+
+
+def _iter_records(buf):
+    """
+    Yields FastaRecords from a bytes-like buffer (bytes or mmap) (PRIVATE).
+    """
+    size = len(buf)
+    start = buf.find(b">")
+    while start != -1:
+        header_end = buf.find(b"\n", start)
+        if header_end == -1:
+            header_end = size
+        end = buf.find(b"\n>", header_end)
+        end = size if end == -1 else end + 1
+        header = bytes(buf[start + 1:header_end]).decode().strip()
+        seq = b"".join(buf[header_end:end].split()).decode("ascii")
+        yield FastaRecord(header.split(None, 1)[0] if header else "", header, seq)
+        start = end if end < size else -1
+
+
+def _open_mmap(filepath):
+    # mmap refuses empty files, which simply have no records
+    with open(filepath, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def iter_fasta(filepath):
+    """
+    Streams the records of a FASTA file without loading it into memory.
+
+    The file is memory-mapped and records are decoded one at a time, so only
+    the current record's sequence is ever held as a Python object.
+
+    Parameters:
+    - filepath (str): Path to the FASTA file.
+
+    Returns:
+    - generator of FastaRecord.
+    """
+    mm = _open_mmap(filepath)
+    if mm is None:
+        return
+    with mm:
+        yield from _iter_records(mm)
+
+
+def iter_fasta_bytes(data):
+    """
+    Same as iter_fasta, for FASTA content that is already in memory.
+    """
+    return _iter_records(data)
+
 
 def parse_fasta(filepath):
     """
-    Parses a FASTA file and returns a list of sequence records.
+    Parses a FASTA file and yields its sequence records one by one.
+
+    Raises ValueError (when iterated) if the file holds no sequences.
     """
-    records = list(SeqIO.parse(filepath, "fasta"))
-    if not records:
+    found = False
+    for record in iter_fasta(filepath):
+        found = True
+        yield record
+    if not found:
         raise ValueError("No sequences found in the FASTA file.")
-    return records
+
+
+def count_sequences(filepath):
+    """
+    Counts the records in a FASTA file without decoding any sequence.
+
+    Uses the .fai index if an up-to-date one exists, otherwise counts
+    header lines in large chunks.
+    """
+    index = FastaIndex.load(filepath)
+    if index is not None:
+        return len(index)
+
+    count = 0
+    previous = b"\n"  # a '>' at the very start of the file is a header too
+    with open(filepath, "rb") as f:
+        while True:
+            chunk = f.read(COUNT_CHUNK)
+            if not chunk:
+                return count
+            count += chunk.count(b"\n>") + (previous == b"\n" and chunk[:1] == b">")
+            previous = chunk[-1:]
+
+
+# Bytes allowed on sequence lines: IUPAC letters (either case), gaps,
+# stop codons and whitespace
+_SPACE_BYTES = b"".join(_WHITESPACE)
+_SEQUENCE_BYTES = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz-.*" + _SPACE_BYTES
+
+# Longest sequence ID kept for duplicate checks
+_MAX_ID = 1000
+
+
+class FastaValidator:
+    """
+    Checks FASTA content chunk by chunk, so an upload can be validated while
+    it is written to disk and rejected at the first bad line, without ever
+    holding the whole file in memory.
+
+    Checked: the content starts with a header, every header has an ID,
+    IDs are unique, every record has a sequence, and sequence lines hold
+    only letters, gaps ("-", "."), stops ("*") and whitespace. Chunks may
+    split lines (and headers) anywhere.
+
+    Usage:
+        validator = FastaValidator()
+        for chunk in chunks:
+            validator.feed(chunk)   # raises ValueError on bad content
+        validator.close()           # raises ValueError if no sequences
+
+    Attributes:
+    - records (int): Headers seen so far.
+    - residues (int): Sequence characters seen so far.
+    """
+
+    def __init__(self):
+        self.records = 0
+        self.residues = 0
+        self._line = 1
+        self._line_start = True
+        self._in_header = False
+        self._id = b""
+        self._id_done = False
+        self._record_residues = 0
+        self._ids = set()
+
+    def _fail(self, message):
+        raise ValueError(f"Invalid FASTA (line {self._line}): {message}")
+
+    def _end_record(self):
+        if self.records and self._record_residues == 0:
+            self._fail(f"record '{self._id.decode(errors='replace')}' has no sequence.")
+
+    def _end_header(self):
+        if not self._id:
+            self._fail("header without a sequence ID.")
+        if self._id in self._ids:
+            self._fail(f"duplicate sequence ID '{self._id.decode(errors='replace')}'.")
+        self._ids.add(self._id)
+        self._in_header = False
+
+    def _header_part(self, part):
+        # The ID is the header up to its first whitespace, possibly split across chunks
+        if self._id_done:
+            return
+        text = part.lstrip() if not self._id else part
+        word = text.split(None, 1)[0] if text.strip() else b""
+        self._id = (self._id + word)[:_MAX_ID]
+        self._id_done = bool(self._id) and len(word) < len(text)
+
+    def feed(self, chunk):
+        """
+        Validates the next chunk of bytes. Raises ValueError on bad content.
+        """
+        position = 0
+        size = len(chunk)
+        while position < size:
+            newline = chunk.find(b"\n", position)
+            end = size if newline == -1 else newline
+            part = chunk[position:end]
+            if self._line_start and part[:1] == b">":
+                self._end_record()
+                self.records += 1
+                self._record_residues = 0
+                self._in_header = True
+                self._id, self._id_done = b"", False
+                self._header_part(part[1:])
+            elif self._in_header:
+                self._header_part(part)
+            elif part:
+                residues = len(part.translate(None, _SPACE_BYTES))
+                if residues and not self.records:
+                    self._fail("FASTA content must start with a '>' header line.")
+                bad = part.translate(None, _SEQUENCE_BYTES)
+                if bad:
+                    self._fail(f"unexpected character {bad[:1].decode(errors='replace')!r} in a sequence.")
+                self._record_residues += residues
+                self.residues += residues
+            if newline == -1:
+                self._line_start = False
+                break
+            if self._in_header:
+                self._end_header()
+            self._line += 1
+            self._line_start = True
+            position = newline + 1
+
+    def close(self):
+        """
+        Checks the end of the content. Raises ValueError if there were no
+        records or the last one has no sequence.
+        """
+        if self._in_header:
+            self._end_header()
+        if not self.records:
+            raise ValueError("No sequences found in the FASTA file.")
+        self._end_record()
+
+
+class FastaIndex:
+    """
+    samtools-style .fai index: O(1) lookup of any sequence by ID.
+
+    Each entry holds (length, offset, line_bases, line_width): the sequence
+    length, the byte offset of its first base, and the bases / bytes per full
+    line. Records with ragged line lengths are still indexed; fetching them
+    just strips line breaks instead of computing positions.
+
+    Parameters:
+    - filepath (str): Indexed FASTA file.
+    - entries (dict): ID -> (length, offset, line_bases, line_width), in file order.
+    """
+
+    def __init__(self, filepath, entries):
+        self.filepath = filepath
+        self.entries = entries
+        self._mm = None
+
+    @classmethod
+    def build(cls, filepath, write=True):
+        """
+        Indexes filepath in one pass and, if write is True, saves
+        <filepath>.fai next to it.
+        """
+        entries = {}
+        mm = _open_mmap(filepath)
+        if mm is not None:
+            with mm:
+                for name, length, offset, line_bases, line_width in _scan_index(mm):
+                    if name in entries:
+                        raise ValueError(f"Duplicate sequence ID in FASTA file: {name}")
+                    entries[name] = (length, offset, line_bases, line_width)
+        index = cls(filepath, entries)
+        if write:
+            index.write()
+        return index
+
+    @classmethod
+    def load(cls, filepath):
+        """
+        Reads <filepath>.fai, or returns None if it is missing or older than
+        the FASTA file.
+        """
+        fai = filepath + ".fai"
+        try:
+            if os.path.getmtime(fai) < os.path.getmtime(filepath):
+                return None
+            entries = {}
+            with open(fai) as f:
+                for line in f:
+                    name, *numbers = line.rstrip("\n").split("\t")
+                    entries[name] = tuple(int(x) for x in numbers[:4])
+        except (OSError, ValueError):
+            return None
+        return cls(filepath, entries)
+
+    @classmethod
+    def open(cls, filepath):
+        """
+        Loads the existing index or builds (and saves) a new one.
+        """
+        return cls.load(filepath) or cls.build(filepath)
+
+    def write(self):
+        with open(self.filepath + ".fai", "w") as f:
+            for name, entry in self.entries.items():
+                f.write("\t".join([name, *map(str, entry)]) + "\n")
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    @property
+    def ids(self):
+        return list(self.entries)
+
+    def __getitem__(self, name):
+        """
+        Returns the sequence with this ID as a str (KeyError if absent).
+        """
+        length, offset, line_bases, line_width = self.entries[name]
+        if length == 0:
+            return ""
+        if self._mm is None:
+            self._mm = _open_mmap(self.filepath)
+        if line_bases:
+            # Regular lines: the sequence's byte span is known exactly
+            full, rest = divmod(length, line_bases)
+            end = offset + full * line_width + rest
+            return b"".join(self._mm[offset:end].split()).decode("ascii")
+        end = self._mm.find(b"\n>", offset)
+        end = len(self._mm) if end == -1 else end
+        return b"".join(self._mm[offset:end].split()).decode("ascii")
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+
+def _scan_index(buf):
+    """
+    Yields (id, length, offset, line_bases, line_width) per record (PRIVATE).
+
+    line_bases / line_width are 0 when the record's lines are not all the
+    same length (the last line may be shorter, as in samtools).
+    """
+    size = len(buf)
+    start = buf.find(b">")
+    while start != -1:
+        header_end = buf.find(b"\n", start)
+        if header_end == -1:
+            header_end = size
+        header = bytes(buf[start + 1:header_end]).decode().strip()
+        offset = min(header_end + 1, size)
+        end = buf.find(b"\n>", header_end)
+        end = size if end == -1 else end + 1
+
+        body = buf[offset:end]
+        length = len(body) - sum(body.count(c) for c in _WHITESPACE)
+        # Blank lines before the next header don't count as sequence lines
+        lines = body.rstrip()
+        width = body.find(b"\n") + 1 or len(body)
+        line_bases = width - sum(body[:width].count(c) for c in _WHITESPACE)
+        regular = False
+        if line_bases > 0:
+            # Every full line must end exactly one line width after the previous
+            breaks = lines[width - 1::width]
+            last = lines[len(breaks) * width:]
+            regular = breaks == b"\n" * len(breaks) and (
+                lines.count(b"\n") == len(breaks)) and (
+                length == len(breaks) * line_bases + len(last.strip()))
+        if not regular:
+            line_bases = width = 0
+        yield header.split(None, 1)[0] if header else "", length, offset, line_bases, width
+        start = end if end < size else -1
@@ -0,0 +1,230 @@
+import json
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: metrics updates are not locked
+    fcntl = None
+
+try:
+    import resource
+except ImportError:  # Windows: no peak RSS
+    resource = None
+
+# Aggregated stage metrics of every finished job, shared by all processes.
+# Override from the environment.
+METRICS_FILE = os.environ.get("SIMPLEPHYLO_METRICS", "output/metrics.json")
+
+# Histogram buckets (upper bounds) for stage wall times in seconds and job sizes
+SECONDS_BUCKETS = (0.05, 0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600)
+TAXA_BUCKETS = (10, 50, 100, 500, 1000, 5000, 10000)
+SITES_BUCKETS = (100, 500, 1000, 5000, 10000, 50000, 100000)
+
+log = logging.getLogger("simplephylo")
+
+
+def _reset_peak_rss():
+    # Linux lets a process reset its RSS high-water mark (VmHWM)
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss():
+    """
+    Peak resident set size of this process in bytes: since the last reset
+    where Linux allows it (see Trace.span), since start-up elsewhere, or
+    None if the platform can't tell.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _cpu_seconds():
+    # User + system time of this process and of its finished child
+    # processes (MUSCLE, bootstrap and rendering workers)
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+class Trace:
+    """
+    Instrumentation spans of one analysis job.
+
+    Each span records a stage's wall time, CPU time (including child
+    processes such as MUSCLE), peak RSS and the job attributes known when it
+    ended (taxa count, alignment length, ...). Spans are also logged to the
+    "simplephylo" logger.
+
+    Parameters:
+    - job_id (str or None): Job the trace belongs to.
+    """
+
+    def __init__(self, job_id=None):
+        self.job_id = job_id
+        self.attributes = {}
+        self.spans = []
+        self.status = None
+        self._start = time.time()
+
+    @contextmanager
+    def span(self, stage):
+        """
+        Context manager timing one stage; the span is recorded (with
+        error=True) even if the stage raises.
+        """
+        _reset_peak_rss()
+        wall, cpu = time.perf_counter(), _cpu_seconds()
+        record = {"stage": stage, "start": round(time.time() - self._start, 6)}
+        try:
+            yield record
+        except BaseException:
+            record["error"] = True
+            raise
+        finally:
+            record.update(
+                wall_seconds=round(time.perf_counter() - wall, 6),
+                cpu_seconds=round(_cpu_seconds() - cpu, 6),
+                peak_rss_bytes=peak_rss(),
+                **self.attributes,
+            )
+            self.spans.append(record)
+            log.info("stage %s: %.3fs wall, %.3fs cpu, peak rss %s",
+                     stage, record["wall_seconds"], record["cpu_seconds"], record["peak_rss_bytes"])
+
+    def to_dict(self):
+        return {"job_id": self.job_id, "status": self.status, "attributes": self.attributes,
+                "spans": self.spans}
+
+    def write(self, path):
+        # Write-then-rename so readers never see a half-written file
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.to_dict(), f, indent=1)
+        os.replace(tmp, path)
+
+
+def _observe(histogram, buckets, value):
+    # Cumulative bucket counts, Prometheus style
+    histogram.setdefault("buckets", [0] * len(buckets))
+    for k, bound in enumerate(buckets):
+        if value <= bound:
+            histogram["buckets"][k] += 1
+    histogram["sum"] = histogram.get("sum", 0) + value
+    histogram["count"] = histogram.get("count", 0) + 1
+
+
+class MetricsStore:
+    """
+    Stage metrics aggregated over every finished job, kept in one JSON file
+    so job workers and all web worker processes see the same numbers.
+    Updates are serialized with an exclusive file lock.
+
+    Parameters:
+    - path (str): The JSON file.
+    """
+
+    def __init__(self, path=METRICS_FILE):
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def record(self, trace):
+        """
+        Adds a finished job's trace: job count by status, stage wall-time
+        histograms, CPU time totals and peak RSS, and the job's size.
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(f"{self.path}.lock", "w") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            data = self.load()
+            jobs = data.setdefault("jobs", {})
+            jobs[trace.status] = jobs.get(trace.status, 0) + 1
+            for span in trace.spans:
+                stage = data.setdefault("stages", {}).setdefault(span["stage"], {})
+                _observe(stage.setdefault("seconds", {}), SECONDS_BUCKETS, span["wall_seconds"])
+                stage["cpu_seconds"] = stage.get("cpu_seconds", 0) + span["cpu_seconds"]
+                if span["peak_rss_bytes"] is not None:
+                    stage["peak_rss_bytes"] = max(stage.get("peak_rss_bytes", 0), span["peak_rss_bytes"])
+                    stage["last_peak_rss_bytes"] = span["peak_rss_bytes"]
+            if "taxa" in trace.attributes:
+                _observe(data.setdefault("taxa", {}), TAXA_BUCKETS, trace.attributes["taxa"])
+            if "sites" in trace.attributes:
+                _observe(data.setdefault("sites", {}), SITES_BUCKETS, trace.attributes["sites"])
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+
+    def render(self):
+        """
+        The metrics in the Prometheus text exposition format.
+        """
+        data = self.load()
+        stages = sorted(data.get("stages", {}).items())
+        lines = []
+
+        lines += _header("simplephylo_jobs_total", "counter", "Finished analysis jobs by outcome.")
+        for status, count in sorted(data.get("jobs", {}).items()):
+            lines.append(f'simplephylo_jobs_total{{status="{status}"}} {count}')
+
+        lines += _header("simplephylo_stage_seconds", "histogram", "Wall time of pipeline stages.")
+        for stage, values in stages:
+            lines += _histogram("simplephylo_stage_seconds", SECONDS_BUCKETS, values["seconds"], f'stage="{stage}"')
+
+        lines += _header("simplephylo_stage_cpu_seconds_total", "counter",
+                         "CPU time of pipeline stages, child processes included.")
+        for stage, values in stages:
+            lines.append(f'simplephylo_stage_cpu_seconds_total{{stage="{stage}"}} {values["cpu_seconds"]}')
+
+        for key, help_text in (("peak_rss_bytes", "Largest peak RSS of a pipeline stage so far."),
+                               ("last_peak_rss_bytes", "Peak RSS of the latest run of a pipeline stage.")):
+            lines += _header(f"simplephylo_stage_{key}", "gauge", help_text)
+            for stage, values in stages:
+                if key in values:
+                    lines.append(f'simplephylo_stage_{key}{{stage="{stage}"}} {values[key]}')
+
+        for key, buckets, help_text in (("taxa", TAXA_BUCKETS, "Sequences per analysis job."),
+                                        ("sites", SITES_BUCKETS, "Alignment columns per analysis job.")):
+            lines += _header(f"simplephylo_job_{key}", "histogram", help_text)
+            lines += _histogram(f"simplephylo_job_{key}", buckets, data.get(key, {}))
+        return "\n".join(lines) + "\n"
+
+
+def _header(name, kind, help_text):
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+
+
+def _histogram(name, buckets, values, labels=""):
+    # Bucket, sum and count samples of one histogram series
+    counts = values.get("buckets", [0] * len(buckets))
+    prefix = f"{labels}," if labels else ""
+    suffix = f"{{{labels}}}" if labels else ""
+    lines = [f'{name}_bucket{{{prefix}le="{bound}"}} {count}' for bound, count in zip(buckets, counts)]
+    lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {values.get("count", 0)}')
+    lines.append(f"{name}_sum{suffix} {values.get('sum', 0)}")
+    lines.append(f"{name}_count{suffix} {values.get('count', 0)}")
+    return lines
@@ -0,0 +1,224 @@
+import multiprocessing
+import os
+import signal
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+# How often a running job checks whether it has been cancelled
+CANCEL_POLL_INTERVAL = 0.5
+
+# Sent by a job's cancel watcher to its own process to interrupt the current
+# stage; None where there is no such signal (Windows)
+_CANCEL_SIGNAL = getattr(signal, "SIGUSR1", None)
+
+# Set once a job's stage has been interrupted, so nested watchers fire once
+_interrupted = threading.Event()
+
+
+class QueueFullError(RuntimeError):
+    """Raised by JobQueue.submit when every worker is busy and the queue is full."""
+
+
+class JobCancelled(Exception):
+    """Raised inside a job (from its progress callback) once it has been cancelled."""
+
+
+class JobQueue:
+    """
+    Runs analysis jobs in a pool of worker processes and tracks their progress.
+
+    Jobs receive a `progress(step, total, stage)` keyword argument. Calling it
+    publishes the current stage and raises JobCancelled once cancel() has
+    been requested. A running stage is also interrupted within
+    CANCEL_POLL_INTERVAL seconds (see interrupt_on_cancel), so a long
+    alignment, bootstrap or tree search doesn't hold its worker.
+
+    Parameters:
+    - max_workers (int): Jobs that may run at the same time.
+    - max_queued (int): Jobs that may wait for a free worker before submit()
+      starts rejecting new ones with QueueFullError.
+    - preload (tuple of str): Modules to import once in the fork server that
+      worker processes are forked from, so each new worker shares them
+      copy-on-write instead of importing them again. Ignored where only the
+      "spawn" start method exists.
+    """
+
+    def __init__(self, max_workers=1, max_queued=8, preload=()):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.preload = tuple(preload)
+        self._lock = threading.Lock()
+        self._futures = {}
+        self._executor = None
+        self._manager = None
+        self._state = None
+        self._cancel = None
+
+    def _start(self):
+        # Workers come from a single-threaded fork server (or are spawned where
+        # there is none), never forked from the threaded web server itself
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload(list(self.preload))
+        else:
+            context = multiprocessing.get_context("spawn")
+        self._manager = context.Manager()
+        self._state = self._manager.dict()
+        self._cancel = self._manager.dict()
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+
+    def submit(self, fn, *args, job_id=None, **kwargs):
+        """
+        Queues fn(*args, progress=..., **kwargs) and returns its job ID.
+        Pass job_id to reuse an ID that already names the job elsewhere
+        (e.g. its workspace); by default a new one is generated.
+        """
+        with self._lock:
+            if self._executor is None:
+                self._start()
+            self._prune_finished()
+            pending = sum(not future.done() for future in self._futures.values())
+            if pending >= self.max_workers + self.max_queued:
+                raise QueueFullError(
+                    f"The analysis queue is full ({pending} jobs waiting or running). "
+                    "Please try again in a few minutes."
+                )
+            job_id = job_id or uuid.uuid4().hex
+            self._state[job_id] = {"status": "queued", "stage": None, "step": 0, "total": 0}
+            self._futures[job_id] = self._executor.submit(
+                _run_job, job_id, self._state, self._cancel, fn, args, kwargs
+            )
+        return job_id
+
+    def status(self, job_id):
+        """
+        Returns a dict with "status" (queued / running / done / failed /
+        cancelled / unknown), the current "stage", "step" and "total", plus
+        "result" or "error" once the job has finished.
+        """
+        future = self._futures.get(job_id)
+        if future is None:
+            return {"status": "unknown"}
+        info = dict(self._state.get(job_id, {}))
+        if future.cancelled():
+            info["status"] = "cancelled"
+        elif future.done():
+            error = future.exception()
+            if isinstance(error, JobCancelled):
+                info["status"] = "cancelled"
+            elif error is not None:
+                info.update(status="failed", error=str(error))
+            else:
+                info.update(status="done", result=future.result())
+        return info
+
+    def cancel(self, job_id):
+        """
+        Cancels a queued job immediately, or stops a running one: its current
+        stage is interrupted within CANCEL_POLL_INTERVAL seconds, killing the
+        stage's subprocesses and process pools (see interrupt_on_cancel).
+        Where that isn't possible (no SIGUSR1, e.g. Windows) the job stops at
+        its next progress update, after the current stage. Returns False if
+        the job is unknown or finished.
+        """
+        future = self._futures.get(job_id)
+        if future is None or future.done():
+            return False
+        if not future.cancel():
+            self._cancel[job_id] = True
+        return True
+
+    def _prune_finished(self, keep=100):
+        # Forget the oldest finished jobs so bookkeeping stays bounded
+        finished = [job_id for job_id, future in self._futures.items() if future.done()]
+        for job_id in finished[:max(0, len(finished) - keep)]:
+            del self._futures[job_id]
+            self._state.pop(job_id, None)
+            self._cancel.pop(job_id, None)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._manager.shutdown()
+            self._executor = None
+
+
+def _run_job(job_id, state, cancel, fn, args, kwargs):
+    """
+    Worker-side wrapper: wires up the progress callback and runs the job (PRIVATE).
+    """
+    def progress(step, total, stage):
+        if cancel.get(job_id):
+            raise JobCancelled(job_id)
+        state[job_id] = {"status": "running", "stage": stage, "step": step, "total": total}
+
+    progress(0, 0, "starting")
+    try:
+        with interrupt_on_cancel(lambda: cancel.get(job_id)):
+            return fn(*args, progress=progress, **kwargs)
+    except Exception as e:
+        # A stage torn down by the cancel (e.g. a killed pool) may fail in
+        # its own way first
+        if cancel.get(job_id) and not isinstance(e, JobCancelled):
+            raise JobCancelled(job_id) from e
+        raise
+
+
+@contextmanager
+def interrupt_on_cancel(cancelled, interval=CANCEL_POLL_INTERVAL):
+    """
+    Interrupts the with-block as soon as cancelled() returns True instead of
+    at the next progress update. A background thread polls cancelled() and
+    then signals the process; the signal handler, in the main thread,
+    terminates the process pools the block started (multiprocessing
+    children) and raises JobCancelled wherever the block is, including while
+    it waits on a pool or a subprocess (which is then killed, see
+    align_sequences._run_muscle).
+
+    Only works when entered from the main thread of a process with SIGUSR1;
+    otherwise the block runs unwatched. Nested uses share one handler.
+
+    Parameters:
+    - cancelled (callable): Returns True once the job should stop.
+    - interval (float): Seconds between checks.
+    """
+    if _CANCEL_SIGNAL is None or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+    outermost = signal.getsignal(_CANCEL_SIGNAL) is not _stop_stage
+    if outermost:
+        _interrupted.clear()
+        previous = signal.signal(_CANCEL_SIGNAL, _stop_stage)
+    stop = threading.Event()
+
+    def watch():
+        while not stop.wait(interval):
+            if cancelled():
+                if not _interrupted.is_set():
+                    _interrupted.set()
+                    os.kill(os.getpid(), _CANCEL_SIGNAL)
+                return
+
+    watcher = threading.Thread(target=watch, name="cancel-watcher", daemon=True)
+    watcher.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        try:
+            watcher.join()
+        finally:
+            # Even if the signal lands here, the handler must not outlive the job
+            if outermost:
+                signal.signal(_CANCEL_SIGNAL, previous)
+
+
+def _stop_stage(signum, frame):
+    """
+    Signal handler of interrupt_on_cancel (PRIVATE).
+    """
+    for child in multiprocessing.active_children():
+        child.terminate()
+    raise JobCancelled("cancelled")
@@ -0,0 +1,517 @@
+import numpy as np
+from Bio.Phylo import BaseTree
+
+MODELS = ("JC69", "K80", "HKY")
+
+# Branch lengths are kept inside these bounds (expected substitutions per site)
+MIN_BRANCH = 1e-8
+MAX_BRANCH = 10.0
+
+# Newton steps per branch, and the change in length at which they stop
+NEWTON_STEPS = 20
+NEWTON_TOLERANCE = 1e-7
+
+# An NNI is only accepted if it raises the log-likelihood by more than this
+NNI_EPSILON = 1e-4
+
+# Range searched for the transition/transversion ratio of K80 and HKY
+KAPPA_BOUNDS = (0.05, 100.0)
+
+# Largest cache of partial likelihoods an ML search may build
+MAX_PARTIALS_BYTES = 1 << 30
+
+# Tip partial likelihoods for A, C, G, T: IUPAC codes allow several bases,
+# gaps and unknown characters allow all four
+_TIP_STATES = np.ones((256, 4))
+for _code, _bases in {
+    "A": "A", "C": "C", "G": "G", "T": "T", "U": "T",
+    "R": "AG", "Y": "CT", "S": "CG", "W": "AT", "K": "GT", "M": "AC",
+    "B": "CGT", "D": "AGT", "H": "ACT", "V": "ACG",
+}.items():
+    _row = np.array([base in _bases for base in "ACGT"], dtype=np.float64)
+    _TIP_STATES[ord(_code)] = _row
+    _TIP_STATES[ord(_code.lower())] = _row
+
+# Purine <-> purine and pyrimidine <-> pyrimidine changes (A<->G, C<->T)
+_TRANSITIONS = np.zeros((4, 4), dtype=bool)
+_TRANSITIONS[[0, 2, 1, 3], [2, 0, 3, 1]] = True
+
+
+class SubstitutionModel:
+    """
+    Time-reversible nucleotide model (JC69, K80 or HKY) in eigen form.
+
+    The rate matrix is scaled to one expected substitution per unit time,
+    so branch lengths are substitutions per site. P(t) and its first two
+    derivatives all share the eigenvectors, which is what makes per-branch
+    Newton optimization cheap (see LikelihoodTree.optimize_branch).
+
+    Parameters:
+    - name (str): "JC69", "K80" or "HKY".
+    - kappa (float): Transition/transversion rate ratio (ignored by JC69).
+    - freqs (array-like or None): Base frequencies A, C, G, T for HKY;
+      JC69 and K80 always use 1/4 each.
+    """
+
+    def __init__(self, name="HKY", kappa=2.0, freqs=None):
+        if name not in MODELS:
+            raise ValueError(f"model must be one of {MODELS}.")
+        self.name = name
+        self.kappa = 1.0 if name == "JC69" else float(kappa)
+        if name == "HKY" and freqs is not None:
+            freqs = np.asarray(freqs, dtype=np.float64)
+            self.freqs = freqs / freqs.sum()
+        else:
+            self.freqs = np.full(4, 0.25)
+        self._decompose()
+
+    @classmethod
+    def from_alignment(cls, alignment, name="HKY", kappa=2.0):
+        """
+        Model with HKY base frequencies taken from the alignment's A/C/G/T
+        counts (column weights included).
+        """
+        counts = np.ones(4)  # pseudocount keeps every frequency positive
+        weights = alignment.weights
+        for k, base in enumerate(b"ACGT"):
+            hits = (alignment.codes == base) | (alignment.codes == base + 32)
+            if base == ord("T"):
+                hits |= (alignment.codes == ord("U")) | (alignment.codes == ord("u"))
+            counts[k] += hits.sum() if weights is None else (hits.sum(axis=0) * weights).sum()
+        return cls(name, kappa, counts)
+
+    @property
+    def free_kappa(self):
+        return self.name != "JC69"
+
+    def with_kappa(self, kappa):
+        return SubstitutionModel(self.name, kappa, self.freqs)
+
+    def _decompose(self):
+        pi = self.freqs
+        q = np.where(_TRANSITIONS, self.kappa, 1.0) * pi[None, :]
+        np.fill_diagonal(q, 0.0)
+        np.fill_diagonal(q, -q.sum(axis=1))
+        q /= -(pi * np.diag(q)).sum()
+        # Reversibility makes D^1/2 Q D^-1/2 symmetric, so eigh is exact and stable
+        root = np.sqrt(pi)
+        values, vectors = np.linalg.eigh(root[:, None] * q / root[None, :])
+        self.values = values
+        self.vectors = vectors / root[:, None]        # U
+        self.inverse = vectors.T * root[None, :]      # U^-1
+
+    def transition(self, t):
+        """
+        P(t): 4x4 matrix of probabilities to go from state i (row) to j (column).
+        """
+        return np.maximum((self.vectors * np.exp(self.values * t)) @ self.inverse, 0.0)
+
+    def __repr__(self):
+        kappa = "" if self.name == "JC69" else f", kappa={self.kappa:.3f}"
+        return f"SubstitutionModel({self.name}{kappa})"
+
+
+class LikelihoodTree:
+    """
+    Unrooted tree with cached partial likelihoods for fast ML optimization.
+
+    Nodes 0..n-1 are the tips (in alignment order), the rest are internal.
+    For every directed edge (x, y) the partial likelihood of the subtree
+    hanging from x, seen from y, is cached on first use together with its
+    per-pattern log scale factors. Changing a branch or the topology only
+    drops the cached partials whose subtree contains the change, so
+    optimizing one branch after another, or trying an NNI, recomputes a
+    handful of nodes instead of the whole tree.
+
+    Parameters:
+    - alignment (CompactAlignment): Nucleotide alignment; it is compressed
+      to site patterns internally.
+    - adjacency (list of dict): adjacency[x][y] = length of branch x-y.
+    - model (SubstitutionModel): Substitution model.
+    """
+
+    def __init__(self, alignment, adjacency, model):
+        patterns = alignment.compress_patterns()
+        self.ids = list(alignment.ids)
+        self.weights = patterns.weights.astype(np.float64)
+        self.tips = _TIP_STATES[patterns.codes]  # (n, patterns, 4)
+        self.adj = adjacency
+        self.model = model
+        self._cache = {}
+
+    @classmethod
+    def from_phylo(cls, tree, alignment, model):
+        """
+        LikelihoodTree over a Bio.Phylo tree whose tips are the alignment IDs
+        (see adjacency_from_phylo).
+        """
+        return cls(alignment, adjacency_from_phylo(tree, alignment.ids), model)
+
+    def edges(self, start=None):
+        """
+        All branches (x, y) in depth-first order from start, so consecutive
+        branches share a node and reuse each other's partials.
+        """
+        if start is None:
+            start = self._center()
+        found = []
+        stack = [(start, None)]
+        while stack:
+            node, parent = stack.pop()
+            for child in self.adj[node]:
+                if child != parent:
+                    found.append((node, child))
+                    stack.append((child, node))
+        return found
+
+    def _center(self):
+        # Any internal node (or tip 0 for trees without one)
+        return len(self.ids) if len(self.adj) > len(self.ids) else 0
+
+    # ── Partial likelihoods ──────────────────────────────────────────────
+
+    def partial(self, x, y):
+        """
+        (likelihoods, log_scale) of the subtree at x, excluding branch x-y.
+        likelihoods is (patterns, 4); log_scale is (patterns,).
+        """
+        if (x, y) in self._cache:
+            return self._cache[(x, y)]
+        # Post-order over the missing partials only, without recursion
+        stack = [(x, y, False)]
+        while stack:
+            node, away, ready = stack.pop()
+            if (node, away) in self._cache:
+                continue
+            if node < len(self.ids):
+                self._cache[(node, away)] = (self.tips[node], np.zeros(len(self.weights)))
+                continue
+            children = [c for c in self.adj[node] if c != away]
+            if not ready:
+                stack.append((node, away, True))
+                stack.extend((c, node, False) for c in children if (c, node) not in self._cache)
+                continue
+            likelihood = None
+            log_scale = np.zeros(len(self.weights))
+            for child in children:
+                child_lik, child_scale = self._cache[(child, node)]
+                contribution = child_lik @ self.model.transition(self.adj[node][child]).T
+                likelihood = contribution if likelihood is None else likelihood * contribution
+                log_scale = log_scale + child_scale
+            # Rescale every pattern to a maximum of 1 so deep trees don't underflow
+            scale = np.maximum(likelihood.max(axis=1), 1e-300)
+            self._cache[(node, away)] = (likelihood / scale[:, None], log_scale + np.log(scale))
+        return self._cache[(x, y)]
+
+    def _invalidate(self, x, y):
+        """
+        Drops every cached partial whose subtree contains branch x-y.
+        """
+        stack = [(x, y), (y, x)]
+        while stack:
+            near, far = stack.pop()
+            # Partials pointing away from the branch, starting at `near`
+            for other in self.adj[near]:
+                if other != far and self._cache.pop((near, other), None) is not None:
+                    stack.append((other, near))
+
+    def _branch_terms(self, x, y):
+        """
+        Per-pattern coefficients z and log scale so the site likelihoods on
+        branch x-y are z @ exp(values * t) (PRIVATE).
+        """
+        lik_x, scale_x = self.partial(x, y)
+        lik_y, scale_y = self.partial(y, x)
+        model = self.model
+        z = ((lik_x * model.freqs) @ model.vectors) * (lik_y @ model.inverse.T)
+        return z, scale_x + scale_y
+
+    def _branch_log_likelihood(self, z, scale, t):
+        site = np.maximum(z @ np.exp(self.model.values * t), 1e-300)
+        return float(self.weights @ (np.log(site) + scale))
+
+    def log_likelihood(self):
+        """
+        Log-likelihood of the alignment given the tree, branch lengths and model.
+        """
+        x, y = self.edges()[0]
+        z, scale = self._branch_terms(x, y)
+        return self._branch_log_likelihood(z, scale, self.adj[x][y])
+
+    # ── Optimization ─────────────────────────────────────────────────────
+
+    def set_length(self, x, y, t):
+        if self.adj[x][y] != t:
+            self._invalidate(x, y)
+            self.adj[x][y] = self.adj[y][x] = t
+
+    def _newton(self, z, scale, t):
+        """
+        Maximizes the branch log-likelihood in t by safeguarded Newton steps
+        (PRIVATE). Returns (t, log-likelihood).
+        """
+        values = self.model.values
+        for _ in range(NEWTON_STEPS):
+            e = np.exp(values * t)
+            site = np.maximum(z @ e, 1e-300)
+            d1 = z @ (values * e) / site
+            d2 = z @ (values * values * e) / site - d1 * d1
+            g, h = self.weights @ d1, self.weights @ d2
+            # Newton where the curve is concave, otherwise walk uphill
+            if h < 0:
+                step = -g / h
+            else:
+                step = t if g > 0 else -t / 2
+            new_t = min(max(t + step, MIN_BRANCH), MAX_BRANCH)
+            if abs(new_t - t) < NEWTON_TOLERANCE:
+                t = new_t
+                break
+            t = new_t
+        return t, self._branch_log_likelihood(z, scale, t)
+
+    def optimize_branch(self, x, y):
+        """
+        Sets branch x-y to its ML length given the rest of the tree, and
+        returns the resulting log-likelihood.
+        """
+        z, scale = self._branch_terms(x, y)
+        t, log_lik = self._newton(z, scale, self.adj[x][y])
+        self.set_length(x, y, t)
+        return log_lik
+
+    def optimize_branches(self, rounds=2, tolerance=1e-3):
+        """
+        Optimizes every branch in turn, for up to `rounds` passes or until a
+        pass gains less than tolerance log-likelihood units.
+        """
+        log_lik = self.log_likelihood()
+        for _ in range(rounds):
+            previous = log_lik
+            for x, y in self.edges():
+                log_lik = self.optimize_branch(x, y)
+            if log_lik - previous < tolerance:
+                break
+        return log_lik
+
+    def optimize_model(self):
+        """
+        ML estimate of kappa (K80, HKY) with branch lengths held fixed.
+        """
+        from scipy.optimize import minimize_scalar
+
+        if not self.model.free_kappa:
+            return self.log_likelihood()
+
+        def negative(log_kappa):
+            self.model = self.model.with_kappa(np.exp(log_kappa))
+            self._cache.clear()
+            return -self.log_likelihood()
+
+        best = minimize_scalar(negative, bounds=np.log(KAPPA_BOUNDS), method="bounded",
+                               options={"xatol": 1e-3})
+        self.model = self.model.with_kappa(np.exp(best.x))
+        self._cache.clear()
+        return self.log_likelihood()
+
+    def _nni_candidates(self, a, b):
+        """
+        Scores both NNI rearrangements around internal branch a-b, each with
+        its central branch optimized (PRIVATE). Returns (gain, swap, t) for
+        the better one, where swap = (a_child, b_child) to exchange.
+        """
+        a1, a2 = [c for c in self.adj[a] if c != b]
+        b1, b2 = [c for c in self.adj[b] if c != a]
+        current = self.optimize_branch(a, b)
+        t_ab = self.adj[a][b]
+        best = (0.0, None, t_ab)
+        model = self.model
+        for keep_a, swap_a, swap_b, keep_b in ((a1, a2, b1, b2), (a1, a2, b2, b1)):
+            # a ends up with {keep_a, swap_b}, b with {keep_b, swap_a}
+            sides = []
+            for node, children in ((a, ((keep_a, a), (swap_b, b))), (b, ((keep_b, b), (swap_a, a)))):
+                likelihood, log_scale = 1.0, 0.0
+                for child, old_parent in children:
+                    child_lik, child_scale = self.partial(child, old_parent)
+                    likelihood = likelihood * (child_lik @ model.transition(self.adj[old_parent][child]).T)
+                    log_scale = log_scale + child_scale
+                scale = np.maximum(likelihood.max(axis=1), 1e-300)
+                sides.append((likelihood / scale[:, None], log_scale + np.log(scale)))
+            (lik_a, scale_a), (lik_b, scale_b) = sides
+            z = ((lik_a * model.freqs) @ model.vectors) * (lik_b @ model.inverse.T)
+            t, log_lik = self._newton(z, scale_a + scale_b, t_ab)
+            if log_lik - current > max(best[0], NNI_EPSILON):
+                best = (log_lik - current, (swap_a, swap_b), t)
+        return best
+
+    def _swap(self, a, b, swap_a, swap_b):
+        """
+        Exchanges subtree swap_a (next to a) with swap_b (next to b) (PRIVATE).
+        """
+        self._invalidate(a, b)
+        self._cache.pop((a, b), None)
+        self._cache.pop((b, a), None)
+        t_a, t_b = self.adj[a].pop(swap_a), self.adj[b].pop(swap_b)
+        del self.adj[swap_a][a], self.adj[swap_b][b]
+        self.adj[a][swap_b] = self.adj[swap_b][a] = t_b
+        self.adj[b][swap_a] = self.adj[swap_a][b] = t_a
+        # The moved subtrees themselves are unchanged, only re-attached
+        for node, old, new in ((swap_a, a, b), (swap_b, b, a)):
+            cached = self._cache.pop((node, old), None)
+            if cached is not None:
+                self._cache[(node, new)] = cached
+
+    def nni_round(self):
+        """
+        One pass of nearest-neighbour interchanges over every internal
+        branch, applying each improving swap straight away. Returns the
+        number of swaps made.
+        """
+        tips = len(self.ids)
+        swaps = 0
+        for a, b in self.edges():
+            if a < tips or b < tips or b not in self.adj[a]:
+                continue
+            if len(self.adj[a]) != 3 or len(self.adj[b]) != 3:
+                continue
+            gain, swap, t = self._nni_candidates(a, b)
+            if swap is not None:
+                self._swap(a, b, *swap)
+                self.set_length(a, b, t)
+                swaps += 1
+        return swaps
+
+    # ── Conversion ───────────────────────────────────────────────────────
+
+    def to_phylo(self):
+        """
+        Unrooted Bio.Phylo tree with the optimized branch lengths.
+        """
+        return phylo_from_adjacency(self.adj, self.ids)
+
+
+def adjacency_from_phylo(tree, ids):
+    """
+    Converts a Bio.Phylo tree into the adjacency form used by the search
+    engines: nodes 0..n-1 are the tips in ids order, the rest internal, and
+    adjacency[x][y] is the length of branch x-y.
+
+    A bifurcating root is dissolved into one branch; missing or negative
+    branch lengths become MIN_BRANCH.
+    """
+    index = {name: i for i, name in enumerate(ids)}
+    adj = [dict() for _ in range(len(index))]
+    node_of = {}
+    stack = [(tree.root, None)]
+    while stack:
+        clade, parent = stack.pop()
+        if clade.is_terminal():
+            if clade.name not in index:
+                raise ValueError(f"Tree tip {clade.name!r} is not in the alignment.")
+            node = index[clade.name]
+        else:
+            node = len(adj)
+            adj.append({})
+        node_of[clade] = node
+        if parent is not None:
+            length = min(max(clade.branch_length or 0.0, MIN_BRANCH), MAX_BRANCH)
+            adj[node][parent] = adj[parent][node] = length
+        stack.extend((child, node) for child in clade.clades)
+    if len(node_of) != len(adj) or sum(c.is_terminal() for c in node_of) != len(index):
+        raise ValueError("Tree tips must match the alignment IDs one to one.")
+
+    # Internal nodes with two neighbours (a rooted tree's root) are merged away
+    for node in range(len(index), len(adj)):
+        if len(adj[node]) == 2:
+            (a, t_a), (b, t_b) = adj[node].items()
+            del adj[a][node], adj[b][node]
+            adj[a][b] = adj[b][a] = min(t_a + t_b, MAX_BRANCH)
+            adj[node] = {}
+    keep = [node for node in range(len(adj)) if node < len(index) or adj[node]]
+    remap = {old: new for new, old in enumerate(keep)}
+    return [{remap[y]: t for y, t in adj[x].items()} for x in keep]
+
+
+def phylo_from_adjacency(adj, ids):
+    """
+    Unrooted Bio.Phylo tree drawn from the first internal node, with
+    "Inner<k>" names like the distance trees (inverse of adjacency_from_phylo).
+    """
+    tips = len(ids)
+    if len(adj) == 1:
+        return BaseTree.Tree(BaseTree.Clade(0.0, ids[0]), rooted=False)
+    if len(adj) == 2:
+        t = adj[0][1]
+        root = BaseTree.Clade(None, "Inner")
+        root.clades = [BaseTree.Clade(t / 2, ids[0]), BaseTree.Clade(t / 2, ids[1])]
+        return BaseTree.Tree(root, rooted=False)
+    start = tips
+    clades = {start: BaseTree.Clade(None, "Inner1")}
+    inner = 1
+    stack = [(start, None)]
+    while stack:
+        node, parent = stack.pop()
+        for child in sorted(adj[node]):
+            if child == parent:
+                continue
+            if child < tips:
+                clade = BaseTree.Clade(adj[node][child], ids[child])
+            else:
+                inner += 1
+                clade = BaseTree.Clade(adj[node][child], f"Inner{inner}")
+                stack.append((child, node))
+            clades[node].clades.append(clade)
+            clades[child] = clade
+    return BaseTree.Tree(clades[start], rooted=False)
+
+
+def fits_in_memory(alignment, limit=MAX_PARTIALS_BYTES):
+    """
+    True if caching every partial likelihood of an ML search on this
+    alignment (two per branch, 4 doubles per site pattern) stays under limit.
+    """
+    n = len(alignment)
+    patterns = alignment.compress_patterns().shape[1]
+    return 2 * max(2 * n - 3, 1) * patterns * 5 * 8 <= limit
+
+
+def maximum_likelihood_tree(alignment, start_tree, model="HKY", nni_rounds=10, model_params=None):
+    """
+    Maximum-likelihood tree search from a starting tree.
+
+    Branch lengths are optimized one at a time by Newton's method, kappa by
+    a bounded 1-D search, and the topology by rounds of NNI until no swap
+    improves the likelihood. All of it reuses cached partial likelihoods
+    (see LikelihoodTree).
+
+    Parameters:
+    - alignment (CompactAlignment): Nucleotide alignment (weights allowed).
+    - start_tree (Bio.Phylo.BaseTree.Tree): Starting topology, e.g. the NJ tree.
+    - model (str or SubstitutionModel): "JC69", "K80", "HKY", or a ready
+      model whose parameters are then kept fixed.
+    - nni_rounds (int): Maximum NNI passes (0 keeps the starting topology).
+    - model_params (dict or None): If given, filled with the fitted
+      "model", "kappa" and "log_likelihood".
+
+    Returns:
+    - Bio.Phylo.BaseTree.Tree (unrooted) with ML branch lengths.
+    """
+    fixed = isinstance(model, SubstitutionModel)
+    if not fixed:
+        model = SubstitutionModel.from_alignment(alignment, model)
+    tree = LikelihoodTree.from_phylo(start_tree, alignment, model)
+    if len(tree.adj) < 2:
+        log_lik = 0.0
+    else:
+        tree.optimize_branches()
+        if not fixed:
+            tree.optimize_model()
+        for _ in range(nni_rounds):
+            if len(tree.adj) < 6 or not tree.nni_round():
+                break
+            tree.optimize_branches(rounds=1)
+        if not fixed:
+            tree.optimize_model()
+        log_lik = tree.optimize_branches()
+    if model_params is not None:
+        model_params.update(model=tree.model.name, kappa=tree.model.kappa, log_likelihood=log_lik)
+    return tree.to_phylo()
@@ -0,0 +1,297 @@
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .fasta_parser import iter_fasta
+
+# Defaults follow Mash: 21-mers for nucleotides, 9-mers for amino acids,
+# 1000 hashes per sketch
+KMER_SIZE = 21
+PROTEIN_KMER_SIZE = 9
+SKETCH_SIZE = 1000
+
+# Below this many sequences sketches are computed in-process
+PARALLEL_MIN_SEQUENCES = 64
+
+# Per-sequence sketch cache and its disk budget. Kept apart from the result
+# cache, whose eviction treats every directory under its root as one result.
+SKETCH_CACHE = os.environ.get("SIMPLEPHYLO_SKETCH_CACHE", "output/sketches")
+SKETCH_CACHE_MAX_BYTES = int(os.environ.get("SIMPLEPHYLO_SKETCH_CACHE_MB", 256)) * 1024 * 1024
+
+# Inputs where at least this fraction of letters is A/C/G/T/U/N are nucleotides
+NUCLEOTIDE_FRACTION = 0.9
+
+# 2-bit codes for A/C/G/T (either case); everything else breaks a k-mer
+_BASE_CODES = np.full(256, 255, dtype=np.uint8)
+for _code, _bases in enumerate(["Aa", "Cc", "Gg", "TtUu"]):
+    for _base in _bases:
+        _BASE_CODES[ord(_base)] = _code
+
+# 5-bit codes for the 20 standard amino acids
+_RESIDUE_CODES = np.full(256, 255, dtype=np.uint8)
+for _code, _residue in enumerate("ACDEFGHIKLMNPQRSTVWY"):
+    _RESIDUE_CODES[ord(_residue)] = _code
+    _RESIDUE_CODES[ord(_residue.lower())] = _code
+
+
+def _mix64(x):
+    """
+    splitmix64 finalizer: spreads k-mer codes uniformly over 64 bits (PRIVATE).
+    """
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xBF58476D1CE4E5B9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def guess_alphabet(seqs):
+    """
+    Returns "dna" if nearly all letters are nucleotides, else "protein".
+    """
+    letters = nucleotides = 0
+    for seq in seqs:
+        data = seq.upper().encode("ascii")
+        letters += len(data) - data.count(b"-") - data.count(b"*")
+        nucleotides += sum(data.count(base) for base in (b"A", b"C", b"G", b"T", b"U", b"N"))
+    return "dna" if letters and nucleotides >= NUCLEOTIDE_FRACTION * letters else "protein"
+
+
+def sketch_sequence(seq, k=KMER_SIZE, sketch_size=SKETCH_SIZE, alphabet="dna"):
+    """
+    Bottom-s MinHash sketch of a sequence.
+
+    Every k-mer is packed into an integer (2 bits per nucleotide, 5 per
+    amino acid), hashed to 64 bits, and the sketch_size smallest distinct
+    hashes are kept. Nucleotide k-mers are first reduced to their canonical
+    form (the smaller of itself and its reverse complement, so both strands
+    sketch the same). k-mers containing any other character are skipped.
+
+    Parameters:
+    - seq (str or bytes): The sequence.
+    - k (int): k-mer length, at most 32 for "dna" and 12 for "protein".
+    - sketch_size (int): Hashes kept per sketch.
+    - alphabet (str): "dna" or "protein".
+
+    Returns:
+    - np.ndarray: Sorted uint64 hashes (fewer than sketch_size for short sequences).
+    """
+    bits, table = (2, _BASE_CODES) if alphabet == "dna" else (5, _RESIDUE_CODES)
+    if not 0 < k * bits <= 64:
+        raise ValueError(f"k must be between 1 and {64 // bits} for {alphabet} sequences.")
+    if isinstance(seq, str):
+        seq = seq.encode("ascii")
+    codes = table[np.frombuffer(seq, dtype=np.uint8)]
+    windows = len(codes) - k + 1
+    if windows <= 0:
+        return np.zeros(0, dtype=np.uint64)
+
+    # Windows containing an unknown character are dropped
+    bad = np.concatenate([[0], np.cumsum(codes == 255)])
+    valid = bad[k:] == bad[:windows]
+    codes = np.where(codes == 255, 0, codes).astype(np.uint64)
+
+    kmers = np.zeros(windows, dtype=np.uint64)
+    for j in range(k):
+        kmers = (kmers << np.uint64(bits)) | codes[j:j + windows]
+    if alphabet == "dna":
+        # Complement is 3 - code; the reverse complement reads the window backwards
+        reverse = np.zeros(windows, dtype=np.uint64)
+        for j in range(k):
+            reverse |= (np.uint64(3) - codes[j:j + windows]) << np.uint64(2 * j)
+        kmers = np.minimum(kmers, reverse)
+    return np.unique(_mix64(kmers[valid]))[:sketch_size]
+
+
+def _sketch_many(seqs, k, sketch_size, alphabet):
+    return [sketch_sequence(seq, k, sketch_size, alphabet) for seq in seqs]
+
+
+class SketchCache:
+    """
+    On-disk store of sketches, one .npy per (sequence, alphabet, k, sketch_size),
+    so re-analysing overlapping inputs only sketches new sequences. A hit
+    refreshes the file's timestamp; evict removes the least recently used
+    sketches.
+
+    Parameters:
+    - root (str or None): Cache directory; None disables caching.
+    - max_bytes (int): Disk budget for all sketches together.
+    """
+
+    def __init__(self, root=None, max_bytes=SKETCH_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def _path(self, seq, alphabet, k, sketch_size):
+        digest = hashlib.sha1(seq.encode("ascii")).hexdigest()
+        return os.path.join(self.root, f"{digest}-{alphabet}-k{k}-s{sketch_size}.npy")
+
+    def get(self, seq, alphabet, k, sketch_size):
+        if self.root is None:
+            return None
+        path = self._path(seq, alphabet, k, sketch_size)
+        try:
+            sketch = np.load(path)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return sketch
+
+    def put(self, seq, alphabet, k, sketch_size, sketch):
+        if self.root is None:
+            return
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(seq, alphabet, k, sketch_size)
+        tmp = f"{path}.{os.getpid()}.tmp.npy"
+        np.save(tmp, sketch)
+        os.replace(tmp, path)
+
+    def evict(self):
+        """
+        Removes least recently used sketches until the cache fits max_bytes.
+        Returns the number of sketches removed.
+        """
+        if self.root is None or not os.path.isdir(self.root):
+            return 0
+        found = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if not name.endswith(".npy") or name.endswith(".tmp.npy"):
+                continue
+            try:
+                found.append((os.path.getmtime(path), os.path.getsize(path), path))
+            except OSError:
+                pass  # evicted by another process meanwhile
+        total = sum(size for _, size, _ in found)
+        removed = 0
+        for _, size, path in sorted(found):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+
+def sketch_fasta(fasta_path, k=None, sketch_size=SKETCH_SIZE, alphabet=None, workers=None,
+                 cache_dir=None):
+    """
+    Sketches every sequence of a FASTA file, reusing cached sketches and
+    computing the rest on a process pool.
+
+    Parameters:
+    - fasta_path (str): Unaligned FASTA file.
+    - k (int or None): k-mer length; None picks KMER_SIZE or PROTEIN_KMER_SIZE.
+    - sketch_size (int): See sketch_sequence.
+    - alphabet (str or None): "dna" or "protein"; None guesses from the data.
+    - workers (int or None): Worker processes (default: CPU count).
+    - cache_dir (str or None): Per-sequence sketch cache (see SketchCache).
+
+    Returns:
+    - (ids, sketches, k): IDs, list of uint64 arrays, and the k-mer length used.
+    """
+    ids, seqs = [], []
+    for record in iter_fasta(fasta_path):
+        ids.append(record.id)
+        seqs.append(record.seq.upper())
+    alphabet = alphabet or guess_alphabet(seqs)
+    k = k or (KMER_SIZE if alphabet == "dna" else PROTEIN_KMER_SIZE)
+
+    cache = SketchCache(cache_dir)
+    sketches = [cache.get(seq, alphabet, k, sketch_size) for seq in seqs]
+    missing = [i for i, sketch in enumerate(sketches) if sketch is None]
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(missing) >= PARALLEL_MIN_SEQUENCES:
+        # A few chunks per worker keeps the pool busy without per-sequence overhead
+        chunks = np.array_split(missing, workers * 4)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(_sketch_many, [[seqs[i] for i in c] for c in chunks],
+                               [k] * len(chunks), [sketch_size] * len(chunks),
+                               [alphabet] * len(chunks))
+            computed = [sketch for chunk in results for sketch in chunk]
+    else:
+        computed = _sketch_many([seqs[i] for i in missing], k, sketch_size, alphabet)
+
+    for i, sketch in zip(missing, computed):
+        sketches[i] = sketch
+        cache.put(seqs[i], alphabet, k, sketch_size, sketch)
+    if missing:
+        cache.evict()
+    return ids, sketches, k
+
+
+def minhash_distances(sketches, k=KMER_SIZE):
+    """
+    Mash distances between all pairs of sketches.
+
+    For a pair (A, B), every hash up to t = min(max A, max B) is present in
+    at least one sketch, so the hashes <= t of A and B together are exactly
+    the bottom of the union, and the shared ones estimate the Jaccard index
+    j. Shared counts for all pairs come from a few matrix products (see
+    _shared_counts).
+    The distance is Mash's -ln(2j / (1 + j)) / k, capped at 1 (no k-mers
+    shared, or a sequence too short to sketch).
+
+    Parameters:
+    - sketches (list of np.ndarray): Sorted uint64 sketches.
+    - k (int): k-mer length the sketches were built with.
+
+    Returns:
+    - np.ndarray: (n, n) float64 distance matrix with a zero diagonal.
+    """
+    n = len(sketches)
+    if n == 0:
+        return np.zeros((0, 0))
+
+    shared = _shared_counts(sketches)
+
+    # below[i, j] = hashes of sketch i that are <= max of sketch j
+    maxima = np.array([s[-1] if len(s) else 0 for s in sketches], dtype=np.uint64)
+    below = np.array([np.searchsorted(s, maxima, side="right") for s in sketches], dtype=np.float64)
+    below = below.reshape(n, n)
+    union = below + below.T - shared
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        jaccard = np.where(union > 0, shared / union, 0.0)
+        dist = np.where(jaccard > 0, -np.log(2 * jaccard / (1 + jaccard)) / k, 1.0)
+    dist = np.where(dist > 0, np.minimum(dist, 1.0), 0.0)
+    np.fill_diagonal(dist, 0.0)
+    return dist
+
+
+def _shared_counts(sketches, block_size=2048):
+    """
+    shared[i, j] = number of hashes sketches i and j have in common,
+    off the diagonal (PRIVATE).
+
+    Hashes held by a single sketch are dropped. Hashes held by more than a
+    quarter of the sketches are counted with dense float32 matrix products
+    (a handful of BLAS calls), the rest with a sparse product, whose cost
+    grows with the square of each hash's frequency.
+    """
+    from scipy import sparse
+
+    n = len(sketches)
+    sizes = [len(s) for s in sketches]
+    hashes, columns = np.unique(np.concatenate(sketches), return_inverse=True)
+    rows = np.repeat(np.arange(n), sizes)
+    incidence = sparse.csc_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, columns.reshape(-1))),
+        shape=(n, len(hashes)),
+    )
+    frequency = np.diff(incidence.indptr)
+
+    light = incidence[:, np.flatnonzero((frequency > 1) & (frequency <= n // 4))]
+    shared = (light @ light.T.tocsr()).toarray().astype(np.float64)
+
+    heavy = incidence[:, np.flatnonzero(frequency > n // 4)]
+    for start in range(0, heavy.shape[1], block_size):
+        block = heavy[:, start:start + block_size].toarray()
+        shared += block @ block.T
+    return shared
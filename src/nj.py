@@ -0,0 +1,353 @@
+import numpy as np
+from Bio.Phylo import BaseTree
+
+# Below this many nodes the row sums are redone left to right, exactly as
+# Biopython does. Q always ties at 3-4 nodes, so the last merges are decided
+# by rounding and need the same arithmetic to produce the same Newick string.
+EXACT_SUMS_BELOW = 16
+
+# Number of nearest columns remembered per row for bound pruning
+NEAREST = 32
+
+# Pairs whose Q is within this fraction of max(r) of the best are treated as
+# possible ties and re-scored with Biopython's exact arithmetic
+TIE_TOLERANCE = 1e-9
+
+# Rows per vectorized block when the whole lower triangle has to be scanned
+SCAN_BLOCK_ROWS = 128
+
+
+def neighbor_joining(names, dist, prune=True):
+    """
+    Builds a neighbor-joining tree from a square NumPy distance matrix or a
+    DistanceStore.
+
+    Follows DistanceTreeConstructor().nj() step for step (same pair choice,
+    branch lengths, "Inner<k>" node names and final rooting), so callers get
+    the same tree, but keeps the matrix in one float64 array that is updated
+    in place instead of rebuilding a list-of-lists on every merge.
+
+    Parameters:
+    - names (list of str): Taxon names, in matrix order.
+    - dist (np.ndarray or DistanceStore): (n, n) symmetric distance
+      matrix. A store is expanded straight into the float64 working copy.
+    - prune (bool): RapidNJ-style search. Each row remembers its nearest
+      columns; the rest of a row is only scanned when a lower bound on its Q
+      values could still beat the best pair found. With prune=False the whole
+      Q matrix is scanned on every merge.
+
+    Returns:
+    - Bio.Phylo.BaseTree.Tree (unrooted, like Biopython's nj()).
+    """
+    n = len(names)
+    if dist.shape != (n, n):
+        raise ValueError("Distance matrix shape does not match the number of names.")
+
+    clades = [BaseTree.Clade(None, name) for name in names]
+    if n == 1:
+        return BaseTree.Tree(clades[0], rooted=False)
+    if n == 2:
+        clade1, clade2 = clades[1], clades[0]
+        clade1.branch_length = dist[1, 0] / 2.0
+        clade2.branch_length = dist[1, 0] - clade1.branch_length
+        inner = BaseTree.Clade(None, "Inner")
+        inner.clades.extend([clade1, clade2])
+        return BaseTree.Tree(inner, rooted=False)
+
+    # Working copy: retired slots and the diagonal hold +inf so they never win
+    # a minimum and never need masking.
+    d = np.array(dist, dtype=np.float64)
+    sums = d.sum(axis=1)
+    np.fill_diagonal(d, np.inf)
+    active = np.ones(n, dtype=bool)
+    nearest = _NearestColumns(d) if prune and n > 2 * NEAREST else None
+
+    m = n
+    inner_count = 0
+    inner = None
+    while m > 2:
+        live = np.flatnonzero(active)
+        if m < EXACT_SUMS_BELOW:
+            sums[live] = _exact_row_sums(d, live, live)
+        r = sums / (m - 2)
+        candidates = _Candidates(TIE_TOLERANCE * r[live].max())
+        if nearest is not None:
+            nearest.search(d, r, live, candidates)
+        else:
+            _scan(d, r, candidates)
+        i, j = candidates.resolve(d, live, m)
+        if (j, i) == tuple(live[:2]):
+            # Biopython starts its search at (min_i, min_j) = (0, 1) and keeps
+            # that orientation when the very first pair wins
+            i, j = j, i
+        d_ij = d[i, j]
+
+        inner_count += 1
+        inner = BaseTree.Clade(None, "Inner" + str(inner_count))
+        inner.clades.extend([clades[i], clades[j]])
+        # Branch lengths use exact row sums so they match Biopython to the bit
+        r_i, r_j = _exact_row_sums(d, [i, j], live) / (m - 2)
+        clades[i].branch_length = (d_ij + r_i - r_j) / 2.0
+        clades[j].branch_length = d_ij - clades[i].branch_length
+
+        # New node takes slot j (as in Biopython), slot i is retired
+        old_i, old_j = d[i].copy(), d[j].copy()
+        new_row = (old_i + old_j - d_ij) / 2.0
+        new_row[[i, j]] = np.inf
+        active[i] = False
+        d[i, :] = np.inf
+        d[:, i] = np.inf
+        d[j, :] = new_row
+        d[:, j] = new_row
+
+        others = active.copy()
+        others[j] = False
+        sums[others] += new_row[others] - old_i[others] - old_j[others]
+        sums[j] = new_row[others].sum()
+        sums[i] = 0.0
+        clades[j] = inner
+        clades[i] = None
+        m -= 1
+
+        if nearest is not None:
+            if m > 2 * NEAREST:
+                nearest.merged(d, j, new_row)
+            else:
+                nearest = None
+
+        # Compact once a fifth of the slots are dead so scans stay O(m^2)
+        if m > 2 and m * 5 < len(active) * 4:
+            keep = np.flatnonzero(active)
+            d = d[np.ix_(keep, keep)]
+            sums = sums[keep]
+            clades = [clades[k] for k in keep]
+            if nearest is not None:
+                nearest.compact(keep, len(active))
+            active = np.ones(len(keep), dtype=bool)
+
+    # Join the last two nodes, attaching to whichever one is the newest inner node
+    a, b = np.flatnonzero(active)
+    first, second = clades[a], clades[b]
+    if first is inner:
+        first.branch_length = 0
+        second.branch_length = d[b, a]
+        first.clades.append(second)
+        root = first
+    else:
+        first.branch_length = d[b, a]
+        second.branch_length = 0
+        second.clades.append(first)
+        root = second
+    return BaseTree.Tree(root, rooted=False)
+
+
+def _exact_row_sums(d, rows, live):
+    """
+    Row sums over the live columns, added left to right as Biopython does (PRIVATE).
+    """
+    vals = d[np.ix_(rows, live)]
+    vals[vals == np.inf] = 0.0  # the diagonal; Biopython adds its 0 in place
+    return np.cumsum(vals, axis=1)[:, -1]
+
+
+def _scan(d, r, candidates):
+    """
+    Offers every pair (i, j), i > j, to candidates (PRIVATE).
+
+    Scans the lower triangle in row blocks, each only up to its own diagonal.
+    """
+    size = len(r)
+    upper = np.triu(np.ones((SCAN_BLOCK_ROWS, SCAN_BLOCK_ROWS), dtype=bool))
+    for lo in range(1, size, SCAN_BLOCK_ROWS):
+        hi = min(lo + SCAN_BLOCK_ROWS, size)
+        q = d[lo:hi, :hi] - r[lo:hi, None]
+        q -= r[None, :hi]
+        corner = q[:, lo:hi]
+        corner[upper[:hi - lo, :hi - lo]] = np.inf
+        row_min = q.min(axis=1)
+        limit = candidates.limit(row_min.min())
+        if np.isfinite(limit):
+            near = np.flatnonzero(row_min <= limit)
+            rows, cols = np.nonzero(q[near] <= limit)
+            candidates.add(q[near[rows], cols], near[rows] + lo, cols)
+
+
+class _Candidates:
+    """
+    Collects the pairs whose Q is within tol of the smallest Q seen (PRIVATE).
+
+    Row sums are kept up to date incrementally, so they can differ from
+    Biopython's in the last bits. Near-ties are therefore re-scored from
+    exact row sums before picking, which keeps the chosen pair identical.
+    """
+
+    def __init__(self, tol):
+        self.tol = tol
+        self.best = np.inf
+        self.found = []
+
+    def limit(self, low=np.inf):
+        """Largest Q still worth offering, given a new minimum `low`."""
+        return min(self.best, low) + self.tol
+
+    def add(self, q, hi, lo):
+        """Offers pairs (hi > lo) with their Q values."""
+        if len(q) == 0:
+            return
+        self.best = min(self.best, q.min())
+        keep = q <= self.limit()
+        self.found.append((q[keep], hi[keep], lo[keep]))
+
+    def resolve(self, d, live, m):
+        """Returns (i, j), i > j, of the pair Biopython would pick."""
+        q = np.concatenate([f[0] for f in self.found])
+        hi = np.concatenate([f[1] for f in self.found])
+        lo = np.concatenate([f[2] for f in self.found])
+        keep = q <= self.limit()
+        pairs = np.unique(np.stack([hi[keep], lo[keep]], axis=1), axis=0)
+        if len(pairs) > 1:
+            nodes = np.unique(pairs)
+            r = np.zeros(len(d))
+            r[nodes] = _exact_row_sums(d, nodes, live) / (m - 2)
+            exact = d[pairs[:, 0], pairs[:, 1]] - r[pairs[:, 0]] - r[pairs[:, 1]]
+            # np.unique sorted the pairs by (i, j), so the first minimum is
+            # also the first one in Biopython's row-major scan
+            pairs = pairs[[np.argmin(exact)]]
+        return int(pairs[0, 0]), int(pairs[0, 1])
+
+
+class _NearestColumns:
+    """
+    Per-row index of the NEAREST closest columns, used to prune the Q search (PRIVATE).
+
+    For each row we keep the columns that were nearest when the row was last
+    indexed, the distance cut-off of that index, and the smallest distance to
+    any node created since. A pair outside the index therefore has
+    d[i, j] >= min(cut[i], fresh[i]), which bounds its Q value from below.
+    """
+
+    def __init__(self, d):
+        size = len(d)
+        self.cols = np.zeros((size, NEAREST), dtype=np.intp)
+        self.cut = np.zeros(size)
+        self.fresh = np.full(size, np.inf)
+        self.index_rows(d, np.arange(size))
+
+    def index_rows(self, d, rows):
+        part = np.argpartition(d[rows], NEAREST, axis=1)
+        self.cols[rows] = part[:, :NEAREST]
+        self.cut[rows] = np.take_along_axis(d[rows], part[:, NEAREST:NEAREST + 1], axis=1)[:, 0]
+        self.fresh[rows] = np.inf
+
+    def search(self, d, r, live, candidates):
+        """
+        Offers candidates every pair that could hold the minimum Q.
+        """
+        r_max = r[live].max()
+
+        # 1) Every indexed pair. Q is always computed as d - r[i] - r[j] with
+        #    i > j so rounding matches Biopython's lower-triangle scan.
+        cols = self.cols[live]
+        rows = np.broadcast_to(live[:, None], cols.shape)
+        hi = np.maximum(rows, cols).ravel()
+        lo = np.minimum(rows, cols).ravel()
+        candidates.add(d[hi, lo] - r[hi] - r[lo], hi, lo)
+
+        # 2) Rows whose unindexed part could still hold a better (or tied) pair,
+        #    in order of their bound, until the bound rises above the best Q
+        bound = np.minimum(self.cut[live], self.fresh[live]) - r[live] - r_max
+        order = np.argsort(bound, kind="stable")
+        todo, bound = live[order], bound[order]
+        start, step = 0, NEAREST
+        while start < len(todo) and bound[start] <= candidates.limit():
+            block = todo[start:start + step]
+            block = block[bound[start:start + step] <= candidates.limit()]
+            q = d[block] - r[block, None] - r[None, :]
+            # Flip entries above the diagonal so each pair is scored as (i > j)
+            above = np.arange(d.shape[1])[None, :] > block[:, None]
+            q[above] = (d[block] - r[None, :] - r[block, None])[above]
+            rows, cols = np.nonzero(q <= candidates.limit(q.min()))
+            hi = np.maximum(block[rows], cols)
+            lo = np.minimum(block[rows], cols)
+            candidates.add(q[rows, cols], hi, lo)
+            # The row was just scanned in full, so refresh its index
+            self.index_rows(d, block)
+            start += step
+            step *= 2
+
+    def merged(self, d, j, new_row):
+        """
+        Records the node that now lives in slot j.
+        """
+        np.minimum(self.fresh, new_row, out=self.fresh)
+        self.index_rows(d, np.array([j]))
+
+    def compact(self, keep, size):
+        """
+        Renumbers the index after the distance matrix dropped retired slots.
+        """
+        remap = np.full(size, -1)
+        remap[keep] = np.arange(len(keep))
+        cols = remap[self.cols[keep]]
+        # Retired columns point at the row itself (the +inf diagonal)
+        own = np.broadcast_to(np.arange(len(keep))[:, None], cols.shape)
+        self.cols = np.where(cols < 0, own, cols)
+        self.cut = self.cut[keep]
+        self.fresh = self.fresh[keep]
+
+
+def add_to_nj_tree(tree, names, dist):
+    """
+    Adds the taxa of a distance matrix that are missing from an unrooted
+    distance tree (e.g. the NJ tree of an earlier analysis) without
+    rebuilding it, at O(n) per new taxon.
+
+    Each new taxon x goes on the tip branch of its nearest placed taxon a,
+    at the distance from a given by the three-point formula, averaged over
+    the other placed taxa b: (d(a, x) + d(a, b) - d(x, b)) / 2.
+
+    Parameters:
+    - tree (Bio.Phylo.BaseTree.Tree): Tree over at least three of names;
+      modified in place.
+    - names (list of str): All taxon names, in matrix order.
+    - dist (np.ndarray): (n, n) distance matrix over names.
+
+    Returns:
+    - The same tree, holding every name.
+    """
+    index = {name: i for i, name in enumerate(names)}
+    tips = {clade.name: clade for clade in tree.get_terminals()}
+    if any(name not in index for name in tips):
+        raise ValueError("Tree tips must all be in the distance matrix.")
+    parent = {}
+    stack = [tree.root]
+    while stack:
+        clade = stack.pop()
+        for child in clade.clades:
+            parent[child] = clade
+            stack.append(child)
+    inner = len(parent) + 1 - len(tips)
+    placed = [index[name] for name in tips]
+
+    for x, name in enumerate(names):
+        if name in tips:
+            continue
+        others = np.array(placed)
+        a = others[np.argmin(dist[x, others])]
+        others = others[others != a]
+        split = np.mean(dist[a, x] + dist[a, others] - dist[x, others]) / 2
+        tip = tips[names[a]]
+        length = tip.branch_length or 0.0
+        split = min(max(split, 0.0), max(length, 0.0))
+
+        inner += 1
+        joint = BaseTree.Clade(length - split, f"Inner{inner}")
+        new = BaseTree.Clade(max(dist[a, x] - split, 0.0), name)
+        up = parent[tip]
+        up.clades[up.clades.index(tip)] = joint
+        tip.branch_length = split
+        joint.clades = [tip, new]
+        parent.update({joint: up, tip: joint, new: joint})
+        tips[name] = new
+        placed.append(x)
+    return tree
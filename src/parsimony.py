@@ -0,0 +1,430 @@
+import numpy as np
+
+from .likelihood import adjacency_from_phylo, phylo_from_adjacency
+
+# Regraft positions tried by SPR, as branches away from the pruning point.
+# Radius 1 is the NNI neighbourhood.
+SPR_RADIUS = 6
+
+# Search rounds at each radius before giving up on further improvement
+MAX_ROUNDS = 20
+
+# State sets as 4-bit masks over A, C, G, T: IUPAC codes hold several
+# states, gaps and unknown characters all four
+_STATE_SETS = np.full(256, 0b1111, dtype=np.uint8)
+for _code, _bases in {
+    "A": "A", "C": "C", "G": "G", "T": "T", "U": "T",
+    "R": "AG", "Y": "CT", "S": "CG", "W": "AT", "K": "GT", "M": "AC",
+    "B": "CGT", "D": "AGT", "H": "ACT", "V": "ACG",
+}.items():
+    _mask = sum(1 << "ACGT".index(base) for base in _bases)
+    _STATE_SETS[ord(_code)] = _mask
+    _STATE_SETS[ord(_code.lower())] = _mask
+
+# Place values of the weight layers (see weight_layers)
+_POWERS = 1 << np.arange(62, dtype=np.int64)
+
+
+def _pack(bits):
+    """
+    Packs a (..., m) bool array into (..., words) uint64, 64 sites per word (PRIVATE).
+    """
+    words = -(-bits.shape[-1] // 64)
+    padded = np.zeros(bits.shape[:-1] + (words * 64,), dtype=bool)
+    padded[..., :bits.shape[-1]] = bits
+    return np.packbits(padded, axis=-1, bitorder="little").view(np.uint64)
+
+
+def encode_states(codes):
+    """
+    Bit-plane encoding of an alignment for Fitch parsimony.
+
+    Returns an (n, 4, words) uint64 array: plane k of row i has bit s set
+    when state k (A, C, G, T) is possible for sequence i at site s. Padding
+    bits past the last site allow every state, so they never cost a change.
+    """
+    sets = _STATE_SETS[codes]
+    planes = np.stack([(sets >> k) & 1 for k in range(4)], axis=1).astype(bool)
+    packed = _pack(planes)
+    if codes.shape[1] % 64:
+        padding = ~_pack(np.ones(codes.shape[1], dtype=bool))
+        packed |= padding
+    return packed
+
+
+def weight_layers(weights, words):
+    """
+    Splits integer site weights into binary layers, so a weighted count of
+    flagged sites is sum(popcount(flags & layer[b]) << b).
+
+    Returns:
+    - np.ndarray: (bits, words) uint64, one packed mask per bit of the weights.
+    """
+    weights = np.rint(np.asarray(weights)).astype(np.int64)
+    layers = []
+    for b in range(max(int(weights.max()), 1).bit_length()):
+        layer = np.zeros(words, dtype=np.uint64)
+        bits = _pack(((weights >> b) & 1).astype(bool))
+        layer[:len(bits)] = bits
+        layers.append(layer)
+    return np.array(layers)
+
+
+def fitch_merge(a, b, layers):
+    """
+    One Fitch step for every site at once.
+
+    Where the children's state sets intersect the parent gets the
+    intersection, elsewhere their union and one change.
+
+    Parameters:
+    - a, b (np.ndarray): (4, words) uint64 state sets of the two children.
+    - layers (np.ndarray): Weight layers from weight_layers.
+
+    Returns:
+    - (state set, weighted number of changes)
+    """
+    both = a & b
+    empty = ~np.bitwise_or.reduce(both, axis=0)
+    merged = both | (empty & (a | b))
+    changes = np.bitwise_count(empty & layers).sum(axis=1, dtype=np.int64)
+    return merged, int(changes @ _POWERS[:len(layers)])
+
+
+class ParsimonyTree:
+    """
+    Unrooted tree scored by Fitch parsimony, for tree search.
+
+    Same layout as likelihood.LikelihoodTree: nodes 0..n-1 are the tips,
+    and the Fitch state set and cost of the subtree hanging from x, seen
+    from y, is cached per directed edge (x, y). Moving a subtree only drops
+    the cached sets whose subtree changed, so each SPR candidate is scored
+    from a few cached sets instead of a full traversal.
+
+    Parameters:
+    - alignment (CompactAlignment): Nucleotide alignment; it is compressed
+      to site patterns internally.
+    - adjacency (list of dict): adjacency[x][y] = length of branch x-y
+      (ignored by the search, replaced by to_phylo).
+    """
+
+    def __init__(self, alignment, adjacency):
+        patterns = alignment.compress_patterns()
+        self.ids = list(alignment.ids)
+        self.site_count = float(patterns.site_count)
+        self.tips = encode_states(patterns.codes)
+        self.layers = weight_layers(patterns.weights, self.tips.shape[2])
+        self.adj = adjacency
+        self._cache = {}
+
+    @classmethod
+    def from_phylo(cls, tree, alignment):
+        return cls(alignment, adjacency_from_phylo(tree, alignment.ids))
+
+    def edges(self, start=None):
+        """
+        All branches (x, y) in depth-first order from start.
+        """
+        if start is None:
+            start = len(self.ids) if len(self.adj) > len(self.ids) else 0
+        found = []
+        stack = [(start, None)]
+        while stack:
+            node, parent = stack.pop()
+            for child in self.adj[node]:
+                if child != parent:
+                    found.append((node, child))
+                    stack.append((child, node))
+        return found
+
+    def states(self, x, y):
+        """
+        (state sets, cost) of the subtree at x, excluding branch x-y.
+        """
+        if (x, y) in self._cache:
+            return self._cache[(x, y)]
+        stack = [(x, y, False)]
+        while stack:
+            node, away, ready = stack.pop()
+            if (node, away) in self._cache:
+                continue
+            if node < len(self.ids):
+                self._cache[(node, away)] = (self.tips[node], 0)
+                continue
+            children = [c for c in self.adj[node] if c != away]
+            if not ready:
+                stack.append((node, away, True))
+                stack.extend((c, node, False) for c in children if (c, node) not in self._cache)
+                continue
+            sets, cost = self._cache[(children[0], node)]
+            for child in children[1:]:
+                child_sets, child_cost = self._cache[(child, node)]
+                sets, changes = fitch_merge(sets, child_sets, self.layers)
+                cost += child_cost + changes
+            self._cache[(node, away)] = (sets, cost)
+        return self._cache[(x, y)]
+
+    def _edge_score(self, x, y):
+        sets_x, cost_x = self.states(x, y)
+        sets_y, cost_y = self.states(y, x)
+        return cost_x + cost_y + fitch_merge(sets_x, sets_y, self.layers)[1]
+
+    def score(self):
+        """
+        Parsimony score: the weighted minimum number of changes.
+        """
+        if len(self.adj) == 1:
+            return 0
+        return self._edge_score(*self.edges()[0])
+
+    def _invalidate(self, x, y):
+        """
+        Drops every cached state set whose subtree contains branch x-y.
+        """
+        stack = [(x, y), (y, x)]
+        while stack:
+            near, far = stack.pop()
+            for other in self.adj[near]:
+                if other != far and self._cache.pop((near, other), None) is not None:
+                    stack.append((other, near))
+
+    def _prune(self, s, y):
+        """
+        Detaches the subtree at s together with its attachment node y, and
+        joins y's other two neighbours p and q directly. Returns (p, q).
+        """
+        p, q = [c for c in self.adj[y] if c != s]
+        self._invalidate(y, p)
+        self._invalidate(y, q)
+        for a, b in ((p, q), (q, p)):
+            # The subtree at a seen from y is the subtree at a seen from b now
+            cached = self._cache.pop((a, y), None)
+            if cached is not None:
+                self._cache[(a, b)] = cached
+            self._cache.pop((y, a), None)
+        del self.adj[y][p], self.adj[y][q], self.adj[p][y], self.adj[q][y]
+        self.adj[p][q] = self.adj[q][p] = 0.0
+        return p, q
+
+    def _regraft(self, s, y, u, v):
+        """
+        Inserts attachment node y (still holding subtree s) into branch u-v.
+        """
+        self._invalidate(u, v)
+        for a, b in ((u, v), (v, u)):
+            cached = self._cache.pop((a, b), None)
+            if cached is not None:
+                self._cache[(a, y)] = cached
+        del self.adj[u][v], self.adj[v][u]
+        for a in (u, v):
+            self.adj[a][y] = self.adj[y][a] = 0.0
+
+    def _nearby_edges(self, p, q, radius):
+        """
+        Branches within radius steps of branch p-q, not counting p-q itself (PRIVATE).
+        """
+        found = []
+        stack = [(p, q, 0), (q, p, 0)]
+        while stack:
+            node, came_from, depth = stack.pop()
+            if depth >= radius:
+                continue
+            for other in self.adj[node]:
+                if other != came_from:
+                    found.append((node, other))
+                    stack.append((other, node, depth + 1))
+        return found
+
+    def spr_round(self, radius=SPR_RADIUS, edges=None):
+        """
+        Tries every subtree prune and regraft within radius branches of
+        its current position, keeping each move that lowers the score.
+        Only the subtrees on the given edges are moved if edges is given.
+        Returns the number of moves made.
+        """
+        tips = len(self.ids)
+        moves = 0
+        current = self.score()
+        for a, b in self.edges() if edges is None else edges:
+            # Either end of a branch can be the subtree's attachment point
+            for s, y in ((a, b), (b, a)):
+                if y < tips or len(self.adj[y]) != 3 or s not in self.adj[y]:
+                    continue
+                sets_s, cost_s = self.states(s, y)
+                p, q = self._prune(s, y)
+                best = (current, p, q)
+                for u, v in self._nearby_edges(p, q, radius):
+                    sets_u, cost_u = self.states(u, v)
+                    sets_v, cost_v = self.states(v, u)
+                    joined, changes_uv = fitch_merge(sets_u, sets_v, self.layers)
+                    score = cost_u + cost_v + changes_uv + cost_s + fitch_merge(joined, sets_s, self.layers)[1]
+                    if score < best[0]:
+                        best = (score, u, v)
+                self._regraft(s, y, best[1], best[2])
+                if best[0] < current:
+                    current = best[0]
+                    moves += 1
+        return moves
+
+    def add_tip(self, t):
+        """
+        Attaches tip t, which has no branches yet, through a new internal
+        node to the branch where it adds the fewest changes (one step of
+        stepwise addition).
+        """
+        y = len(self.adj)
+        self.adj.append({t: 0.0})
+        self.adj[t][y] = 0.0
+        best = None
+        for u, v in self.edges():
+            sets_u, _ = self.states(u, v)
+            sets_v, _ = self.states(v, u)
+            # The rest of the tree scores the same whichever branch t joins
+            joined, _ = fitch_merge(sets_u, sets_v, self.layers)
+            added = fitch_merge(joined, self.tips[t], self.layers)[1]
+            if best is None or added < best[0]:
+                best = (added, u, v)
+        self._regraft(t, y, best[1], best[2])
+
+    def search(self, radius=SPR_RADIUS, max_rounds=MAX_ROUNDS):
+        """
+        NNI rounds (radius 1) until none helps, then SPR rounds within
+        radius until none helps. Returns the final score.
+        """
+        if len(self.ids) < 4:
+            return self.score()
+        for r in sorted({1, radius}):
+            for _ in range(max_rounds):
+                if not self.spr_round(r):
+                    break
+        return self.score()
+
+    def branch_changes(self):
+        """
+        Changes per site on each branch of one most-parsimonious
+        reconstruction: Fitch's downward pass, then each node takes its
+        parent's state where possible and otherwise its first allowed one.
+
+        Returns:
+        - dict: (x, y) with x < y -> weighted changes / number of sites.
+        """
+        changes = {}
+        if len(self.adj) == 1:
+            return changes
+        x, y = self.edges()[0]
+        sets_x, _ = self.states(x, y)
+        sets_y, _ = self.states(y, x)
+        # Root the reconstruction in the middle of branch x-y
+        root_state = _first_state(fitch_merge(sets_x, sets_y, self.layers)[0])
+        powers = _POWERS[:len(self.layers)]
+        stack = [(x, y, root_state), (y, x, root_state)]
+        while stack:
+            node, parent, parent_state = stack.pop()
+            sets, _ = self.states(node, parent)
+            keep = sets & parent_state
+            kept = keep[0] | keep[1] | keep[2] | keep[3]
+            state = keep | (~kept & _first_state(sets))
+            count = int(np.bitwise_count(~kept & self.layers).sum(axis=1, dtype=np.int64) @ powers)
+            # Both halves of the root branch add up to branch x-y
+            edge = (min(node, parent), max(node, parent))
+            changes[edge] = changes.get(edge, 0) + count
+            stack.extend((child, node, state) for child in self.adj[node] if child != parent)
+        return {edge: count / self.site_count for edge, count in changes.items()}
+
+    def to_phylo(self):
+        """
+        Unrooted Bio.Phylo tree with branch lengths in changes per site.
+        """
+        for (x, y), length in self.branch_changes().items():
+            self.adj[x][y] = self.adj[y][x] = length
+        return phylo_from_adjacency(self.adj, self.ids)
+
+
+def _first_state(sets):
+    """
+    Keeps only the first allowed state (A, C, G, T order) of every site (PRIVATE).
+    """
+    a, c, g, t = sets
+    return np.stack([a, c & ~a, g & ~(a | c), t & ~(a | c | g)])
+
+
+def parsimony_tree(alignment, start_tree, radius=SPR_RADIUS, max_rounds=MAX_ROUNDS, score=None):
+    """
+    Maximum-parsimony tree search from a starting tree (e.g. the NJ tree).
+
+    Parameters:
+    - alignment (CompactAlignment): Nucleotide alignment (weights allowed).
+    - start_tree (Bio.Phylo.BaseTree.Tree): Starting topology.
+    - radius (int): SPR regraft radius (see SPR_RADIUS); 0 keeps the topology.
+    - max_rounds (int): Maximum search passes per radius.
+    - score (dict or None): If given, filled with the "start" and final
+      "score" (weighted number of changes).
+
+    Returns:
+    - Bio.Phylo.BaseTree.Tree (unrooted), branch lengths in changes per site.
+    """
+    tree = ParsimonyTree.from_phylo(start_tree, alignment)
+    start = tree.score()
+    final = tree.search(radius, max_rounds) if radius else start
+    if score is not None:
+        score.update(start=start, score=final)
+    return tree.to_phylo()
+
+
+def add_to_parsimony_tree(alignment, tree, radius=SPR_RADIUS, max_rounds=MAX_ROUNDS, score=None):
+    """
+    Adds the taxa of an alignment that are missing from a tree built on
+    some of them (e.g. by an earlier analysis). Each new taxon joins the
+    branch where it adds the fewest changes, then only subtrees near the new
+    taxa are moved by SPR, so the work grows with the number of new taxa
+    instead of being a whole new search.
+
+    Parameters:
+    - alignment (CompactAlignment): Nucleotide alignment of all taxa.
+    - tree (Bio.Phylo.BaseTree.Tree): Tree over at least three of them.
+    - radius (int): SPR radius around the new taxa; 0 only places them.
+    - max_rounds (int): Maximum search passes.
+    - score (dict or None): If given, filled with the "start" score (all
+      taxa placed) and the final "score".
+
+    Returns:
+    - Bio.Phylo.BaseTree.Tree (unrooted), branch lengths in changes per site.
+    """
+    adj, missing = _extend_adjacency(tree, list(alignment.ids))
+    search = ParsimonyTree(alignment, adj)
+    for t in missing:
+        search.add_tip(t)
+    start = search.score()
+    for _ in range(max_rounds if radius else 0):
+        edges = []
+        for t in missing:
+            y = next(iter(search.adj[t]))
+            edges += [(t, y)] + search._nearby_edges(t, y, radius)
+        if not search.spr_round(radius, edges):
+            break
+    if score is not None:
+        score.update(start=start, score=search.score())
+    return search.to_phylo()
+
+
+def _extend_adjacency(tree, ids):
+    """
+    Adjacency of a tree over some of ids (see adjacency_from_phylo), with
+    nodes numbered as if it held all of them: the missing tips get no
+    branches. Returns (adjacency, missing tip numbers) (PRIVATE).
+    """
+    names = [clade.name for clade in tree.get_terminals()]
+    index = {name: i for i, name in enumerate(ids)}
+    unknown = [name for name in names if name not in index]
+    if unknown:
+        raise ValueError(f"Tree tip {unknown[0]!r} is not in the alignment.")
+    if len(names) < 3:
+        raise ValueError("Taxa can only be added to a tree with at least three tips.")
+    adj = adjacency_from_phylo(tree, names)
+    inner = len(adj) - len(names)
+    remap = [index[name] for name in names] + list(range(len(ids), len(ids) + inner))
+    extended = [dict() for _ in range(len(ids) + inner)]
+    for x, neighbours in enumerate(adj):
+        extended[remap[x]] = {remap[y]: t for y, t in neighbours.items()}
+    placed = set(names)
+    return extended, [i for i, name in enumerate(ids) if name not in placed]
@@ -0,0 +1,400 @@
+import os
+
+import numpy as np
+
+from .cache import ResultCache
+from .fasta_parser import count_sequences, iter_fasta
+from .instrument import MetricsStore, Trace
+from .jobs import JobCancelled, interrupt_on_cancel
+from .minhash import KMER_SIZE, PROTEIN_KMER_SIZE, SKETCH_CACHE, SKETCH_SIZE, minhash_distances, sketch_fasta
+from .workspace import Workspace
+
+STAGES = ["Aligning sequences", "Computing distances", "Building parsimony tree",
+          "Building ML tree", "Drawing trees"]
+
+# Stages when sequences are added to an earlier analysis (see run_pipeline's base)
+ADD_STAGES = ["Aligning new sequences", "Computing new distances", "Adding to parsimony tree",
+              "Adding to ML tree", "Drawing trees"]
+
+# Instrumentation span names for the same stages (see instrument.Trace)
+SPANS = ["align", "distances", "parsimony_tree", "ml_tree", "draw"]
+MINHASH_SPANS = ["sketch", "distances", "nj_tree", "upgma_tree", "draw"]
+ADD_SPANS = ["add_align", "add_distances", "add_parsimony_tree", "add_ml_tree", "draw"]
+
+# Everything besides the input that decides the pipeline's output. It is part
+# of the result cache key, so change it whenever the results would change.
+PIPELINE_PARAMS = {
+    "version": 5,
+    "aligner": "muscle",
+    "distance": "identity",
+    "parsimony_tree": "fitch-spr",
+    "ml_tree": "ml-hky-nni",
+    "image": "png+layout",
+}
+
+# "identity": MUSCLE alignment + identity distances. "minhash": alignment-free
+# Mash distances from k-mer sketches, for quick looks at large inputs.
+DISTANCE_MODES = ("identity", "minhash")
+
+# Fixed seed so bootstrap supports are reproducible (and cacheable)
+BOOTSTRAP_SEED = 1
+
+# Column filter behind the web app's trim switch (see
+# CompactAlignment.filter_columns)
+COLUMN_FILTER = {"max_gap_fraction": 0.5, "min_end_occupancy": 0.5, "collapse_invariant": True}
+
+# What run_pipeline imports on first use. Job queues preload these in their
+# fork server (see jobs.JobQueue), so job workers start with them in memory.
+WORKER_MODULES = (
+    f"{__package__}.align_sequences",
+    f"{__package__}.build_tree",
+    f"{__package__}.visualize_tree",
+    "Bio.Phylo",
+    "scipy.optimize",
+    "scipy.sparse",
+    "matplotlib.figure",
+    "matplotlib.collections",
+    "matplotlib.backends.backend_agg",
+)
+
+
+def pipeline_params(distance_mode="identity", bootstrap=0, column_filter=None):
+    """
+    PIPELINE_PARAMS for the given distance mode, number of bootstrap
+    replicates and column filter (use it for cache keys).
+    """
+    if distance_mode not in DISTANCE_MODES:
+        raise ValueError(f"distance_mode must be one of {DISTANCE_MODES}.")
+    params = dict(PIPELINE_PARAMS)
+    if distance_mode == "minhash":
+        # No alignment to score trees on, so the trees are NJ and UPGMA
+        params.update(aligner=None, distance="minhash", parsimony_tree="nj", ml_tree="upgma-weighted",
+                      kmer_size=KMER_SIZE, protein_kmer_size=PROTEIN_KMER_SIZE, sketch_size=SKETCH_SIZE)
+    if bootstrap:
+        # Supports are seeded, so the same replicate count gives the same trees
+        params.update(bootstrap=bootstrap, bootstrap_seed=BOOTSTRAP_SEED)
+    if column_filter:
+        params.update(column_filter=dict(column_filter))
+    return params
+
+
+def run_pipeline(input_fasta, aligned_fasta, tree_file_pars, tree_file_ml,
+                 tree_img_pars, tree_img_ml, progress=None, distances_file=None,
+                 distance_mode="identity", bootstrap=0, bootstrap_workers=None,
+                 tree_layout_pars=None, tree_layout_ml=None, trace=None, base=None,
+                 column_filter=None, distance_workers=None):
+    """
+    Runs the full upload-to-image analysis: MUSCLE alignment, both trees and
+    both PNG renders. Meant to run inside a JobQueue worker.
+
+    With distance_mode="minhash" there is no alignment: distances are
+    estimated from k-mer sketches and aligned_fasta is not written.
+
+    Parameters:
+    - input_fasta (str): Unaligned FASTA file.
+    - aligned_fasta (str): Where MUSCLE writes the alignment.
+    - tree_file_pars / tree_file_ml (str): Newick outputs.
+    - tree_img_pars / tree_img_ml (str): PNG outputs.
+    - progress (callable or None): progress(step, total, stage), called
+      before each stage (see jobs.JobQueue).
+    - distances_file (str or None): If given, the distance matrix is saved
+      there as a memory-mapped DistanceStore (condensed float32 .npy) that
+      the trees are built from; identity distances are computed straight
+      into it in parallel tiles.
+    - distance_workers (int or None): Processes for those tiles (default:
+      CPU count).
+    - distance_mode (str): One of DISTANCE_MODES.
+    - bootstrap (int): Bootstrap replicates per tree; 0 skips bootstrapping.
+      Needs an alignment, so only works with distance_mode="identity".
+    - bootstrap_workers (int or None): Processes for the replicates
+      (default: CPU count).
+    - tree_layout_pars / tree_layout_ml (str or None): If given, compact
+      layout JSON for the web app's interactive tree view (see
+      visualize_tree.write_layout).
+    - trace (instrument.Trace or None): Receives one span per stage (wall
+      and CPU time, peak RSS, taxa count and alignment length).
+    - base (workspace.Workspace or None): A finished aligned analysis to add
+      sequences to. Only the input's sequences that base doesn't have are
+      aligned (against base's alignment), only their distances are
+      computed and they are placed into base's trees, so the work grows
+      with the number of new sequences. Needs distance_mode="identity".
+    - column_filter (dict or None): Keyword arguments for
+      CompactAlignment.filter_columns (e.g. COLUMN_FILTER), applied to the
+      alignment before distances and trees. The aligned FASTA is still
+      written in full. Needs distance_mode="identity" and no base.
+
+    Returns:
+    - dict with "num_seqs", a human-readable "message", "column_filter"
+      (the filter used, or None) and "methods": the tree builders that ran
+      ("parsimony": "mp" or "nj", "likelihood": "ml" or "upgma", plus the
+      fitted "model" for ML; see AnalysisSession.parsimony_method and
+      likelihood_method).
+    """
+    # The tree builders and renderer pull in Biopython, SciPy and matplotlib;
+    # importing them here keeps the web app's start-up (and pipeline_params) cheap
+    from .align_sequences import align_sequences
+    from .alignment import CompactAlignment
+    from .build_tree import AnalysisSession
+    from .visualize_tree import render_trees, write_layout
+
+    if distance_mode not in DISTANCE_MODES:
+        raise ValueError(f"distance_mode must be one of {DISTANCE_MODES}.")
+    if bootstrap and distance_mode != "identity":
+        raise ValueError("Bootstrap supports need an alignment; use distance_mode='identity'.")
+    if base is not None and distance_mode != "identity":
+        raise ValueError("Sequences can only be added to an aligned analysis; use distance_mode='identity'.")
+    if column_filter and (distance_mode != "identity" or base is not None):
+        raise ValueError("Column filtering needs a new MUSCLE alignment; it can't be combined with "
+                         "MinHash distances or with adding sequences.")
+    stages = STAGES if distance_mode == "identity" else (
+        ["Sketching k-mers", STAGES[1], "Building NJ tree", "Building UPGMA tree", STAGES[4]])
+    spans = SPANS if distance_mode == "identity" else MINHASH_SPANS
+    if base is not None:
+        stages, spans = ADD_STAGES, ADD_SPANS
+    trace = Trace() if trace is None else trace
+    trace.attributes.update(distance_mode=distance_mode, bootstrap=bootstrap,
+                            taxa=count_sequences(input_fasta))
+
+    def stage(step):
+        if progress is not None:
+            progress(step, len(stages), stages[step])
+        return trace.span(spans[step])
+
+    # Remove any previous alignment so a MUSCLE failure can't go unnoticed
+    if os.path.exists(aligned_fasta):
+        os.remove(aligned_fasta)
+    base_trees = (None, None)
+    if base is not None:
+        session, base_trees, added = _add_to_base(base, input_fasta, aligned_fasta, distances_file,
+                                                  distance_workers, stage, trace)
+        message = (f"➕ Added {added} new sequence(s) to the earlier alignment and trees "
+                   f"instead of starting over. Saved to {aligned_fasta}")
+    elif distance_mode == "minhash":
+        with stage(0):
+            ids, sketches, k = sketch_fasta(input_fasta, cache_dir=SKETCH_CACHE)
+        with stage(1):
+            session = AnalysisSession.from_distances(ids, minhash_distances(sketches, k))
+            if distances_file is not None:
+                session.store_distances(distances_file, workers=distance_workers)
+        message = (f"⚡ Alignment-free MinHash distances ({k}-mers, "
+                   f"{SKETCH_SIZE} hashes per sequence); no alignment was made.")
+    else:
+        with stage(0):
+            align_sequences(input_fasta, aligned_fasta)
+            if not os.path.exists(aligned_fasta):
+                raise RuntimeError("Alignment failed: MUSCLE produced no output.")
+        with stage(1):
+            alignment = CompactAlignment.from_fasta(aligned_fasta)
+            trace.attributes["sites"] = alignment.shape[1]
+            if column_filter:
+                # Fewer columns make the distances, the tree searches and
+                # any bootstrap cheaper
+                columns = alignment.shape[1]
+                alignment = alignment.filter_columns(**column_filter)
+                trace.attributes.update(raw_sites=columns, sites=alignment.shape[1])
+            session = AnalysisSession(alignment)
+            # Computed here (and reused by both trees) so this span times it
+            if distances_file is not None:
+                session.store_distances(distances_file, workers=distance_workers)
+            session.distances
+        message = f"✅ Alignment complete! Saved to {aligned_fasta}"
+        if column_filter:
+            message += f" {int(alignment.site_count)} of its {columns} columns were kept for the trees"
+            if alignment.shape[1] < alignment.site_count:
+                message += f", merged into {alignment.shape[1]} weighted columns"
+            message += "."
+
+    with stage(2):
+        tree_pars = session.write_parsimony_tree(tree_file_pars, bootstrap=bootstrap, workers=bootstrap_workers,
+                                                 seed=BOOTSTRAP_SEED, base_tree=base_trees[0])
+
+    with stage(3):
+        tree_ml = session.write_likelihood_tree(tree_file_ml, bootstrap=bootstrap, workers=bootstrap_workers,
+                                                seed=BOOTSTRAP_SEED, base_tree=base_trees[1])
+    if bootstrap:
+        message += f" Trees carry bootstrap supports from {bootstrap} replicates."
+
+    with stage(4):
+        # Drawn from the trees just built, without parsing the Newick files back
+        render_trees([(tree_pars, tree_img_pars), (tree_ml, tree_img_ml)])
+        for tree, json_path in ((tree_pars, tree_layout_pars), (tree_ml, tree_layout_ml)):
+            if json_path is not None:
+                write_layout(tree, json_path)
+
+    methods = {"parsimony": session.parsimony_method(), "likelihood": session.likelihood_method()}
+    if methods["likelihood"] == "ml":
+        methods["model"] = session.ml_fit["model"]
+    return {"num_seqs": len(session.ids), "message": message, "column_filter": column_filter or None,
+            "methods": methods}
+
+
+def _add_to_base(base, input_fasta, aligned_fasta, distances_file, distance_workers, stage, trace):
+    """
+    The alignment and distance stages of run_pipeline when adding sequences
+    to an earlier analysis (PRIVATE).
+
+    Returns:
+    - (session, (parsimony tree, ML tree) of base, number of sequences added).
+    """
+    from .align_sequences import add_to_alignment
+    from .alignment import CompactAlignment
+    from .array_tree import read_newick
+    from .build_tree import AnalysisSession
+    from .distance import extend_identity_distances
+    from .distance_store import DistanceStore
+
+    if not os.path.exists(base.aligned_fasta):
+        raise ValueError("The earlier analysis has no alignment to add sequences to.")
+    if (base.read_status().get("result") or {}).get("column_filter"):
+        # Its distances and trees cover only some of the alignment's columns
+        raise ValueError("The earlier analysis used a column filter; sequences can't be added to it.")
+    with stage(0):
+        previous = CompactAlignment.from_fasta(base.aligned_fasta)
+        new_fasta = os.path.join(os.path.dirname(os.path.abspath(aligned_fasta)), "new_sequences.fa")
+        try:
+            added = _write_new_sequences(input_fasta, previous, new_fasta)
+            add_to_alignment(base.aligned_fasta, new_fasta, aligned_fasta)
+        finally:
+            if os.path.exists(new_fasta):
+                os.remove(new_fasta)
+
+    with stage(1):
+        alignment = CompactAlignment.from_fasta(aligned_fasta)
+        distances = None
+        try:
+            old = np.array(DistanceStore(base.distances), dtype=np.float64)
+        except (OSError, ValueError):
+            old = None
+        if old is not None:
+            distances = extend_identity_distances(old, previous.codes, alignment.codes)
+        # Without usable old distances (None) the session computes the whole matrix
+        session = AnalysisSession(alignment, distances)
+        trace.attributes.update(taxa=len(session.ids), sites=session.alignment.shape[1], added=added)
+        if distances_file is not None:
+            session.store_distances(distances_file, workers=distance_workers)
+        session.distances
+
+    trees = []
+    for newick in (base.tree_file_pars, base.tree_file_ml):
+        tree = read_newick(newick)
+        # The earlier supports don't hold for the grown tree
+        tree.confidence[:] = np.nan
+        trees.append(tree.to_phylo())
+    return session, tuple(trees), added
+
+
+def _write_new_sequences(input_fasta, previous, new_fasta):
+    """
+    Writes the records of input_fasta that are not in the previous
+    alignment to new_fasta and returns how many there were (PRIVATE). The
+    input may hold only the new sequences or the whole grown file, but
+    sequences that were already analysed must be unchanged.
+    """
+    known = {name: i for i, name in enumerate(previous.ids)}
+    added = 0
+    with open(new_fasta, "w") as f:
+        for record in iter_fasta(input_fasta):
+            if record.id in known:
+                old = previous.sequence(known[record.id])
+                if _ungapped(old) != _ungapped(record.seq):
+                    raise ValueError(f"Sequence {record.id!r} changed since the earlier analysis; "
+                                     "run a full analysis instead.")
+                continue
+            f.write(f">{record.id}\n{record.seq}\n")
+            added += 1
+    if not added:
+        raise ValueError("No new sequences: every sequence is already in the earlier analysis.")
+    return added
+
+
+def _ungapped(seq):
+    return seq.replace("-", "").replace(".", "").upper()
+
+
+def run_in_workspace(path, progress=None, cache_key=None, distance_mode="identity", bootstrap=0,
+                     base=None, column_filter=None):
+    """
+    Runs run_pipeline on a workspace's input.fa, writing every output inside
+    the workspace and mirroring progress, results and errors to its
+    status.json so any web worker can report on the job.
+
+    Parameters:
+    - path (str): Workspace directory (see workspace.Workspace).
+    - progress (callable or None): Forwarded progress callback.
+    - cache_key (str or None): If given, the finished artifacts are stored in
+      the result cache under this key (see cache.cache_key).
+    - distance_mode (str): See run_pipeline.
+    - bootstrap (int): See run_pipeline.
+    - base (str or None): Workspace directory of a finished analysis to add
+      the input's new sequences to (see run_pipeline).
+    - column_filter (dict or None): See run_pipeline.
+
+    Returns:
+    - dict from run_pipeline.
+    """
+    workspace = Workspace(path)
+    trace = Trace(workspace.job_id)
+
+    def report(step, total, stage):
+        # A CANCEL file works across processes, unlike the queue's own flag
+        if workspace.cancel_requested():
+            raise JobCancelled(workspace.job_id)
+        if progress is not None:
+            progress(step, total, stage)
+        workspace.write_status({"status": "running", "stage": stage, "step": step, "total": total})
+
+    try:
+        # The heartbeat keeps the sweep off this workspace through long,
+        # silent stages; a CANCEL file (from any web worker) stops the
+        # running stage, not just the next one
+        with workspace.heartbeat(), interrupt_on_cancel(workspace.cancel_requested):
+            result = run_pipeline(
+                workspace.input_fasta,
+                workspace.aligned_fasta,
+                workspace.tree_file_pars,
+                workspace.tree_file_ml,
+                workspace.tree_img_pars,
+                workspace.tree_img_ml,
+                progress=report,
+                distances_file=workspace.distances,
+                distance_mode=distance_mode,
+                bootstrap=bootstrap,
+                tree_layout_pars=workspace.tree_layout_pars,
+                tree_layout_ml=workspace.tree_layout_ml,
+                trace=trace,
+                base=None if base is None else Workspace(base),
+                column_filter=column_filter,
+            )
+    except JobCancelled:
+        workspace.write_status({"status": "cancelled"})
+        _finish_trace(trace, "cancelled", workspace)
+        raise
+    except Exception as e:
+        if workspace.cancel_requested():
+            # The interrupted stage failed in its own way (e.g. a killed pool)
+            workspace.write_status({"status": "cancelled"})
+            _finish_trace(trace, "cancelled", workspace)
+            raise JobCancelled(workspace.job_id) from e
+        workspace.write_status({"status": "failed", "error": str(e)})
+        _finish_trace(trace, "failed", workspace)
+        raise
+    workspace.write_status({"status": "done", "result": result})
+    _finish_trace(trace, "done", workspace)
+    if cache_key is not None:
+        ResultCache().store(cache_key, workspace.path, {"num_seqs": result["num_seqs"],
+                                                        "column_filter": result["column_filter"],
+                                                        "methods": result["methods"]})
+    return result
+
+
+def _finish_trace(trace, status, workspace):
+    """
+    Writes a job's trace.json and adds it to the shared /metrics numbers.
+    Instrumentation must never fail a job, so I/O errors are only reported.
+    """
+    trace.status = status
+    try:
+        trace.write(workspace.trace_file)
+        MetricsStore().record(trace)
+    except OSError as e:
+        print(f"⚠️ Could not record job metrics: {e}")
@@ -0,0 +1,145 @@
+import numpy as np
+from Bio.Phylo import BaseTree
+from scipy.cluster.hierarchy import linkage
+from scipy.spatial.distance import squareform
+
+from .distance_store import DistanceStore
+
+
+def condensed_distances(dist, dtype=np.float32):
+    """
+    Converts a square distance matrix to a condensed (upper-triangle) vector.
+    A DistanceStore already is one: its memory-mapped vector is returned as
+    is when dtype matches, without reading it into memory.
+
+    Parameters:
+    - dist (np.ndarray or DistanceStore): (n, n) symmetric distance matrix.
+    - dtype: Storage type of the result; float32 halves the memory of float64.
+
+    Returns:
+    - np.ndarray of length n * (n - 1) / 2.
+    """
+    if isinstance(dist, DistanceStore):
+        return dist.condensed.astype(dtype, copy=False)
+    return squareform(np.asarray(dist), checks=False).astype(dtype, copy=False)
+
+
+def upgma_tree(names, condensed, method="weighted"):
+    """
+    Builds a WPGMA (or UPGMA) tree from a condensed distance vector with
+    SciPy's linkage.
+
+    The default "weighted" method (WPGMA) averages the two merged rows, the
+    update Biopython's DistanceTreeConstructor().upgma() applies, and names
+    the internal nodes "Inner<k>" in merge order. Tied distances are merged
+    in SciPy's order, not Biopython's, so wherever distances tie (common with
+    identity distances) the topology can differ from Biopython's tree. Use
+    "average" for size-weighted (textbook) UPGMA.
+
+    Parameters:
+    - names (list of str): Taxon names, in matrix order.
+    - condensed (np.ndarray): Condensed distances (see condensed_distances).
+    - method (str): "weighted" (WPGMA) or "average" (UPGMA).
+
+    Returns:
+    - Bio.Phylo.BaseTree.Tree (rooted).
+    """
+    n = len(names)
+    if len(condensed) != n * (n - 1) // 2:
+        raise ValueError("Condensed distance vector does not match the number of names.")
+    if method not in ("weighted", "average"):
+        raise ValueError("method must be 'weighted' or 'average'.")
+
+    clades = [BaseTree.Clade(None, name) for name in names]
+    if n == 1:
+        clades[0].branch_length = 0
+        return BaseTree.Tree(clades[0])
+
+    merges = linkage(condensed, method=method)
+
+    # Height of each cluster (the longest path down to a tip) and the smallest
+    # original index inside it, which orders the children of a merge
+    heights = [0.0] * n
+    first_leaf = list(range(n))
+    for k, (a, b, dist, _) in enumerate(merges):
+        a, b = int(a), int(b)
+        # The cluster holding the later taxa is listed first, as in Biopython
+        if first_leaf[a] < first_leaf[b]:
+            a, b = b, a
+        inner = BaseTree.Clade(None, "Inner" + str(k + 1))
+        for child in (a, b):
+            clades[child].branch_length = dist * 1.0 / 2 - heights[child]
+            inner.clades.append(clades[child])
+        clades.append(inner)
+        heights.append(max(heights[c] + clades[c].branch_length for c in (a, b)))
+        first_leaf.append(first_leaf[b])
+
+    root = clades[-1]
+    root.branch_length = 0
+    return BaseTree.Tree(root)
+
+
+def add_to_upgma_tree(tree, names, dist):
+    """
+    Adds the taxa of a distance matrix that are missing from a rooted,
+    ultrametric tree (e.g. the UPGMA tree of an earlier analysis) without
+    rebuilding it, at O(n) per new taxon.
+
+    Each new taxon x joins at height d(a, x) / 2 above its nearest placed
+    taxon a: on the branch above the highest ancestor of a that is still
+    lower than that, or above the root. The tree stays ultrametric.
+
+    Parameters:
+    - tree (Bio.Phylo.BaseTree.Tree): Rooted tree over some of names;
+      modified in place.
+    - names (list of str): All taxon names, in matrix order.
+    - dist (np.ndarray): (n, n) distance matrix over names.
+
+    Returns:
+    - The same tree, holding every name.
+    """
+    index = {name: i for i, name in enumerate(names)}
+    tips = {clade.name: clade for clade in tree.get_terminals()}
+    if any(name not in index for name in tips):
+        raise ValueError("Tree tips must all be in the distance matrix.")
+
+    # Parents, then heights bottom-up (children come after parents in order)
+    parent, order = {}, [tree.root]
+    for clade in order:
+        for child in clade.clades:
+            parent[child] = clade
+            order.append(child)
+    height = {}
+    for clade in reversed(order):
+        height[clade] = max((height[c] + (c.branch_length or 0.0) for c in clade.clades), default=0.0)
+    inner = len(order) - len(tips)
+    placed = [index[name] for name in tips]
+
+    for x, name in enumerate(names):
+        if name in tips:
+            continue
+        others = np.array(placed)
+        a = others[np.argmin(dist[x, others])]
+        h = dist[a, x] / 2
+        node = tips[names[a]]
+        while node in parent and height[parent[node]] < h:
+            node = parent[node]
+        h = max(h, height[node])
+
+        inner += 1
+        joint = BaseTree.Clade(0, f"Inner{inner}")
+        new = BaseTree.Clade(h, name)
+        if node in parent:
+            up = parent[node]
+            joint.branch_length = height[up] - h
+            up.clades[up.clades.index(node)] = joint
+            parent[joint] = up
+        else:
+            tree.root = joint
+        node.branch_length = h - height[node]
+        joint.clades = [node, new]
+        parent.update({node: joint, new: joint})
+        height.update({joint: h, new: 0.0})
+        tips[name] = new
+        placed.append(x)
+    return tree
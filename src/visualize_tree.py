@@ -1,28 +1,310 @@
-from Bio import Phylo
-import matplotlib.pyplot as plt
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .array_tree import ArrayTree, read_newick
+
+# Matplotlib is imported where it is used: the web app only needs this
+# module's layout code until a job draws a tree
+
+# Trees with more tips than this are drawn without tip labels
+MAX_LABELS = 2000
+
+# Below this many tips in total, render_trees draws in-process: starting
+# worker processes would cost more than the drawing itself
+PARALLEL_MIN_TIPS = 500
+
+# Quoted Newick labels ('' escapes a quote) and comments, which may hold commas
+_QUOTED_OR_COMMENT = re.compile(r"'(?:[^']|'')*'|\[[^\]]*\]")
+
+# Layout JSON stores root distances as integers in units of 1/X_RESOLUTION
+# of the tree's depth, which is finer than any screen
+X_RESOLUTION = 100000
+
+
+class TreeLayout:
+    """
+    Rectangular layout of a tree as flat NumPy arrays, one entry per node
+    in preorder (the root is node 0).
+
+    Attributes:
+    - parent (np.ndarray): Parent index, -1 for the root.
+    - x (np.ndarray): Distance from the root (sum of branch lengths).
+    - y (np.ndarray): Tips at 0, 1, 2, ... in drawing order; internal
+      nodes halfway between their first and last child.
+    - names (list of str or None): Clade names.
+    - tips (np.ndarray): True for tips.
+    - confidence (np.ndarray): Support values, NaN where there is none.
+    """
+
+    __slots__ = ("parent", "x", "y", "names", "tips", "confidence")
+
+    def __init__(self, parent, x, y, names, tips, confidence):
+        self.parent = parent
+        self.x = x
+        self.y = y
+        self.names = names
+        self.tips = tips
+        self.confidence = confidence
+
+    def __len__(self):
+        return len(self.parent)
+
+    def segments(self):
+        """
+        Line segments of the drawing as two (k, 2, 2) arrays: a horizontal
+        one per branch and a vertical one per internal node spanning its
+        children.
+        """
+        child = np.flatnonzero(self.parent >= 0)
+        up = self.parent[child]
+        horizontal = np.stack([
+            np.stack([self.x[up], self.y[child]], axis=1),
+            np.stack([self.x[child], self.y[child]], axis=1),
+        ], axis=1)
+        low = np.full(len(self), np.inf)
+        high = np.full(len(self), -np.inf)
+        np.minimum.at(low, up, self.y[child])
+        np.maximum.at(high, up, self.y[child])
+        inner = np.flatnonzero(~self.tips)
+        vertical = np.stack([
+            np.stack([self.x[inner], low[inner]], axis=1),
+            np.stack([self.x[inner], high[inner]], axis=1),
+        ], axis=1)
+        return horizontal, vertical
+
+    def to_dict(self):
+        """
+        Compact, JSON-ready form of the layout for drawing in the browser
+        (assets/tree_view.js).
+
+        Only what the client cannot derive is kept: the preorder parent
+        array, root distances quantized to integers (see X_RESOLUTION), tip
+        names in drawing order and the supports of internal nodes as
+        [node, value] pairs. Tip rows and internal y positions are
+        recomputed client-side, since collapsing a clade changes them.
+        """
+        depth = max(self.x.max(), 1e-12)
+        supported = np.flatnonzero(~self.tips & np.isfinite(self.confidence))
+        return {
+            "parent": self.parent.tolist(),
+            "x": np.rint(self.x / depth * X_RESOLUTION).astype(np.int64).tolist(),
+            "depth": float(depth),
+            "resolution": X_RESOLUTION,
+            "names": [self.names[i] or "" for i in np.flatnonzero(self.tips)],
+            "support": [[int(i), round(float(self.confidence[i]))] for i in supported],
+        }
+
+
+def tree_layout(tree):
+    """
+    Computes the rectangular layout of a tree.
+
+    The tree's preorder parent / branch-length arrays (see ArrayTree) are
+    used as they are. Root distances then come from pointer jumping (each
+    pass adds the ancestor's partial sum and doubles the jump, so
+    log2(depth) vectorized passes), and internal y positions from one
+    vectorized pass per tree level, deepest first.
+
+    Parameters:
+    - tree (ArrayTree or Bio.Phylo.BaseTree.Tree): The tree; a Bio.Phylo
+      tree is flattened first.
+
+    Returns:
+    - TreeLayout.
+    """
+    # Step 1: flat preorder arrays
+    if not isinstance(tree, ArrayTree):
+        tree = ArrayTree.from_phylo(tree)
+    parent = tree.parent
+    length = np.nan_to_num(tree.length, nan=0.0)
+    length[0] = 0.0
+    tips = tree.tips
+
+    # Step 2: root distances and depths by pointer jumping
+    x = length.copy()
+    depth = (parent >= 0).astype(np.intp)
+    jump = parent.copy()
+    while (jump >= 0).any():
+        has = jump >= 0
+        x[has] += x[jump[has]]
+        depth[has] += depth[jump[has]]
+        jump[has] = jump[jump[has]]
+
+    # Step 3: tips in preorder get 0, 1, 2, ...; parents sit midway between
+    # their first and last child, filled in level by level from the bottom
+    y = np.zeros(len(parent))
+    y[tips] = np.arange(tips.sum())
+    low = np.full(len(parent), np.inf)
+    high = np.full(len(parent), -np.inf)
+    for level in range(depth.max(), 0, -1):
+        nodes = np.flatnonzero(depth == level)
+        np.minimum.at(low, parent[nodes], y[nodes])
+        np.maximum.at(high, parent[nodes], y[nodes])
+        above = np.unique(parent[nodes])
+        y[above] = (low[above] + high[above]) / 2
+    return TreeLayout(parent, x, y, tree.names, tips, tree.confidence)
+
+
+def support_label(clade):
+    """
+    Bootstrap support of an internal clade as a whole percentage, or None.
+    """
+    if clade.confidence is None or clade.is_terminal():
+        return None
+    return f"{clade.confidence:.0f}"
+
+
+def draw_tree(tree, title="Phylogenetic Tree", fig=None):
+    """
+    Draws a tree on a new matplotlib Figure without touching pyplot, so
+    concurrent renders in threads or processes don't share any state.
+
+    Branches are two LineCollections (horizontal and vertical segments)
+    instead of one artist per branch. Tip labels are skipped above
+    MAX_LABELS tips; bootstrap supports are written above their branches.
+
+    Parameters:
+    - tree (ArrayTree or Bio.Phylo.BaseTree.Tree): The tree.
+    - title (str): Figure title.
+    - fig (Figure or None): Figure to draw on (default: a new one).
+
+    Returns:
+    - matplotlib.figure.Figure
+    """
+    from matplotlib.collections import LineCollection
+    from matplotlib.figure import Figure
+
+    layout = tree_layout(tree)
+    n_tips = int(layout.tips.sum())
+    # Taller figures for big trees so labels stay readable
+    size = (10, min(max(6, 0.2 * n_tips), 100))
+    if fig is None:
+        fig = Figure(figsize=size)
+    else:
+        fig.set_size_inches(*size)
+    ax = fig.add_subplot(1, 1, 1)
+
+    horizontal, vertical = layout.segments()
+    ax.add_collection(LineCollection(horizontal, colors="black", linewidths=1))
+    ax.add_collection(LineCollection(vertical, colors="black", linewidths=1))
+
+    span = max(layout.x.max(), 1e-9)
+    if n_tips <= MAX_LABELS:
+        for i in np.flatnonzero(layout.tips):
+            if layout.names[i]:
+                ax.text(layout.x[i] + span * 0.01, layout.y[i], f" {layout.names[i]}",
+                        va="center", fontsize=10 if n_tips <= 50 else 6)
+    has_support = np.isfinite(layout.confidence[~layout.tips]).any()
+    for i in np.flatnonzero(~layout.tips & np.isfinite(layout.confidence)):
+        if layout.parent[i] >= 0:
+            middle = (layout.x[i] + layout.x[layout.parent[i]]) / 2
+            ax.text(middle, layout.y[i], f"{layout.confidence[i]:.0f}", ha="center", va="bottom", fontsize=9)
+
+    # Room on the right for tip labels, tips listed top to bottom
+    ax.set_xlim(-span * 0.02, span * 1.25)
+    ax.set_ylim(n_tips - 0.2, -0.8)
+    ax.set_xlabel("branch length")
+    ax.set_ylabel("taxa")
+    ax.set_title(f"{title} (bootstrap support %)" if has_support else title)
+    # Fixed margins in inches: tight_layout would measure every label first
+    width, height = fig.get_size_inches()
+    fig.subplots_adjust(left=0.7 / width, right=1 - 0.2 / width,
+                        bottom=0.6 / height, top=1 - 0.5 / height)
+    return fig
+
 
 def visualize_tree(newick_file, save_path=None, show_plot=False):
     """
     Visualizes a phylogenetic tree from a Newick file.
 
+    Bootstrap supports stored as internal node labels (see
+    build_tree.build_parsimony_tree) are drawn on the branches.
+
     Parameters:
-    - newick_file (str): Path to the Newick file.
-    - save_path (str or None): If provided, saves the figure to this path.
+    - newick_file (str or ArrayTree): Path to the Newick file, or the tree
+      itself (as returned by the build_tree writers), which skips reading
+      the file back.
+    - save_path (str or None): If provided, saves the figure to this path;
+      the format follows the extension (.png, .svg, .pdf, ...).
     - show_plot (bool): If True, displays the tree (for local testing only).
     """
-    tree = Phylo.read(newick_file, "newick")
-    fig = plt.figure(figsize=(10, 6))
-    ax = fig.add_subplot(1, 1, 1)
-    Phylo.draw(tree, do_show=False, axes=ax)
-    plt.title("Phylogenetic Tree")
-    plt.tight_layout()
+    tree = _tree(newick_file)
+    if show_plot:
+        # Only an interactive window needs pyplot
+        import matplotlib.pyplot as plt
+        fig = draw_tree(tree, fig=plt.figure())
+    else:
+        fig = draw_tree(tree)
 
     if save_path:
-        plt.savefig(save_path)
+        fig.savefig(save_path)
         print(f"Tree image saved to: {save_path}")
 
     if show_plot:
         plt.show()
+        plt.close(fig)
+
+
+def write_layout(newick_file, json_path):
+    """
+    Writes the compact layout of a Newick tree (see TreeLayout.to_dict) for
+    the web app's interactive view, so showing a tree costs the server no
+    more than sending a static file.
+
+    Parameters:
+    - newick_file (str or ArrayTree): Path to the Newick file, or the tree.
+    - json_path (str): Output path.
+    """
+    layout = tree_layout(_tree(newick_file))
+    tmp = f"{json_path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(layout.to_dict(), f, separators=(",", ":"))
+    os.replace(tmp, json_path)
+
+
+def _tree(newick_file):
+    # A path is read with the fast array parser; trees pass through
+    return newick_file if isinstance(newick_file, ArrayTree) else read_newick(newick_file)
+
+
+def _render(job):
+    newick_file, save_path = job
+    visualize_tree(newick_file, save_path)
+    return save_path
+
+
+def render_trees(jobs, workers=None):
+    """
+    Renders several trees, in parallel worker processes when they are big
+    enough to be worth it (see PARALLEL_MIN_TIPS).
+
+    Parameters:
+    - jobs (list of (newick_file, save_path)): Trees to draw, as Newick
+      paths or ArrayTrees (which pickle to the workers as a few arrays).
+    - workers (int or None): Worker processes (default: one per tree, at
+      most the CPU count); 1 draws everything in-process.
+
+    Returns:
+    - list of the saved image paths.
+    """
+    jobs = list(jobs)
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers > 1:
+        tips = sum(_count_tips(newick_file) for newick_file, _ in jobs)
+        if tips >= PARALLEL_MIN_TIPS:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                return list(pool.map(_render, jobs))
+    return [_render(job) for job in jobs]
 
-    plt.close()
 
+def _count_tips(newick_file):
+    if isinstance(newick_file, ArrayTree):
+        return newick_file.count_terminals()
+    # The n tips of a Newick tree are separated by n - 1 commas, not counting
+    # those inside quoted labels or [comments]
+    with open(newick_file) as f:
+        return _QUOTED_OR_COMMENT.sub("", f.read()).count(",") + 1
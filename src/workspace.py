@@ -0,0 +1,209 @@
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Where per-job workspaces live, how long they are kept and how much disk they
+# may use in total. All three can be overridden from the environment.
+WORKSPACE_ROOT = os.environ.get("SIMPLEPHYLO_WORKSPACES", "output/jobs")
+WORKSPACE_TTL = int(os.environ.get("SIMPLEPHYLO_WORKSPACE_TTL", 6 * 3600))
+WORKSPACE_QUOTA = int(os.environ.get("SIMPLEPHYLO_WORKSPACE_QUOTA_MB", 1024)) * 1024 * 1024
+
+# How often a running job touches its HEARTBEAT file. Stages such as MUSCLE
+# or a tree search write no status for a long time; the heartbeat is what
+# tells the sweep the job is still alive.
+HEARTBEAT_INTERVAL = 60
+
+# Job IDs are uuid4 hex strings; anything else is refused before touching disk
+_JOB_ID = re.compile(r"^[0-9a-f]{32}$")
+
+# Files a finished workspace exposes over HTTP
+PUBLIC_FILES = ("parsimony_tree.png", "ml_tree.png", "parsimony_tree.layout.json", "ml_tree.layout.json")
+
+
+class WorkspaceQuotaError(RuntimeError):
+    """Raised when a new workspace would push the workspace root over its quota."""
+
+
+class Workspace:
+    """
+    One analysis job's private directory: its upload, alignment, trees,
+    images and a status.json that any web worker can read.
+
+    Parameters:
+    - path (str): Workspace directory (<root>/<job_id>).
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.job_id = os.path.basename(self.path)
+        self.input_fasta = os.path.join(self.path, "input.fa")
+        self.aligned_fasta = os.path.join(self.path, "aligned_sequences.fasta")
+        self.distances = os.path.join(self.path, "distances.npy")
+        self.tree_file_pars = os.path.join(self.path, "parsimony_tree.newick")
+        self.tree_file_ml = os.path.join(self.path, "ml_tree.newick")
+        self.tree_img_pars = os.path.join(self.path, "parsimony_tree.png")
+        self.tree_img_ml = os.path.join(self.path, "ml_tree.png")
+        self.tree_layout_pars = os.path.join(self.path, "parsimony_tree.layout.json")
+        self.tree_layout_ml = os.path.join(self.path, "ml_tree.layout.json")
+        self.status_file = os.path.join(self.path, "status.json")
+        self.trace_file = os.path.join(self.path, "trace.json")
+        self.cancel_file = os.path.join(self.path, "CANCEL")
+        self.heartbeat_file = os.path.join(self.path, "HEARTBEAT")
+
+    @classmethod
+    def create(cls, root=WORKSPACE_ROOT, quota=WORKSPACE_QUOTA):
+        """
+        Makes a fresh workspace under root with a new job ID.
+
+        Raises WorkspaceQuotaError if the root is already at its disk quota
+        (run sweep_workspaces first to free space).
+        """
+        if quota is not None and disk_usage(root) >= quota:
+            raise WorkspaceQuotaError(
+                "The server is out of space for new analyses. Please try again later."
+            )
+        workspace = cls(os.path.join(root, uuid.uuid4().hex))
+        os.makedirs(workspace.path)
+        workspace.write_status({"status": "queued", "stage": None, "step": 0, "total": 0})
+        return workspace
+
+    @classmethod
+    def open(cls, job_id, root=WORKSPACE_ROOT):
+        """
+        Returns the existing workspace for job_id, or None if the ID is
+        malformed or the workspace has been swept away.
+        """
+        if not isinstance(job_id, str) or not _JOB_ID.match(job_id):
+            return None
+        path = os.path.join(root, job_id)
+        return cls(path) if os.path.isdir(path) else None
+
+    def read_status(self):
+        try:
+            with open(self.status_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"status": "unknown"}
+
+    def write_status(self, info):
+        # Write-then-rename so readers never see a half-written file
+        tmp = f"{self.status_file}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(info, f)
+        os.replace(tmp, self.status_file)
+
+    def request_cancel(self):
+        open(self.cancel_file, "w").close()
+
+    def cancel_requested(self):
+        return os.path.exists(self.cancel_file)
+
+    @contextmanager
+    def heartbeat(self, interval=HEARTBEAT_INTERVAL):
+        """
+        Touches the HEARTBEAT file every interval seconds from a background
+        thread while the with-block runs, so sweep_workspaces keeps the
+        workspace of a live job however long its current stage takes.
+        """
+        stop = threading.Event()
+
+        def beat():
+            while True:
+                try:
+                    with open(self.heartbeat_file, "a"):
+                        pass
+                    os.utime(self.heartbeat_file)
+                except OSError:
+                    pass  # swept anyway; the job will fail on its own
+                if stop.wait(interval):
+                    return
+
+        thread = threading.Thread(target=beat, name=f"heartbeat-{self.job_id}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def last_active(self):
+        """
+        Time of the last status change or heartbeat (workspace creation if
+        neither exists).
+        """
+        times = []
+        for path in (self.status_file, self.heartbeat_file):
+            try:
+                times.append(os.path.getmtime(path))
+            except OSError:
+                pass
+        return max(times) if times else os.path.getmtime(self.path)
+
+
+def disk_usage(root=WORKSPACE_ROOT):
+    """
+    Total size in bytes of every file under root (0 if it doesn't exist).
+    """
+    total = 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass  # removed while we were walking
+    return total
+
+
+def sweep_workspaces(root=WORKSPACE_ROOT, ttl=WORKSPACE_TTL, quota=WORKSPACE_QUOTA, now=None):
+    """
+    Deletes workspaces older than ttl seconds, then the oldest remaining ones
+    until the root fits in quota bytes. Workspaces whose job is queued or
+    running are kept, whatever the quota, until they have been inactive
+    for ttl seconds: a running job refreshes its heartbeat (see
+    Workspace.heartbeat) even during long stages, so only jobs that died
+    without recording it (or sat queued for ttl) are reaped.
+
+    Parameters:
+    - root (str): Workspace root directory.
+    - ttl (float): Maximum age in seconds, measured from the last status
+      change or heartbeat.
+    - quota (int or None): Byte budget for the whole root.
+    - now (float or None): Current time (for tests); defaults to time.time().
+
+    Returns:
+    - list of str: Job IDs that were removed.
+    """
+    if not os.path.isdir(root):
+        return []
+    now = time.time() if now is None else now
+
+    workspaces = []
+    for job_id in os.listdir(root):
+        workspace = Workspace.open(job_id, root)
+        if workspace is None:
+            continue
+        try:
+            modified = workspace.last_active()
+        except OSError:
+            continue  # removed meanwhile
+        workspaces.append((modified, disk_usage(workspace.path), workspace))
+    workspaces.sort(key=lambda w: w[0])
+
+    total = sum(size for _, size, _ in workspaces)
+    removed = []
+    for modified, size, workspace in workspaces:
+        expired = now - modified > ttl
+        over_quota = quota is not None and total > quota
+        if not (expired or over_quota):
+            continue
+        if workspace.read_status().get("status") in ("queued", "running") and not expired:
+            continue
+        shutil.rmtree(workspace.path, ignore_errors=True)
+        total -= size
+        removed.append(workspace.job_id)
+    return removed
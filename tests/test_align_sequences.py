@@ -12,13 +12,53 @@ PROJECT_ROOT = Path(__file__).parent.parent.resolve()
 sys.path.insert(0, str(PROJECT_ROOT / "src"))
 
 from src.align_sequences import align_sequences as run_muscle_alignment
+from src.align_sequences import add_to_alignment, align_divide_and_conquer, cluster_sequences, kmer_profiles
+from src.fasta_parser import iter_fasta
 
-@pytest.mark.skipif(
+needs_muscle = pytest.mark.skipif(
     (platform.system() == "Windows")             # don’t even try on Windows
     or not Path("bin/muscle").exists(),          # or if no muscle binary present
     reason="MUSCLE binary not available or not compatible; skipping alignment test."
 )
 
+# Two families of sequences that differ by a few substitutions within a family
+FAMILIES = {
+    "x": "ACGTTGCAACGTAGCTAGCTAGGCTAACGATCGATCGGATCGATTACG",
+    "y": "TTGACCAGTCAGGTCAATGCCATGACTGGTACCAGTGGTTAACCGGTA",
+}
+
+def family_fasta(path, per_family=6):
+    with open(path, "w") as f:
+        for name, seq in FAMILIES.items():
+            for i in range(per_family):
+                mutated = seq[:i * 3] + "A" + seq[i * 3 + 1:]
+                f.write(f">{name}{i}\n{mutated}\n")
+
+def test_clustering_keeps_families_together(tmp_path):
+    input_fasta = tmp_path / "families.fa"
+    family_fasta(input_fasta)
+    ids, vectors = kmer_profiles(str(input_fasta))
+    groups = cluster_sequences(vectors, group_size=6)
+    assert sorted(len(g) for g in groups) == [6, 6]
+    for group in groups:
+        assert len({ids[i][0] for i in group}) == 1
+
+@needs_muscle
+def test_divide_and_conquer_alignment(tmp_path):
+    input_fasta = tmp_path / "families.fa"
+    output_fasta = tmp_path / "aligned.fa"
+    family_fasta(input_fasta)
+
+    # Three groups of four, so both parallel group runs and profile merges happen
+    align_divide_and_conquer(str(input_fasta), str(output_fasta), group_size=4, max_workers=2)
+    aligned = list(iter_fasta(str(output_fasta)))
+    original = {r.id: r.seq for r in iter_fasta(str(input_fasta))}
+    assert len(aligned) == len(original)
+    assert len({len(r.seq) for r in aligned}) == 1
+    for record in aligned:
+        assert record.seq.replace("-", "") == original[record.id]
+
+@needs_muscle
 def test_run_muscle_alignment(tmp_path):
     # Create a small multi‐fasta file
     fasta_content = """>seqA
@@ -36,3 +76,59 @@ ACTGACTG
     aligned = output_fasta.read_text()
     # The aligned file should start with a ">" and have sequences
     assert aligned.startswith(">")
+
+@needs_muscle
+def test_add_to_alignment(tmp_path):
+    input_fasta = tmp_path / "families.fa"
+    family_fasta(input_fasta)
+    records = list(iter_fasta(str(input_fasta)))
+    with open(tmp_path / "old.fa", "w") as f:
+        f.writelines(f">{r.id}\n{r.seq}\n" for r in records[:-2])
+    with open(tmp_path / "new.fa", "w") as f:
+        f.writelines(f">{r.id}\n{r.seq[5:]}\n" for r in records[-2:])
+    run_muscle_alignment(str(tmp_path / "old.fa"), str(tmp_path / "old.aln"))
+
+    add_to_alignment(str(tmp_path / "old.aln"), str(tmp_path / "new.fa"), str(tmp_path / "all.aln"))
+    old = list(iter_fasta(str(tmp_path / "old.aln")))
+    merged = list(iter_fasta(str(tmp_path / "all.aln")))
+    # Old rows first and in their order, then the new ones
+    assert [r.id for r in merged] == [r.id for r in old] + [r.id for r in records[-2:]]
+    assert len({len(r.seq) for r in merged}) == 1
+    for before, after in zip(old, merged):
+        assert after.seq.replace("-", "") == before.seq.replace("-", "")
+
+@needs_muscle
+@pytest.mark.parametrize("has_prlimit", [True, False])
+def test_memory_limit_without_preexec_fn(tmp_path, monkeypatch, has_prlimit):
+    import resource
+    import subprocess
+    # preexec_fn is unsafe from worker threads; it must not be used
+    popen = subprocess.Popen
+    def checked_popen(*args, **kwargs):
+        assert kwargs.get("preexec_fn") is None
+        return popen(*args, **kwargs)
+    monkeypatch.setattr(subprocess, "Popen", checked_popen)
+    limits = []
+    if has_prlimit:
+        monkeypatch.setattr(resource, "prlimit", lambda pid, which, limit: limits.append((which, limit)))
+    else:
+        monkeypatch.delattr(resource, "prlimit", raising=False)
+
+    input_fasta = tmp_path / "families.fa"
+    family_fasta(input_fasta)
+    run_muscle_alignment(str(input_fasta), str(tmp_path / "aligned.fa"), memory_limit_mb=512)
+    assert len(list(iter_fasta(str(tmp_path / "aligned.fa")))) == 12
+    assert limits == ([(resource.RLIMIT_AS, (512 << 20, 512 << 20))] if has_prlimit else [])
+
+def test_divide_and_conquer_failure_raises(tmp_path, monkeypatch):
+    import subprocess
+    import src.align_sequences as align_sequences
+    def failing_muscle(args, **limits):
+        raise subprocess.CalledProcessError(1, ["muscle"], "", "out of memory")
+    monkeypatch.setattr(align_sequences, "_run_muscle", failing_muscle)
+    input_fasta = tmp_path / "families.fa"
+    family_fasta(input_fasta)
+    with pytest.raises(RuntimeError, match="out of memory"):
+        align_divide_and_conquer(str(input_fasta), str(tmp_path / "aligned.fa"), group_size=4)
+    assert not (tmp_path / "aligned.fa").exists()
+    assert os.listdir(tmp_path) == ["families.fa"]  # work files cleaned up
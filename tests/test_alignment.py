@@ -0,0 +1,103 @@
+# tests/test_alignment.py
+
+import sys
+from io import StringIO
+from pathlib import Path
+import numpy as np
+import pytest
+from Bio import AlignIO, Phylo
+
+# Add src/ to path
+PROJECT_ROOT = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from src.alignment import CompactAlignment
+from src.build_tree import AnalysisSession
+from src.distance import identity_distances
+
+ALIGNED = """>A
+ACGT-ACGTA
+>B
+ACGTTACGAA
+>C
+TCGT-ACGTA
+"""
+
+@pytest.fixture
+def alignment_file(tmp_path):
+    f = tmp_path / "aligned.fa"
+    f.write_text(ALIGNED)
+    return str(f)
+
+def test_round_trip_with_biopython(alignment_file):
+    msa = AlignIO.read(alignment_file, "fasta")
+    compact = CompactAlignment.from_fasta(alignment_file)
+    assert compact.shape == (3, 10)
+    assert list(compact.ids) == ["A", "B", "C"]
+    assert np.array_equal(CompactAlignment.from_records(msa).codes, compact.codes)
+
+    back = compact.to_msa()
+    assert [str(r.seq) for r in back] == [str(r.seq) for r in msa]
+    assert [r.id for r in back] == [r.id for r in msa]
+
+def test_slices_are_views(alignment_file):
+    compact = CompactAlignment.from_fasta(alignment_file)
+    part = compact[1:, 2:6]
+    assert part.shape == (2, 4)
+    assert np.shares_memory(part.codes, compact.codes)
+    assert list(part.ids) == ["B", "C"]
+    assert part.sequence(0) == "GTTA"
+    assert compact[0].sequence(0) == "ACGT-ACGTA"
+
+def test_pattern_compression_keeps_distances(alignment_file):
+    compact = CompactAlignment.from_fasta(alignment_file)
+    patterns, inverse = compact.compress_patterns(return_inverse=True)
+    assert patterns.shape[1] < compact.shape[1]
+    assert patterns.site_count == compact.shape[1]
+    assert np.array_equal(patterns.codes[:, inverse], compact.codes)
+
+    expected = identity_distances(compact.codes)
+    assert np.array_equal(identity_distances(patterns.codes, weights=patterns.weights), expected)
+    assert np.array_equal(AnalysisSession(patterns).distances, expected)
+
+    # Expanding the weights gives back every column (in pattern order)
+    assert patterns.to_msa().get_alignment_length() == compact.shape[1]
+
+def test_session_accepts_compact_alignment(alignment_file):
+    from_path = AnalysisSession.from_fasta(alignment_file)
+    from_compact = AnalysisSession(CompactAlignment.from_fasta(alignment_file))
+    from_msa = AnalysisSession(AlignIO.read(alignment_file, "fasta"))
+
+    def newick(tree):
+        out = StringIO()
+        Phylo.write(tree, out, "newick")
+        return out.getvalue()
+
+    assert newick(from_compact.nj_tree()) == newick(from_path.nj_tree())
+    assert newick(from_msa.upgma_tree()) == newick(from_path.upgma_tree())
+
+def test_filter_trims_gappy_columns_and_ends():
+    rows = [b"--ACGT-A-TT--", b"-CACGA-A-TTG-", b"--ACGT-ACTTGA", b"---CGT-A-TTG-"]
+    compact = CompactAlignment(list("wxyz"), np.frombuffer(b"".join(rows), dtype=np.uint8).reshape(4, -1))
+    trimmed = compact.filter_columns(min_end_occupancy=0.5)
+    assert trimmed.sequence(0) == "ACGT-A-TT-"
+    dropped = compact.filter_columns(max_gap_fraction=0.5)
+    assert dropped.sequence(1) == "ACGAATTG"
+    assert compact.filter_columns(max_gap_fraction=0.5, min_end_occupancy=0.5).sequence(1) == "ACGAATTG"
+    with pytest.raises(ValueError):
+        compact[:, :2].filter_columns(max_gap_fraction=0.0)
+
+def test_collapsed_invariant_sites_keep_distances_and_scores(alignment_file):
+    from src.parsimony import parsimony_tree
+    compact = CompactAlignment.from_fasta(alignment_file)
+    collapsed = compact.filter_columns(collapse_invariant=True)
+    # Seven invariant columns (C, G, T, A, C, G, A) become one per base
+    assert collapsed.shape[1] == 3 + 4
+    assert collapsed.site_count == compact.shape[1]
+    assert np.array_equal(identity_distances(collapsed.codes, weights=collapsed.weights),
+                          identity_distances(compact.codes))
+    start = AnalysisSession(compact).nj_tree()
+    scores = [{}, {}]
+    parsimony_tree(collapsed, start, radius=0, score=scores[0])
+    parsimony_tree(compact, start, radius=0, score=scores[1])
+    assert scores[0]["score"] == scores[1]["score"]
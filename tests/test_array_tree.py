@@ -0,0 +1,82 @@
+# tests/test_array_tree.py
+
+import random
+import sys
+from io import StringIO
+from pathlib import Path
+import numpy as np
+import pytest
+from Bio import Phylo
+from Bio.Phylo import BaseTree
+
+# Add src/ to path
+PROJECT_ROOT = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+import src.array_tree as array_tree
+from src.array_tree import ArrayTree, read_newick
+from src.visualize_tree import tree_layout
+
+def phylo_newick(tree, **formats):
+    out = StringIO()
+    Phylo.write(tree, out, "newick", **formats)
+    return out.getvalue()
+
+def random_tree(n, seed):
+    # Awkward labels (quotes, spaces, colons, numbers) and some supports
+    rng = random.Random(seed)
+    clades = [BaseTree.Clade(rng.random(), rng.choice([f"t{i}", f"a b{i}", f"o'k{i}", f"x:{i}", "42"]))
+              for i in range(n)]
+    while len(clades) > 1:
+        a = clades.pop(rng.randrange(len(clades)))
+        b = clades.pop(rng.randrange(len(clades)))
+        clade = BaseTree.Clade(rng.choice([None, rng.random()]), rng.choice([None, "Inner"]), [a, b])
+        if rng.random() < 0.5:
+            clade.confidence = rng.choice([95, 50.5])
+        clades.append(clade)
+    return BaseTree.Tree(clades[0], rooted=False)
+
+@pytest.mark.parametrize("seed", range(5))
+def test_newick_matches_biopython(tmp_path, monkeypatch, seed):
+    tree = random_tree(25, seed)
+    expected = phylo_newick(tree, format_confidence="%.0f")
+    path = tmp_path / "tree.newick"
+    ArrayTree.from_phylo(tree).write_newick(path, format_confidence="%.0f")
+    assert path.read_text() == expected
+
+    # Tiny chunks split tokens anywhere; the result must not change
+    monkeypatch.setattr(array_tree, "READ_CHUNK", 3)
+    parsed = read_newick(path)
+    reference = Phylo.read(path, "newick")
+    assert phylo_newick(parsed.to_phylo()) == phylo_newick(reference)
+    assert [c.confidence for c in parsed.to_phylo().find_clades()] == \
+        [c.confidence for c in reference.find_clades()]
+
+def test_deep_tree_without_recursion():
+    # A 5000-level caterpillar: too deep for recursive writers
+    n = 5000
+    parent, names, inner = [-1], [None], 0
+    for i in range(n - 2):
+        parent += [inner, inner]
+        names += [f"t{i}", None]
+        inner = len(parent) - 1
+    parent += [inner, inner]
+    names += ["u", "v"]
+    tree = ArrayTree(parent, np.full(len(parent), 0.5), names, np.full(len(parent), np.nan))
+    text = tree.to_newick()
+    again = ArrayTree.from_newick(text)
+    assert np.array_equal(again.parent, tree.parent)
+    assert again.names == tree.names
+    assert again.count_terminals() == n
+
+def test_layout_from_array_tree_matches_phylo():
+    tree = random_tree(30, seed=7)
+    a, b = tree_layout(tree), tree_layout(ArrayTree.from_phylo(tree))
+    assert np.array_equal(a.parent, b.parent)
+    assert np.allclose(a.x, b.x) and np.array_equal(a.y, b.y)
+    assert a.to_dict() == b.to_dict()
+
+@pytest.mark.parametrize("text", ["((A,B);", "(A,B));", "(A,B);C;", "A,B;", "(A,'B);"])
+def test_invalid_newick_rejected(text):
+    with pytest.raises(ValueError):
+        ArrayTree.from_newick(text)
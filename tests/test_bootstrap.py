@@ -0,0 +1,72 @@
+# tests/test_bootstrap.py
+
+import sys
+from pathlib import Path
+import numpy as np
+import pytest
+from Bio import Phylo
+
+# Add src/ to path
+PROJECT_ROOT = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from src.alignment import CompactAlignment
+from src.bootstrap import bootstrap_support, clade_splits, resample_weights
+from src.build_tree import AnalysisSession
+from src.distance import identity_distances
+from src.visualize_tree import visualize_tree
+
+@pytest.fixture
+def two_groups():
+    # Two groups of four that differ at half the sites, with a little noise inside each
+    rng = np.random.default_rng(3)
+    root = rng.integers(0, 4, 300)
+    other = root.copy()
+    other[::2] = (other[::2] + 1) % 4
+    rows = []
+    for base in (root, other):
+        for _ in range(4):
+            row = base.copy()
+            noisy = rng.random(300) < 0.05
+            row[noisy] = rng.integers(0, 4, noisy.sum())
+            rows.append(row)
+    codes = np.frombuffer(b"ACGT", dtype=np.uint8)[np.array(rows)]
+    return CompactAlignment([f"s{i}" for i in range(8)], codes)
+
+def test_column_counts_match_copied_columns(two_groups):
+    patterns, inverse = two_groups.compress_patterns(return_inverse=True)
+    counts = resample_weights(patterns.weights, replicates=5, seed=0)
+    assert counts.shape == (5, patterns.shape[1])
+    assert (counts.sum(axis=1) == 300).all()
+
+    # A replicate drawn as copied columns gives the same distances as its counts
+    columns = np.random.default_rng(1).integers(0, 300, 300)
+    counts = np.bincount(inverse[columns], minlength=patterns.shape[1])
+    assert np.allclose(identity_distances(patterns.codes, weights=counts),
+                       identity_distances(two_groups.codes[:, columns]))
+
+@pytest.mark.parametrize("builder", ["nj", "upgma"])
+def test_supports_are_seeded_and_find_the_groups(two_groups, builder):
+    session = AnalysisSession(two_groups)
+    tree = session.nj_tree() if builder == "nj" else session.upgma_tree()
+    serial = bootstrap_support(two_groups, tree, builder, replicates=20, workers=1, seed=7)
+    parallel = bootstrap_support(two_groups, tree, builder, replicates=20, workers=2, seed=7)
+    assert serial == parallel
+    assert all(0 <= value <= 100 for value in serial.values())
+
+    ids = list(two_groups.ids)
+    group = sum(1 << i for i in range(4, 8))  # s4..s7, the side without s0
+    splits = clade_splits(tree, ids, rooted=builder == "upgma")
+    assert [serial[c] for c, mask in splits.items() if mask == group] == [100.0]
+
+def test_supports_are_written_to_newick_and_drawn(two_groups, tmp_path):
+    out = tmp_path / "nj.newick"
+    AnalysisSession(two_groups).write_parsimony_tree(str(out), bootstrap=10, workers=1, seed=0)
+    tree = Phylo.read(str(out), "newick")
+    supports = [c.confidence for c in tree.get_nonterminals() if c.confidence is not None]
+    assert 100 in supports
+    assert all(c.name is None for c in tree.get_nonterminals())
+
+    png = tmp_path / "nj.png"
+    visualize_tree(str(out), str(png))
+    assert png.stat().st_size > 0
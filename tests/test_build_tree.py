@@ -10,7 +10,7 @@ import pytest
 PROJECT_ROOT = Path(__file__).parent.parent.resolve()
 sys.path.insert(0, str(PROJECT_ROOT / "src"))
 
-from src.build_tree import build_parsimony_tree, build_likelihood_tree
+from src.build_tree import AnalysisSession, build_parsimony_tree, build_likelihood_tree
 
 # Create a minimal dummy alignment file for testing
 DUMMY_ALIGNMENT = """>A
@@ -40,3 +40,18 @@ def test_build_likelihood_tree(dummy_alignment, tmp_path):
     assert Path(output_newick).exists()
     # likewise check formatting
     assert Path(output_newick).read_text().strip().endswith(";")
+
+def test_session_computes_distances_once(dummy_alignment, tmp_path, monkeypatch):
+    import src.build_tree as build_tree
+    calls = []
+    real = build_tree.identity_distances
+    monkeypatch.setattr(build_tree, "identity_distances", lambda codes, **kw: calls.append(1) or real(codes, **kw))
+
+    session = AnalysisSession.from_fasta(dummy_alignment)
+    build_parsimony_tree(session, str(tmp_path / "nj.newick"))
+    build_likelihood_tree(session, str(tmp_path / "upgma.newick"))
+
+    assert len(calls) == 1
+    assert session.ids == ["A", "B"]
+    assert (tmp_path / "nj.newick").read_text().strip().endswith(";")
+    assert (tmp_path / "upgma.newick").read_text().strip().endswith(";")
@@ -0,0 +1,77 @@
+# tests/test_cache.py
+
+import os
+import sys
+from pathlib import Path
+
+# Add src/ to path
+PROJECT_ROOT = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from src.cache import ARTIFACTS, ResultCache, cache_key
+
+PARAMS = {"distance": "identity"}
+
+def make_artifacts(directory, size=10):
+    os.makedirs(directory, exist_ok=True)
+    for name in ARTIFACTS:
+        with open(os.path.join(directory, name), "wb") as f:
+            f.write(b"x" * size)
+    return str(directory)
+
+def test_key_ignores_formatting_but_not_content(tmp_path):
+    a = tmp_path / "a.fa"
+    b = tmp_path / "b.fa"
+    c = tmp_path / "c.fa"
+    a.write_text(">s1\nACGT\nACGT\n>s2\nAC\n")
+    b.write_text(">s1 some description\nacgtacgt\n\n>s2\nac\n")
+    c.write_text(">s1\nACGTACGA\n>s2\nAC\n")
+
+    assert cache_key(str(a), PARAMS) == cache_key(str(b), PARAMS)
+    assert cache_key(str(a), PARAMS) != cache_key(str(c), PARAMS)
+    assert cache_key(str(a), PARAMS) != cache_key(str(a), {"distance": "kmer"})
+
+def test_store_restore_and_counters(tmp_path):
+    cache = ResultCache(root=str(tmp_path / "cache"), max_bytes=10**6)
+    assert cache.restore("k1", str(tmp_path)) is None
+
+    cache.store("k1", make_artifacts(tmp_path / "job1"), {"num_seqs": 3})
+    target = tmp_path / "job2"
+    target.mkdir()
+    assert cache.restore("k1", str(target))["num_seqs"] == 3
+    assert sorted(os.listdir(target)) == sorted(ARTIFACTS)
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    per_entry = 100 * len(ARTIFACTS) + len('{"num_seqs": 1}')
+    cache = ResultCache(root=str(tmp_path / "cache"), max_bytes=2 * per_entry)
+    cache.store("old", make_artifacts(tmp_path / "a", size=100), {"num_seqs": 1})
+    cache.store("used", make_artifacts(tmp_path / "b", size=100), {"num_seqs": 1})
+    os.utime(tmp_path / "cache" / "old", (1, 1))
+    os.utime(tmp_path / "cache" / "used", (2, 2))
+    assert cache.lookup("used") is not None  # refreshes "used"
+
+    cache.store("new", make_artifacts(tmp_path / "c", size=100), {"num_seqs": 1})
+    assert cache.lookup("old") is None
+    assert cache.lookup("used") is not None
+    assert cache.lookup("new") is not None
+
+def test_eviction_leaves_sketch_cache_alone(tmp_path):
+    from src.cache import CACHE_ROOT
+    from src.minhash import SKETCH_CACHE, sketch_fasta
+    # The default sketch directory is not inside the result cache
+    assert os.path.commonpath([os.path.abspath(CACHE_ROOT), os.path.abspath(SKETCH_CACHE)]) != \
+        os.path.abspath(CACHE_ROOT)
+
+    fasta = tmp_path / "in.fa"
+    fasta.write_text(">a\n" + "ACGT" * 30 + "\n>b\n" + "ACGA" * 30 + "\n")
+    sketches = tmp_path / "output" / "sketches"
+    sketch_fasta(str(fasta), cache_dir=str(sketches))
+    cached = sorted(os.listdir(sketches))
+
+    cache = ResultCache(root=str(tmp_path / "output" / "cache"), max_bytes=0)
+    cache.store("k1", make_artifacts(tmp_path / "job"), {"num_seqs": 2})  # evicted at once
+    assert cache.evict() == 0
+    assert cache.stats()["entries"] == 0
+    assert sorted(os.listdir(sketches)) == cached
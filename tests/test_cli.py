@@ -0,0 +1,69 @@
+# tests/test_cli.py
+
+import json
+import platform
+import sys
+from pathlib import Path
+import pytest
+from click.testing import CliRunner
+
+# Add src/ to path
+PROJECT_ROOT = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from src.cli import collect_inputs, main, output_names
+
+LOCUS = """>A
+ACTGACTGACTGTTGA
+>B
+ACTGACTCACTGTTGA
+>C
+ACTTACTGACTGTAGA
+"""
+
+@pytest.fixture
+def loci(tmp_path):
+    folder = tmp_path / "loci"
+    (folder / "sub").mkdir(parents=True)
+    for path in ["gene1.fa", "gene2.fasta", "sub/gene1.fa"]:
+        (folder / path).write_text(LOCUS)
+    (folder / "notes.txt").write_text("not a FASTA file")
+    return folder
+
+def test_collect_inputs(loci):
+    assert [Path(p).name for p in collect_inputs([str(loci)])] == ["gene1.fa", "gene2.fasta"]
+    nested = collect_inputs([str(loci / "**" / "*.fa")])
+    assert len(nested) == 2
+
+    # Same stem in two folders gets a disambiguating suffix
+    names = output_names(nested)
+    assert len(set(names.values())) == 2
+
+@pytest.mark.skipif(
+    (platform.system() == "Windows") or not Path("bin/muscle").exists(),
+    reason="MUSCLE binary not available or not compatible; skipping batch test."
+)
+def test_batch_run_resumes_from_manifest(loci, tmp_path):
+    out = tmp_path / "batch"
+    runner = CliRunner()
+    result = runner.invoke(main, [str(loci), "-o", str(out), "-j", "2"])
+    assert result.exit_code == 0, result.output
+
+    manifest = json.loads((out / "manifest.json").read_text())
+    assert [entry["status"] for entry in manifest.values()] == ["done", "done"]
+    assert (out / "gene1" / "parsimony_tree.png").exists()
+
+    # Rerun: nothing left to do
+    result = runner.invoke(main, [str(loci), "-o", str(out)])
+    assert "2 already done, 0 to run" in result.output
+
+def test_each_file_gets_its_share_of_workers(tmp_path, monkeypatch):
+    import src.cli as cli
+    seen = {}
+    def fake_pipeline(*args, **kwargs):
+        seen.update(kwargs)
+        return {"num_seqs": 3}
+    monkeypatch.setattr(cli, "run_pipeline", fake_pipeline)
+    cli.analyze_file("in.fa", str(tmp_path / "out"), workers=3)
+    # Distance tiles and bootstrap replicates stay within the file's share
+    assert seen["distance_workers"] == seen["bootstrap_workers"] == 3
@@ -0,0 +1,65 @@
+# tests/test_distance.py
+
+import sys
+from pathlib import Path
+import numpy as np
+import pytest
+from Bio.Align import MultipleSeqAlignment
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
+from Bio.Phylo.TreeConstruction import DistanceCalculator
+
+# Add src/ to path
+PROJECT_ROOT = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from src.distance import (encode_alignment, extend_identity_distances, identity_distances,
+                          identity_distance_matrix)
+
+def make_alignment(seqs):
+    return MultipleSeqAlignment(
+        [SeqRecord(Seq(s), id=f"seq{i}") for i, s in enumerate(seqs)]
+    )
+
+def test_matches_biopython_identity():
+    rng = np.random.default_rng(0)
+    seqs = ["".join(rng.choice(list("ACGT-N"), size=57)) for _ in range(9)]
+    alignment = make_alignment(seqs)
+
+    expected = DistanceCalculator("identity").get_distance(alignment)
+    result = identity_distance_matrix(alignment)
+
+    assert result.names == expected.names
+    # Same arithmetic as Biopython, so the values should be bit-identical
+    assert result.matrix == expected.matrix
+
+def test_ignore_gaps_uses_pairwise_deletion():
+    _, codes = encode_alignment(make_alignment(["AC-T", "ACGA", "----"]))
+    dist = identity_distances(codes, ignore_gaps=True)
+    # seq0 vs seq1 compare 3 columns (A, C, T/A) with one mismatch
+    assert dist[0, 1] == pytest.approx(1 / 3)
+    # Nothing left to compare against an all-gap sequence
+    assert dist[0, 2] == 1.0
+    assert np.all(np.diag(dist) == 0)
+
+def test_unequal_lengths_rejected():
+    records = [SeqRecord(Seq("ACGT"), id="a"), SeqRecord(Seq("ACG"), id="b")]
+    with pytest.raises(ValueError):
+        encode_alignment(records)
+
+def test_extend_computes_only_new_rows():
+    rng = np.random.default_rng(1)
+    codes = np.frombuffer(b"ACGT-", dtype=np.uint8)[rng.integers(0, 5, (12, 80))]
+    full = identity_distances(codes)
+    assert np.array_equal(identity_distances(codes, rows=[2, 9]), full[[2, 9]])
+
+    # The old 9 rows got two gap columns inserted when 3 rows were added
+    grown = codes.copy()
+    grown[:9, [10, 40]] = ord("-")
+    old = np.delete(grown[:9], [10, 40], axis=1)
+    extended = extend_identity_distances(identity_distances(old), old, grown)
+    assert np.allclose(extended, identity_distances(grown), rtol=0, atol=1e-12)
+
+    # Any other change to the old rows needs the full matrix
+    grown[0, 0] = ord("A") if grown[0, 0] != ord("A") else ord("C")
+    assert extend_identity_distances(identity_distances(old), old, grown) is None
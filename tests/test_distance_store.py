@@ -0,0 +1,65 @@
+# tests/test_distance_store.py
+
+import sys
+from io import StringIO
+from pathlib import Path
+import numpy as np
+import pytest
+from Bio import Phylo
+
+# Add src/ to path
+PROJECT_ROOT = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+import src.distance_store as distance_store
+from src.distance import identity_distances
+from src.distance_store import DistanceStore, identity_distance_store
+from src.nj import neighbor_joining
+from src.upgma import condensed_distances, upgma_tree
+
+def newick(tree):
+    out = StringIO()
+    Phylo.write(tree, out, "newick")
+    return out.getvalue()
+
+def random_codes(n, length, seed):
+    rng = np.random.default_rng(seed)
+    return np.frombuffer(b"ACGT-", dtype=np.uint8)[rng.integers(0, 5, (n, length))]
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_tiles_match_identity_distances(tmp_path, monkeypatch, workers):
+    # Tiny tiles and no small-input shortcut, so the pool path really runs
+    monkeypatch.setattr(distance_store, "PARALLEL_MIN_TAXA", 0)
+    codes = random_codes(57, 80, seed=workers)
+    weights = np.random.default_rng(0).integers(1, 4, 80)
+    store = identity_distance_store(codes, tmp_path / "d.npy", weights=weights,
+                                    workers=workers, tile_cells=300)
+    expected = identity_distances(codes, weights=weights)
+    assert store.shape == (57, 57)
+    assert store.condensed.dtype == np.float32
+    assert np.allclose(np.asarray(store), expected, atol=1e-6)
+
+def test_indexing_like_a_square_matrix(tmp_path):
+    square = identity_distances(random_codes(9, 30, seed=3))
+    store = DistanceStore.from_square(tmp_path / "d.npy", square)
+    expected = square.astype(np.float32)
+    assert store[4, 4] == 0.0
+    assert store[2, 7] == expected[2, 7] == store[7, 2]
+    assert np.array_equal(store[5, [0, 5, 8]], expected[5, [0, 5, 8]])
+    assert np.array_equal(store[6], expected[6])
+    assert np.array_equal(np.array(store, dtype=np.float64), expected)
+
+def test_trees_built_from_store(tmp_path):
+    codes = random_codes(30, 60, seed=4)
+    store = identity_distance_store(codes, tmp_path / "d.npy")
+    square = np.asarray(store, dtype=np.float64)
+    names = [f"t{i}" for i in range(30)]
+    assert newick(neighbor_joining(names, store)) == newick(neighbor_joining(names, square))
+    assert condensed_distances(store) is store.condensed
+    assert newick(upgma_tree(names, condensed_distances(store))) == \
+        newick(upgma_tree(names, condensed_distances(square)))
+
+def test_square_file_rejected(tmp_path):
+    np.save(tmp_path / "d.npy", np.zeros((4, 4)))
+    with pytest.raises(ValueError):
+        DistanceStore(tmp_path / "d.npy")
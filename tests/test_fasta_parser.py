@@ -11,7 +11,7 @@ from Bio import SeqIO
 PROJECT_ROOT = Path(__file__).parent.parent.resolve()
 sys.path.insert(0, str(PROJECT_ROOT / "src"))
 
-from src.fasta_parser import parse_fasta
+from src.fasta_parser import FastaIndex, FastaValidator, count_sequences, iter_fasta, parse_fasta
 
 def test_parse_valid_fasta(tmp_path):
     # Write a small FASTA file for testing
@@ -37,3 +37,73 @@ def test_parse_empty_fasta(tmp_path):
     empty_file.write_text("")  # no content
     with pytest.raises(ValueError):
         _ = list(parse_fasta(str(empty_file)))
+
+MIXED_FASTA = """>a first record
+ACGTACGTAC
+ACGTACGTAC
+ACG
+>b
+AC GT
+A
+
+>c
+>d
+AAAA
+AAAAAAAA
+A
+"""
+
+def test_streaming_reader_matches_biopython(tmp_path):
+    test_file = tmp_path / "mixed.fasta"
+    test_file.write_text(MIXED_FASTA)
+
+    records = list(iter_fasta(str(test_file)))
+    expected = list(SeqIO.parse(str(test_file), "fasta"))
+    assert [r.id for r in records] == [r.id for r in expected]
+    assert [r.description for r in records] == [r.description for r in expected]
+    assert [r.seq for r in records] == [str(r.seq) for r in expected]
+    assert count_sequences(str(test_file)) == 4
+
+def test_index_random_access(tmp_path):
+    test_file = tmp_path / "mixed.fasta"
+    test_file.write_text(MIXED_FASTA)
+
+    index = FastaIndex.build(str(test_file))
+    assert os.path.exists(str(test_file) + ".fai")
+    # Regular records get samtools line columns, ragged ones fall back to 0
+    assert index.entries["a"] == (23, 16, 10, 11)
+    assert index.entries["d"][2:] == (0, 0)
+
+    loaded = FastaIndex.load(str(test_file))
+    assert len(loaded) == 4
+    for record in iter_fasta(str(test_file)):
+        assert loaded[record.id] == record.seq
+    loaded.close()
+
+
+def validate(data, chunk_size):
+    validator = FastaValidator()
+    for start in range(0, len(data), chunk_size):
+        validator.feed(data[start:start + chunk_size])
+    validator.close()
+    return validator.records, validator.residues
+
+def test_validator_accepts_any_chunking():
+    data = b">seq1 some description\nACGT\nac-gt\n\n>seq2\r\nNNNN*\r\n"
+    # Chunks of every size split lines, headers and IDs at every position
+    for chunk_size in range(1, len(data) + 1):
+        assert validate(data, chunk_size) == (2, 14)
+
+@pytest.mark.parametrize("data, message", [
+    (b"ACGT\n>seq1\nACGT\n", "must start with a '>' header"),
+    (b">seq1\nAC1GT\n", "unexpected character '1'"),
+    (b">seq1\n>seq2\nACGT\n", "'seq1' has no sequence"),
+    (b">seq1\nACGT\n>seq2\n", "'seq2' has no sequence"),
+    (b">\nACGT\n", "header without a sequence ID"),
+    (b">seq1\nACGT\n>seq1 again\nACGT\n", "duplicate sequence ID 'seq1'"),
+    (b"", "No sequences found"),
+])
+def test_validator_rejects_bad_fasta(data, message):
+    for chunk_size in (1, 3, 1000):
+        with pytest.raises(ValueError, match=message):
+            validate(data, chunk_size)
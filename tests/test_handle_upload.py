@@ -0,0 +1,34 @@
+# tests/test_handle_upload.py
+
+import io
+import os
+import sys
+from pathlib import Path
+import pytest
+
+# Add project root to path so imports work
+PROJECT_ROOT = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from handle_upload import UploadTooLargeError, save_upload_stream
+
+FASTA = b">seq1\nACGTACGT\n>seq2\nACGTTCGT\n"
+
+def test_save_upload_stream(tmp_path):
+    path = tmp_path / "input.fa"
+    received = save_upload_stream(io.BytesIO(FASTA), str(path), chunk_size=5)
+    assert received == {"sequences": 2, "bytes": len(FASTA)}
+    assert path.read_bytes() == FASTA
+
+def test_save_upload_stream_rejects_and_cleans_up(tmp_path):
+    path = tmp_path / "input.fa"
+    with pytest.raises(UploadTooLargeError):
+        save_upload_stream(io.BytesIO(FASTA), str(path), max_bytes=10, chunk_size=4)
+    assert not path.exists()
+
+    # Validation stops at the first bad chunk, before the rest is read
+    stream = io.BytesIO(b"not a fasta file\n" + FASTA * 1000)
+    with pytest.raises(ValueError, match="must start with a '>' header"):
+        save_upload_stream(stream, str(path), chunk_size=16)
+    assert stream.tell() == 16
+    assert not os.path.exists(path)
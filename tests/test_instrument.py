@@ -0,0 +1,53 @@
+# tests/test_instrument.py
+
+import json
+import sys
+from pathlib import Path
+import pytest
+
+# Add src/ to path
+PROJECT_ROOT = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from src.instrument import MetricsStore, Trace
+
+def test_spans_record_time_resources_and_attributes(tmp_path):
+    trace = Trace("job1")
+    trace.attributes["taxa"] = 5
+    with trace.span("align"):
+        sum(range(100000))
+    with pytest.raises(RuntimeError):
+        with trace.span("distances"):
+            raise RuntimeError("boom")
+
+    first, second = trace.spans
+    assert first["stage"] == "align" and first["taxa"] == 5
+    assert first["wall_seconds"] >= 0 and first["cpu_seconds"] >= 0
+    assert first["peak_rss_bytes"] is None or first["peak_rss_bytes"] > 0
+    assert "error" not in first and second["error"] is True
+
+    trace.status = "failed"
+    trace.write(str(tmp_path / "trace.json"))
+    saved = json.loads((tmp_path / "trace.json").read_text())
+    assert saved["job_id"] == "job1" and [s["stage"] for s in saved["spans"]] == ["align", "distances"]
+
+def test_metrics_aggregate_jobs_in_prometheus_format(tmp_path):
+    store = MetricsStore(str(tmp_path / "metrics" / "metrics.json"))
+    for seconds in (0.2, 20):
+        trace = Trace()
+        trace.status = "done"
+        trace.attributes.update(taxa=8, sites=600)
+        trace.spans.append({"stage": "align", "wall_seconds": seconds, "cpu_seconds": 1.5,
+                            "peak_rss_bytes": 1000})
+        store.record(trace)
+
+    text = store.render()
+    assert 'simplephylo_jobs_total{status="done"} 2' in text
+    assert 'simplephylo_stage_seconds_bucket{stage="align",le="0.5"} 1' in text
+    assert 'simplephylo_stage_seconds_bucket{stage="align",le="+Inf"} 2' in text
+    assert 'simplephylo_stage_seconds_sum{stage="align"} 20.2' in text
+    assert 'simplephylo_stage_cpu_seconds_total{stage="align"} 3.0' in text
+    assert 'simplephylo_job_taxa_count 2' in text
+    assert 'simplephylo_job_sites_bucket{le="1000"} 2' in text
+    # An empty store still renders valid metric families
+    assert MetricsStore(str(tmp_path / "missing.json")).render().startswith("# HELP")
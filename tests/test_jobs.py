@@ -0,0 +1,115 @@
+# tests/test_jobs.py
+
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import pytest
+
+# Add src/ to path
+PROJECT_ROOT = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from src.jobs import JobQueue, QueueFullError
+
+def add_job(a, b, progress):
+    progress(0, 1, "Adding")
+    return a + b
+
+def failing_job(progress):
+    raise ValueError("bad input")
+
+def slow_job(seconds, progress):
+    for step in range(int(seconds * 10)):
+        progress(step, int(seconds * 10), "Sleeping")
+        time.sleep(0.1)
+    return "finished"
+
+def pool_job(progress):
+    # One long stage with no progress updates, like a bootstrap
+    progress(0, 1, "Waiting on a pool")
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        return pool.submit(time.sleep, 60).result()
+
+def subprocess_job(pid_file, progress):
+    # Same, waiting on a child process, like MUSCLE
+    progress(0, 1, "Waiting on a subprocess")
+    with subprocess.Popen(["sleep", "60"]) as proc:
+        Path(pid_file).write_text(str(proc.pid))
+        try:
+            proc.wait()
+        except BaseException:
+            proc.kill()
+            raise
+
+def wait_for_stage(queue, job_id, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if (queue.status(job_id).get("stage") or "").startswith("Waiting"):
+            return
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not start")
+
+def wait_for(queue, job_id, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        info = queue.status(job_id)
+        if info["status"] not in ("queued", "running"):
+            return info
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not finish")
+
+@pytest.fixture
+def queue():
+    q = JobQueue(max_workers=1, max_queued=1)
+    yield q
+    q.shutdown()
+
+def test_job_result_and_failure(queue):
+    info = wait_for(queue, queue.submit(add_job, 2, 3))
+    assert info["status"] == "done"
+    assert info["result"] == 5
+
+    info = wait_for(queue, queue.submit(failing_job))
+    assert info["status"] == "failed"
+    assert "bad input" in info["error"]
+
+def test_full_queue_rejects_and_cancel(queue):
+    running = queue.submit(slow_job, 30)
+    waiting = queue.submit(slow_job, 30)
+    with pytest.raises(QueueFullError):
+        queue.submit(add_job, 1, 1)
+
+    # Both stop at their next progress update (or never start at all)
+    assert queue.cancel(running)
+    assert queue.cancel(waiting)
+    assert wait_for(queue, running, timeout=20)["status"] == "cancelled"
+    assert wait_for(queue, waiting, timeout=20)["status"] == "cancelled"
+
+def test_unknown_job(queue):
+    assert queue.status("nope") == {"status": "unknown"}
+    assert not queue.cancel("nope")
+
+@pytest.mark.skipif(sys.platform == "win32", reason="running stages are only interrupted where there is SIGUSR1")
+def test_cancel_interrupts_the_running_stage(queue, tmp_path):
+    job = queue.submit(pool_job)
+    wait_for_stage(queue, job)
+    start = time.time()
+    assert queue.cancel(job)
+    assert wait_for(queue, job, timeout=20)["status"] == "cancelled"
+    assert time.time() - start < 10  # not after the 60 s stage
+
+    pid_file = tmp_path / "pid"
+    job = queue.submit(subprocess_job, str(pid_file))
+    wait_for_stage(queue, job)
+    while not pid_file.exists():
+        time.sleep(0.05)
+    assert queue.cancel(job)
+    assert wait_for(queue, job, timeout=20)["status"] == "cancelled"
+    with pytest.raises(ProcessLookupError):
+        os.kill(int(pid_file.read_text()), 0)
+
+    # The worker is free again
+    assert wait_for(queue, queue.submit(add_job, 1, 2))["result"] == 3
@@ -0,0 +1,87 @@
+# tests/test_likelihood.py
+
+import sys
+from io import StringIO
+from pathlib import Path
+import numpy as np
+import pytest
+from Bio import Phylo
+
+# Add src/ to path
+PROJECT_ROOT = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from src.alignment import CompactAlignment
+from src.bootstrap import clade_splits
+from src.build_tree import AnalysisSession, build_likelihood_tree
+from src.likelihood import LikelihoodTree, SubstitutionModel, maximum_likelihood_tree
+from src.nj import neighbor_joining
+from src.distance import identity_distances
+
+TRUE_TREE = ("(((((a:0.05,b:0.08):0.03,c:0.1):0.04,(d:0.06,e:0.07):0.05):0.02,"
+             "(f:0.09,(g:0.04,h:0.05):0.06):0.03):0.01,((i:0.1,j:0.03):0.05,(k:0.07,l:0.08):0.02):0.04);")
+
+def simulate(newick, model, length, seed):
+    """Evolves random sequences down a tree under the model."""
+    rng = np.random.default_rng(seed)
+    tree = Phylo.read(StringIO(newick), "newick")
+    states = {tree.root: rng.choice(4, length, p=model.freqs)}
+    for clade in tree.find_clades(order="preorder"):
+        for child in clade.clades:
+            cumulative = model.transition(child.branch_length).cumsum(axis=1)
+            states[child] = (rng.random(length)[:, None] > cumulative[states[clade]]).sum(axis=1)
+    tips = sorted(tree.get_terminals(), key=lambda c: c.name)
+    codes = np.frombuffer(b"ACGT", dtype=np.uint8)[np.array([states[c] for c in tips])]
+    return tree, CompactAlignment([c.name for c in tips], codes)
+
+def test_pruning_matches_brute_force():
+    model = SubstitutionModel("HKY", kappa=4.0, freqs=[0.3, 0.2, 0.2, 0.3])
+    tree, alignment = simulate("((A:0.1,B:0.2):0.05,C:0.3,D:0.15);", model, 40, seed=0)
+    alignment.codes[0, 3] = ord("-")
+    alignment.codes[1, 5] = ord("R")
+    pruned = LikelihoodTree.from_phylo(tree, alignment, model).log_likelihood()
+
+    # Sum over every state of the two internal nodes, column by column
+    from src.likelihood import _TIP_STATES
+    P = model.transition
+    expected = 0.0
+    for column in alignment.codes.T:
+        a, b, c, d = (_TIP_STATES[x] for x in column)
+        inner = (P(0.1) @ a) * (P(0.2) @ b)
+        expected += np.log(model.freqs @ ((P(0.05) @ inner) * (P(0.3) @ c) * (P(0.15) @ d)))
+    assert pruned == pytest.approx(expected, rel=1e-10)
+
+def test_search_recovers_the_true_topology():
+    model = SubstitutionModel("HKY", kappa=4.0, freqs=[0.3, 0.2, 0.2, 0.3])
+    true_tree, alignment = simulate(TRUE_TREE, model, 1500, seed=1)
+    ids = list(alignment.ids)
+    # Start from a wrong tree: NJ on distances with the rows shuffled
+    shuffled = np.random.default_rng(2).permutation(len(ids))
+    start = neighbor_joining(ids, identity_distances(alignment.codes[shuffled]))
+    fit = {}
+    tree = maximum_likelihood_tree(alignment, start, "HKY", model_params=fit)
+
+    truth = set(clade_splits(true_tree, ids, rooted=False).values())
+    assert truth != set(clade_splits(start, ids, rooted=False).values())
+    assert truth == set(clade_splits(tree, ids, rooted=False).values())
+    assert fit["kappa"] == pytest.approx(4.0, rel=0.3)
+
+    # Cached partials after all the local updates agree with a fresh evaluation
+    fresh = LikelihoodTree.from_phylo(tree, alignment, SubstitutionModel.from_alignment(alignment, "HKY", fit["kappa"]))
+    assert fresh.log_likelihood() == pytest.approx(fit["log_likelihood"], abs=1e-6)
+
+@pytest.mark.parametrize("model", ["JC69", "K80", "HKY"])
+def test_session_writes_ml_tree(model, tmp_path):
+    _, alignment = simulate(TRUE_TREE, SubstitutionModel("K80", kappa=3.0), 300, seed=3)
+    out = tmp_path / "ml.newick"
+    session = AnalysisSession(alignment)
+    build_likelihood_tree(session, str(out), model=model)
+    assert session.ml_fit["model"] == model
+    tree = Phylo.read(str(out), "newick")
+    assert sorted(c.name for c in tree.get_terminals()) == sorted(alignment.ids)
+
+def test_upgma_without_alignment(tmp_path):
+    session = AnalysisSession.from_distances(["A", "B", "C"], np.array([[0, 1, 2], [1, 0, 2], [2, 2, 0]]))
+    assert session.likelihood_method() == "upgma"
+    session.write_likelihood_tree(str(tmp_path / "tree.newick"))
+    assert (tmp_path / "tree.newick").read_text().strip().endswith(";")
@@ -0,0 +1,83 @@
+# tests/test_minhash.py
+
+import os
+import random
+import sys
+from pathlib import Path
+import numpy as np
+import pytest
+
+# Add src/ to path
+PROJECT_ROOT = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from src.build_tree import AnalysisSession
+from src.minhash import SketchCache, guess_alphabet, minhash_distances, sketch_fasta, sketch_sequence
+
+def mutate(seq, count, rng):
+    seq = list(seq)
+    for _ in range(count):
+        seq[rng.randrange(len(seq))] = rng.choice("ACGT")
+    return "".join(seq)
+
+def reverse_complement(seq):
+    return seq[::-1].translate(str.maketrans("ACGT", "TGCA"))
+
+def kmer_set(seq, k):
+    return {min(seq[i:i + k], reverse_complement(seq[i:i + k])) for i in range(len(seq) - k + 1)}
+
+@pytest.fixture
+def family():
+    rng = random.Random(7)
+    base = "".join(rng.choice("ACGT") for _ in range(5000))
+    return [base, mutate(base, 25, rng), mutate(base, 250, rng), reverse_complement(base)]
+
+def test_both_strands_give_the_same_sketch(family):
+    assert np.array_equal(sketch_sequence(family[0]), sketch_sequence(family[3]))
+    # Non-ACGT characters only remove the k-mers that contain them
+    assert len(sketch_sequence("ACGTN" * 10, k=5)) == 0
+    assert len(sketch_sequence("ACGTN" * 10, k=4)) == 1  # only ACGT survives
+
+def test_distances_estimate_mash_distance(family):
+    k = 21
+    dist = minhash_distances([sketch_sequence(s, k, sketch_size=2000) for s in family], k)
+    assert dist.shape == (4, 4)
+    assert np.allclose(dist, dist.T)
+    assert dist[0, 3] == 0.0
+    for other in (1, 2):
+        a, b = kmer_set(family[0], k), kmer_set(family[other], k)
+        jaccard = len(a & b) / len(a | b)
+        exact = -np.log(2 * jaccard / (1 + jaccard)) / k
+        assert abs(dist[0, other] - exact) < 0.2 * exact
+
+def test_sketch_fasta_uses_cache_and_feeds_tree_builders(family, tmp_path):
+    fasta = tmp_path / "family.fa"
+    fasta.write_text("".join(f">s{i}\n{s}\n" for i, s in enumerate(family)))
+    cache_dir = tmp_path / "sketches"
+
+    ids, sketches, k = sketch_fasta(str(fasta), cache_dir=str(cache_dir))
+    assert ids == ["s0", "s1", "s2", "s3"] and k == 21
+    assert len(list(cache_dir.iterdir())) == 4
+    _, cached, _ = sketch_fasta(str(fasta), cache_dir=str(cache_dir))
+    assert all(np.array_equal(a, b) for a, b in zip(sketches, cached))
+
+    session = AnalysisSession.from_distances(ids, minhash_distances(sketches, k))
+    assert len(session.nj_tree().get_terminals()) == 4
+    assert len(session.upgma_tree().get_terminals()) == 4
+
+def test_protein_alphabet():
+    assert guess_alphabet(["ACGTTGCAN", "ACGU"]) == "dna"
+    assert guess_alphabet(["MKTAYIAKQRQISFVKSHFSRQ"]) == "protein"
+    protein = "MKTAYIAKQRQISFVKSHFSRQLEERLGLIEVQAPILSRVGDGTQDNLSGAEKAVQVKVKALPDAQ"
+    assert len(sketch_sequence(protein, k=9, alphabet="protein")) == len(protein) - 8
+
+def test_sketch_cache_is_size_bounded(family, tmp_path):
+    cache = SketchCache(str(tmp_path / "sketches"))
+    for i, seq in enumerate(family):
+        cache.put(seq, "dna", 21, 1000, sketch_sequence(seq))
+        os.utime(cache._path(seq, "dna", 21, 1000), (i, i))
+    one = os.path.getsize(cache._path(family[0], "dna", 21, 1000))
+    cache.max_bytes = 2 * one
+    assert cache.evict() == len(family) - 2
+    assert cache.get(family[0], "dna", 21, 1000) is None
+    assert cache.get(family[-1], "dna", 21, 1000) is not None
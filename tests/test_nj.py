@@ -0,0 +1,52 @@
+# tests/test_nj.py
+
+import sys
+from io import StringIO
+from pathlib import Path
+import numpy as np
+import pytest
+from Bio import Phylo
+from Bio.Phylo.TreeConstruction import DistanceTreeConstructor
+
+# Add src/ to path
+PROJECT_ROOT = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from src.distance import to_distance_matrix
+from src.nj import add_to_nj_tree, neighbor_joining
+
+def newick(tree):
+    out = StringIO()
+    Phylo.write(tree, out, "newick")
+    return out.getvalue()
+
+def random_distances(n, seed, rounded=False):
+    points = np.random.default_rng(seed).random((n, 6))
+    if rounded:
+        points = np.round(points * 2) / 2  # duplicate points -> tied Q values
+    return np.sqrt(((points[:, None] - points[None]) ** 2).sum(-1))
+
+@pytest.mark.parametrize("n", [2, 3, 4, 7, 40, 90])
+@pytest.mark.parametrize("rounded", [False, True])
+def test_matches_biopython_nj(n, rounded):
+    dist = random_distances(n, seed=n, rounded=rounded)
+    names = [f"t{i}" for i in range(n)]
+    expected = newick(DistanceTreeConstructor().nj(to_distance_matrix(names, dist)))
+
+    assert newick(neighbor_joining(names, dist)) == expected
+    assert newick(neighbor_joining(names, dist, prune=False)) == expected
+
+def test_shape_mismatch_rejected():
+    with pytest.raises(ValueError):
+        neighbor_joining(["a", "b", "c"], np.zeros((2, 2)))
+
+def test_add_taxa_to_an_nj_tree():
+    points = np.random.default_rng(5).random((25, 4))
+    dist = np.sqrt(((points[:, None] - points[None]) ** 2).sum(-1))
+    names = [f"t{i}" for i in range(25)]
+    tree = add_to_nj_tree(neighbor_joining(names[:20], dist[:20, :20]), names, dist)
+    assert sorted(c.name for c in tree.get_terminals()) == sorted(names)
+    # New tips sit next to their nearest placed taxon
+    for i in range(20, 25):
+        nearest = names[int(np.argmin(dist[i, :20]))]
+        assert tree.distance(names[i], nearest) == pytest.approx(dist[i, names.index(nearest)])
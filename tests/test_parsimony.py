@@ -0,0 +1,86 @@
+# tests/test_parsimony.py
+
+import sys
+from pathlib import Path
+import numpy as np
+import pytest
+from Bio import Phylo
+from Bio.Phylo.TreeConstruction import ParsimonyScorer
+
+# Add src/ to path
+PROJECT_ROOT = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from src.alignment import CompactAlignment
+from src.build_tree import AnalysisSession, build_parsimony_tree
+from src.distance import identity_distances
+from src.nj import neighbor_joining
+from src.parsimony import ParsimonyTree, add_to_parsimony_tree, parsimony_tree
+
+def random_alignment(n, length, rate, seed):
+    # Each sequence copies an earlier one with some random substitutions
+    rng = np.random.default_rng(seed)
+    rows = [rng.integers(0, 4, length)]
+    for _ in range(1, n):
+        row = rows[rng.integers(len(rows))].copy()
+        changed = rng.random(length) < rate
+        row[changed] = rng.integers(0, 4, changed.sum())
+        rows.append(row)
+    codes = np.frombuffer(b"ACGT", dtype=np.uint8)[np.array(rows)]
+    return CompactAlignment([f"s{i}" for i in range(n)], codes)
+
+def test_score_matches_biopython():
+    # Over 64 patterns, so the bit planes span several words
+    alignment = random_alignment(12, 300, 0.2, seed=0)
+    tree = neighbor_joining(list(alignment.ids), identity_distances(alignment.codes))
+    assert alignment.compress_patterns().shape[1] > 64
+    expected = ParsimonyScorer().get_score(tree, alignment.to_msa())
+    assert ParsimonyTree.from_phylo(tree, alignment).score() == expected
+
+def test_gaps_and_ambiguity_codes_cost_nothing():
+    alignment = CompactAlignment(["A", "B", "C", "D"], np.frombuffer(b"AAACRN-T", dtype=np.uint8).reshape(4, 2))
+    tree = neighbor_joining(list(alignment.ids), identity_distances(alignment.codes))
+    # Column 1: A,A,R,- fits A everywhere; column 2: A,C,N,T needs two changes
+    assert ParsimonyTree.from_phylo(tree, alignment).score() == 2
+
+def test_search_improves_a_bad_start_and_lengths_add_up():
+    alignment = random_alignment(30, 500, 0.05, seed=1)
+    shuffled = np.random.default_rng(2).permutation(30)
+    start = neighbor_joining(list(alignment.ids), identity_distances(alignment.codes[shuffled]))
+    score = {}
+    tree = parsimony_tree(alignment, start, score=score)
+    assert score["score"] < score["start"]
+    assert ParsimonyScorer().get_score(tree, alignment.to_msa()) == score["score"]
+    # Branch lengths are changes per site of one reconstruction with that score
+    total = sum(c.branch_length or 0 for c in tree.find_clades())
+    assert total * 500 == pytest.approx(score["score"])
+
+def test_session_writes_parsimony_tree(tmp_path):
+    alignment = random_alignment(10, 200, 0.1, seed=3)
+    out = tmp_path / "mp.newick"
+    session = AnalysisSession(alignment)
+    build_parsimony_tree(session, str(out))
+    assert session.parsimony_score > 0
+    tree = Phylo.read(str(out), "newick")
+    assert sorted(c.name for c in tree.get_terminals()) == sorted(alignment.ids)
+    assert AnalysisSession.from_distances(["A", "B"], np.ones((2, 2))).parsimony_method() == "nj"
+
+def test_add_taxa_to_an_earlier_tree():
+    alignment = random_alignment(40, 400, 0.05, seed=4)
+    ids = list(alignment.ids)
+    # Tree of the first 36 sequences, as an earlier analysis would have built it
+    earlier = CompactAlignment(ids[:36], alignment.codes[:36])
+    base = parsimony_tree(earlier, neighbor_joining(ids[:36], identity_distances(earlier.codes)))
+
+    score = {}
+    tree = add_to_parsimony_tree(alignment, base, score=score)
+    assert sorted(c.name for c in tree.get_terminals()) == sorted(ids)
+    assert score["score"] <= score["start"]
+    assert ParsimonyScorer().get_score(tree, alignment.to_msa()) == score["score"]
+    # About as good as searching again from scratch
+    full = {}
+    parsimony_tree(alignment, neighbor_joining(ids, identity_distances(alignment.codes)), score=full)
+    assert score["score"] <= full["score"] * 1.02
+
+    with pytest.raises(ValueError):
+        add_to_parsimony_tree(earlier, tree)
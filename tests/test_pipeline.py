@@ -0,0 +1,63 @@
+# tests/test_pipeline.py
+
+import subprocess
+import sys
+from pathlib import Path
+
+# Add src/ to path
+PROJECT_ROOT = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from src.pipeline import COLUMN_FILTER, WORKER_MODULES, pipeline_params
+
+def test_pipeline_import_defers_scientific_stack():
+    # Cold import in a fresh interpreter: the web app and CLI only need
+    # pipeline_params until a job runs
+    check = ("import sys, src.pipeline; "
+             "print(sorted({m.split('.')[0] for m in sys.modules} & {'Bio', 'matplotlib', 'scipy'}))")
+    result = subprocess.run([sys.executable, "-c", check], cwd=PROJECT_ROOT,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
+
+def test_worker_modules_import():
+    for name in WORKER_MODULES:
+        __import__(name)
+    assert pipeline_params("minhash")["distance"] == "minhash"
+
+def test_column_filter_changes_cache_params():
+    assert "column_filter" not in pipeline_params()
+    assert pipeline_params(column_filter=COLUMN_FILTER)["column_filter"] == COLUMN_FILTER
+
+def test_result_names_the_tree_builders_that_ran(tmp_path, monkeypatch):
+    import random
+    import src.pipeline as pipeline
+    monkeypatch.setattr(pipeline, "SKETCH_CACHE", str(tmp_path / "sketches"))
+    rng = random.Random(3)
+    base = "".join(rng.choice("ACGT") for _ in range(300))
+    fasta = tmp_path / "in.fa"
+    fasta.write_text("".join(f">s{i}\n{base[i * 7:] + base[:i * 7]}\n" for i in range(5)))
+    out = {name: str(tmp_path / name) for name in ("aln.fa", "p.nwk", "m.nwk", "p.png", "m.png")}
+    result = pipeline.run_pipeline(str(fasta), out["aln.fa"], out["p.nwk"], out["m.nwk"],
+                                   out["p.png"], out["m.png"], distance_mode="minhash")
+    # No alignment, so no parsimony or likelihood search ran
+    assert result["methods"] == {"parsimony": "nj", "likelihood": "upgma"}
+
+def test_distances_stored_once_inside_the_distance_stage(tmp_path, monkeypatch):
+    import src.pipeline as pipeline
+    from src.build_tree import AnalysisSession
+    from src.distance_store import DistanceStore
+    monkeypatch.setattr(pipeline, "SKETCH_CACHE", str(tmp_path / "sketches"))
+    calls = []
+    store_distances = AnalysisSession.store_distances
+    def counted(self, path, workers=None):
+        calls.append(path)
+        return store_distances(self, path, workers)
+    monkeypatch.setattr(AnalysisSession, "store_distances", counted)
+
+    fasta = tmp_path / "in.fa"
+    fasta.write_text("".join(f">s{i}\n{'ACGTTGCA' * 20}{'ACGT'[i] * (i + 5)}\n" for i in range(4)))
+    out = {name: str(tmp_path / name) for name in ("aln.fa", "p.nwk", "m.nwk", "p.png", "m.png", "d.npy")}
+    pipeline.run_pipeline(str(fasta), out["aln.fa"], out["p.nwk"], out["m.nwk"], out["p.png"], out["m.png"],
+                          distances_file=out["d.npy"], distance_mode="minhash")
+    assert calls == [out["d.npy"]]
+    assert DistanceStore(out["d.npy"]).shape == (4, 4)
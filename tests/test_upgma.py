@@ -0,0 +1,71 @@
+# tests/test_upgma.py
+
+import sys
+from io import StringIO
+from pathlib import Path
+import numpy as np
+import pytest
+from Bio import Phylo
+from Bio.Phylo.TreeConstruction import DistanceTreeConstructor
+
+# Add src/ to path
+PROJECT_ROOT = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from src.distance import to_distance_matrix
+from src.upgma import add_to_upgma_tree, condensed_distances, upgma_tree
+
+def newick(tree):
+    out = StringIO()
+    Phylo.write(tree, out, "newick")
+    return out.getvalue()
+
+def random_distances(n, seed):
+    points = np.random.default_rng(seed).random((n, 6))
+    return np.sqrt(((points[:, None] - points[None]) ** 2).sum(-1))
+
+@pytest.mark.parametrize("n", [2, 3, 6, 40])
+def test_float64_without_ties_matches_biopython_upgma(n):
+    # Only distinct distances: tied merges are ordered by SciPy, not Biopython
+    dist = random_distances(n, seed=n)
+    names = [f"t{i}" for i in range(n)]
+    expected = DistanceTreeConstructor().upgma(to_distance_matrix(names, dist))
+
+    tree = upgma_tree(names, condensed_distances(dist, dtype=np.float64))
+    assert newick(tree) == newick(expected)
+
+def test_float32_branch_lengths_are_ultrametric():
+    dist = random_distances(30, seed=1)
+    names = [f"t{i}" for i in range(30)]
+    condensed = condensed_distances(dist)
+    assert condensed.dtype == np.float32
+    assert len(condensed) == 30 * 29 // 2
+
+    tree = upgma_tree(names, condensed)
+    depths = [tree.distance(leaf) for leaf in tree.get_terminals()]
+    assert np.allclose(depths, depths[0], rtol=1e-5)
+
+def test_length_mismatch_rejected():
+    with pytest.raises(ValueError):
+        upgma_tree(["a", "b", "c"], np.zeros(2))
+
+def test_add_taxa_keeps_tree_ultrametric():
+    dist = random_distances(30, seed=2)
+    names = [f"t{i}" for i in range(30)]
+    base = upgma_tree(names[:25], condensed_distances(dist[:25, :25], dtype=np.float64))
+    tree = add_to_upgma_tree(base, names, dist)
+    assert sorted(c.name for c in tree.get_terminals()) == sorted(names)
+    depths = [tree.distance(leaf) for leaf in tree.get_terminals()]
+    assert np.allclose(depths, depths[0])
+    assert all(c.branch_length >= 0 for c in tree.find_clades() if c is not tree.root)
+
+def test_tied_distances_give_a_valid_wpgma_tree():
+    # Identity-like distances on a coarse grid are full of ties
+    dist = np.round(random_distances(25, seed=5) * 4) / 4
+    np.fill_diagonal(dist, 0)
+    names = [f"t{i}" for i in range(25)]
+    tree = upgma_tree(names, condensed_distances(dist, dtype=np.float64))
+    assert sorted(leaf.name for leaf in tree.get_terminals()) == sorted(names)
+    assert all(clade.branch_length >= 0 for clade in tree.find_clades())
+    depths = [tree.distance(leaf) for leaf in tree.get_terminals()]
+    assert np.allclose(depths, depths[0])
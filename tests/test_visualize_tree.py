@@ -9,9 +9,11 @@ import pytest
 PROJECT_ROOT = Path(__file__).parent.parent.resolve()
 sys.path.insert(0, str(PROJECT_ROOT / "src"))
 
-from src.visualize_tree import visualize_tree
+from src.visualize_tree import X_RESOLUTION, render_trees, tree_layout, visualize_tree, write_layout
 from Bio import Phylo
+import json
 import tempfile
+from io import StringIO
 
 # Create a trivial Newick string
 DUMMY_NEWICK = "(A:0.1,B:0.2);"
@@ -29,3 +31,60 @@ def test_visualize_tree_creates_png(dummy_newick_file, tmp_path):
     assert Path(out_png).exists()
     # Optionally, load it with PIL or check file size > 0
     assert Path(out_png).stat().st_size > 0
+
+def test_tree_layout_coordinates():
+    tree = Phylo.read(StringIO("((A:1,B:2)95:1,C:3);"), "newick")
+    layout = tree_layout(tree)
+    names = [name or "" for name in layout.names]
+    assert [names[i] for i in layout.tips.nonzero()[0]] == ["A", "B", "C"]
+    assert list(layout.x) == [0, 1, 2, 3, 3]
+    assert list(layout.y) == [1.25, 0.5, 0, 1, 2]
+    assert layout.confidence[1] == 95
+
+    horizontal, vertical = layout.segments()
+    assert horizontal.shape == (4, 2, 2) and vertical.shape == (2, 2, 2)
+
+def test_render_trees_writes_svg_and_png(dummy_newick_file, tmp_path):
+    jobs = [(dummy_newick_file, str(tmp_path / "tree.svg")),
+            (dummy_newick_file, str(tmp_path / "tree.png"))]
+    assert render_trees(jobs, workers=2) == [path for _, path in jobs]
+    assert (tmp_path / "tree.svg").read_text().lstrip().startswith("<?xml")
+    assert (tmp_path / "tree.png").read_bytes()[:4] == b"\x89PNG"
+
+def test_render_trees_parallel_path(dummy_newick_file, tmp_path, monkeypatch):
+    from concurrent.futures import ProcessPoolExecutor
+    import src.visualize_tree as visualize
+    from src.array_tree import read_newick
+    pools = []
+    class RecordingPool(ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            pools.append(kwargs.get("max_workers"))
+            super().__init__(*args, **kwargs)
+    monkeypatch.setattr(visualize, "ProcessPoolExecutor", RecordingPool)
+    monkeypatch.setattr(visualize, "PARALLEL_MIN_TIPS", 0)
+
+    # A path and an ArrayTree, both drawn in worker processes
+    jobs = [(dummy_newick_file, str(tmp_path / "a.png")),
+            (read_newick(dummy_newick_file), str(tmp_path / "b.svg"))]
+    assert render_trees(jobs, workers=2) == [path for _, path in jobs]
+    assert pools == [2]
+    assert (tmp_path / "a.png").read_bytes()[:4] == b"\x89PNG"
+    assert (tmp_path / "b.svg").read_text().lstrip().startswith("<?xml")
+
+def test_tip_count_ignores_commas_in_labels(tmp_path):
+    from src.visualize_tree import _count_tips
+    newick = tmp_path / "tree.newick"
+    newick.write_text("('a, b':1,('c,d':1,e[x,y]:1)'9,0':1);")
+    assert _count_tips(str(newick)) == 3
+
+def test_write_layout_is_compact_json(tmp_path):
+    newick = tmp_path / "tree.newick"
+    newick.write_text("((A:1,B:2)95:1,C:4);")
+    out = tmp_path / "tree.layout.json"
+    write_layout(str(newick), str(out))
+    data = json.loads(out.read_text())
+    assert data["parent"] == [-1, 0, 1, 1, 0]
+    assert data["x"] == [0, X_RESOLUTION // 4, X_RESOLUTION // 2, X_RESOLUTION * 3 // 4, X_RESOLUTION]
+    assert data["depth"] == 4
+    assert data["names"] == ["A", "B", "C"]
+    assert data["support"] == [[1, 95]]
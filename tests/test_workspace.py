@@ -0,0 +1,67 @@
+# tests/test_workspace.py
+
+import os
+import sys
+from pathlib import Path
+import pytest
+
+# Add src/ to path
+PROJECT_ROOT = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from src.workspace import Workspace, WorkspaceQuotaError, sweep_workspaces
+
+def make_workspace(root, status, age, size=0, now=1_000_000):
+    ws = Workspace.create(root=str(root), quota=None)
+    ws.write_status({"status": status})
+    with open(ws.input_fasta, "wb") as f:
+        f.write(b"A" * size)
+    os.utime(ws.status_file, (now - age, now - age))
+    return ws
+
+def test_create_and_open(tmp_path):
+    ws = Workspace.create(root=str(tmp_path))
+    assert os.path.isdir(ws.path)
+    assert ws.read_status()["status"] == "queued"
+    assert Workspace.open(ws.job_id, root=str(tmp_path)).path == ws.path
+
+    # Malformed or unknown IDs never resolve to a path
+    assert Workspace.open("../etc", root=str(tmp_path)) is None
+    assert Workspace.open("0" * 32, root=str(tmp_path)) is None
+
+    ws.request_cancel()
+    assert ws.cancel_requested()
+
+def test_sweep_removes_expired_then_oldest_over_quota(tmp_path):
+    now = 1_000_000
+    expired = make_workspace(tmp_path, "done", age=7200, now=now)
+    old = make_workspace(tmp_path, "done", age=600, size=100, now=now)
+    running = make_workspace(tmp_path, "running", age=500, size=100, now=now)
+    recent = make_workspace(tmp_path, "done", age=10, size=100, now=now)
+
+    removed = sweep_workspaces(str(tmp_path), ttl=3600, quota=250, now=now)
+
+    # The running job is kept even though it is older than the survivor
+    assert removed == [expired.job_id, old.job_id]
+    assert os.path.isdir(running.path) and os.path.isdir(recent.path)
+
+def test_quota_blocks_new_workspaces(tmp_path):
+    make_workspace(tmp_path, "done", age=0, size=100)
+    with pytest.raises(WorkspaceQuotaError):
+        Workspace.create(root=str(tmp_path), quota=50)
+
+def test_running_job_with_heartbeat_survives_a_long_stage(tmp_path):
+    now = 1_000_000
+    # Both wrote their last status 2 hours ago (one long MUSCLE run, say)
+    alive = make_workspace(tmp_path, "running", age=7200, size=100, now=now)
+    dead = make_workspace(tmp_path, "running", age=7200, now=now)
+    with alive.heartbeat(interval=3600):
+        pass
+    assert os.path.exists(alive.heartbeat_file)
+    os.utime(alive.heartbeat_file, (now - 30, now - 30))
+
+    removed = sweep_workspaces(str(tmp_path), ttl=3600, quota=50, now=now)
+
+    # The live job is kept, even over quota; the silent one has died
+    assert removed == [dead.job_id]
+    assert os.path.isdir(alive.path)